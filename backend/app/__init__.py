@@ -11,6 +11,7 @@ from config import Config
 import logging
 import sys
 from flask_jwt_extended import JWTManager
+from app.json_provider import FastJSONProvider
 
 _logging_configured = False 
 
@@ -46,6 +47,8 @@ def create_app(config_class=Config):
     configure_logging()
     app = Flask(__name__)
     app.config.from_object(config_class)
+    # orjson-backed when installed; also encodes the cached product fragments
+    app.json = FastJSONProvider(app)
 
     db.init_app(app)
     migrate.init_app(app, db)
@@ -57,6 +60,7 @@ def create_app(config_class=Config):
     from app.routes.products import products_bp
     from app.routes.cart import cart_bp
     from app.routes.orders import orders_bp
+    from app.routes.categories import categories_bp
     from .routes.voice import voice_bp
 
     # Register the blueprints with the Flask app instance
@@ -65,6 +69,7 @@ def create_app(config_class=Config):
     app.register_blueprint(products_bp)
     app.register_blueprint(cart_bp)
     app.register_blueprint(orders_bp)
+    app.register_blueprint(categories_bp)
     app.register_blueprint(voice_bp)
     # --- End Blueprint Registration ---
 
@@ -72,6 +77,20 @@ def create_app(config_class=Config):
     # Ensure it's placed where it can "see" the model definitions
     from app import models # If models are in app/models/__init__.py
 
+    # Keep in-process catalog caches (e.g. the voice product-name index) in
+    # sync with committed product writes
+    from app.services.catalog_events import register_catalog_listeners
+    register_catalog_listeners()
+    # Keep the category closure table in step with category writes
+    from app.services.category_tree import register_category_listeners
+    register_category_listeners()
+    # Give expired cart stock holds back in the background
+    from app.services.stock_reservations import start_reservation_sweeper
+    app.extensions['reservation_sweeper'] = start_reservation_sweeper(app)
+    # Keep the stock_quantity of sharded flash-sale products current
+    from app.services.stock_shards import start_stock_consolidator
+    app.extensions['stock_consolidator'] = start_stock_consolidator(app)
+
     logger = logging.getLogger(__name__) # Get logger for app factory itself
     logger.info("Grocery Voice App created and configured.") # Example log at app creation
 
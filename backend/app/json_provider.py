@@ -0,0 +1,48 @@
+"""
+JSON provider for the Flask application.
+
+Uses orjson when it is installed (several times faster at encoding the
+large product lists) and the standard library otherwise. Values are
+encoded as by Flask's default provider: sorted keys, dates as HTTP dates
+(orjson passes them to Flask's `_default` instead of writing ISO 8601),
+decimals and UUIDs as strings. Unlike Flask's default, output is always
+compact and non-ASCII text is written as UTF-8 rather than \\u escapes,
+on both paths.
+"""
+import json
+
+from flask.json.provider import DefaultJSONProvider, _default
+
+try:
+    import orjson
+except ImportError:  # Optional speed-up; see requirements
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Compact, key-sorted JSON encoding backed by orjson when available.
+
+    `dumps_bytes` returns UTF-8 bytes directly so callers assembling
+    responses from cached fragments avoid a str round-trip.
+    """
+
+    def dumps_bytes(self, obj, **kwargs) -> bytes:
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                                | orjson.OPT_PASSTHROUGH_DATETIME)
+        return self.dumps(obj, **kwargs).encode('utf-8')
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is not None and not kwargs:
+            return self.dumps_bytes(obj).decode('utf-8')
+        kwargs.setdefault("default", _default)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        kwargs.setdefault("ensure_ascii", False)
+        kwargs.setdefault("separators", (",", ":"))
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
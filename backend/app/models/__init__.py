@@ -10,3 +10,9 @@ from .category import Category
 from .product import Product
 from .shopping_cart import ShoppingCart
 from .cart_item import CartItem
+from .product_stats import ProductStats, CustomerProductStats, CustomerOrderStats
+from .catalog_version import CatalogVersion
+from .category_closure import CategoryClosure
+from .stock_reservation import StockReservation
+from .product_stock_shard import ProductStockShard
+from .outbox_event import OutboxEvent
@@ -13,6 +13,10 @@ class CartItem(db.Model):
         quantity (int): Quantity of the product in the cart.
     """
     __tablename__ = 'cartitems' # Matches the SQL table name from the plan
+    __table_args__ = (
+        # One line per product; adding it again increments the quantity (see cart_service.add_item)
+        db.UniqueConstraint('cart_id', 'product_id', name='uq_cartitems_cart_id_product_id'),
+    )
 
     cart_item_id = db.Column(db.Integer, primary_key=True)
     cart_id = db.Column(db.Integer, db.ForeignKey('shoppingcarts.cart_id'), nullable=False)
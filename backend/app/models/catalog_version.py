@@ -0,0 +1,23 @@
+from app import db
+from datetime import datetime
+
+class CatalogVersion(db.Model):
+    """
+    A single-row stamp bumped, in the same transaction, by every product write.
+
+    Workers compare it with the version their in-memory catalog caches were
+    built from to decide when to reload.
+
+    Attributes:
+        id (int): Primary key; the table holds only the row with id 1.
+        version (int): Incremented on each transaction that changes products.
+        updated_at (datetime): When the catalog last changed.
+    """
+    __tablename__ = 'catalog_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CatalogVersion {self.version} at {self.updated_at}>'
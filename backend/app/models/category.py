@@ -12,6 +12,10 @@ class Category(db.Model):
         name_en (str): Name of the category in English.
         name_ar (str): Name of the category in Arabic.
         parent_category_id (int, optional): Foreign key to self for sub-categories.
+
+    Ancestor/descendant pairs are kept in the category_closure table (see
+    CategoryClosure and app.services.category_tree) so whole subtrees can be
+    queried without recursion.
     """
     __tablename__ = 'categories' # Matches the SQL table name from the plan
 
@@ -23,7 +27,7 @@ class Category(db.Model):
     # Relationship to products
     products = db.relationship('Product', backref='category', lazy=True)
     # Relationship for subcategories (if you want to navigate parent-child easily)
-    # parent = db.relationship('Category', remote_side=[category_id], backref='subcategories')
+    parent = db.relationship('Category', remote_side=[category_id], backref='subcategories')
 
 
     def __repr__(self):
@@ -0,0 +1,25 @@
+from app import db
+
+class CategoryClosure(db.Model):
+    """
+    One row per (ancestor, descendant) pair of the category tree, including each category with itself.
+
+    Maintained on every category write by app.services.category_tree, so a
+    subtree of any depth is a single indexed lookup on ancestor_id.
+
+    Attributes:
+        ancestor_id (int): Part of the primary key; the category at the top of the path.
+        descendant_id (int): Part of the primary key; a category at or below the ancestor.
+        depth (int): Number of levels between the two (0 for a category with itself).
+    """
+    __tablename__ = 'category_closure'
+    __table_args__ = (
+        db.Index('ix_category_closure_descendant_id', 'descendant_id', 'ancestor_id'),
+    )
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('categories.category_id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('categories.category_id', ondelete='CASCADE'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<CategoryClosure {self.ancestor_id} -> {self.descendant_id} (Depth {self.depth})>'
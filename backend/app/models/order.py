@@ -4,6 +4,10 @@ from decimal import Decimal # For total_amount
 
 class Order(db.Model):
     __tablename__ = 'orders' # As per your long-term plan's schema list
+    __table_args__ = (
+        # Order history pages walk one customer's orders by (order_date, order_id)
+        db.Index('ix_orders_customer_id_order_date', 'customer_id', 'order_date', 'order_id'),
+    )
 
     order_id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False)
@@ -3,6 +3,10 @@ from decimal import Decimal # For price_at_purchase
 
 class OrderItem(db.Model):
     __tablename__ = 'orderitems'
+    __table_args__ = (
+        # Order details and history summaries load an order's lines
+        db.Index('ix_orderitems_order_id', 'order_id'),
+    )
 
     order_item_id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id'), nullable=False)
@@ -0,0 +1,42 @@
+from app import db
+from datetime import datetime
+
+class OutboxEvent(db.Model):
+    """
+    A side effect of a committed write, queued for the outbox worker.
+
+    Rows are inserted in the same transaction as the write they follow
+    (e.g. an order), one per handler of the event, so each handler is
+    delivered and retried on its own (see app/services/outbox.py).
+
+    Attributes:
+        event_id (int): Primary key.
+        event_type (str): What happened, e.g. 'order_placed'.
+        handler (str): The registered handler that will process this row.
+        payload (str): The event data as JSON.
+        created_at (datetime): When the event was published.
+        available_at (datetime): When the row may next be claimed; pushed
+            forward while a worker holds it and after a failed attempt.
+        attempts (int): Deliveries started so far.
+        last_error (str, optional): The error of the last failed attempt.
+        processed_at (datetime, optional): When the handler succeeded; None while pending.
+    """
+    __tablename__ = 'outbox_events'
+    __table_args__ = (
+        # Workers scan only pending rows, oldest first
+        db.Index('ix_outbox_events_pending', 'available_at', 'event_id',
+                 postgresql_where=db.text('processed_at IS NULL'), sqlite_where=db.text('processed_at IS NULL')),
+    )
+
+    event_id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(64), nullable=False)
+    handler = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<OutboxEvent {self.event_id} {self.event_type}/{self.handler} (Attempts {self.attempts})>'
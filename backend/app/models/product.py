@@ -14,13 +14,25 @@ class Product(db.Model):
         price (Decimal): Price of the product.
         category_id (int): Foreign key linking to the Category model.
         brand (str, optional): Brand of the product.
-        stock_quantity (int): Current stock quantity.
+        stock_quantity (int): Stock available to new carts (a periodically refreshed copy when stock_sharded).
         unit_type (str, optional): Unit of measurement (e.g., 'kg', 'piece').
         image_url (str, optional): URL for the product image.
         is_active (bool): Whether the product is currently active for sale.
         created_at (datetime): Timestamp of when the product was added.
+        supplier_sku (str, optional): The supplier's stock-keeping unit; the key catalog imports upsert on.
+        stock_sharded (bool): Whether stock lives in ProductStockShard counters (flash-sale products).
     """
     __tablename__ = 'products' # Matches the SQL table name from the plan
+    __table_args__ = (
+        # Keyset pagination of filtered listings (see GET /api/products)
+        db.Index('ix_products_category_id_product_id', 'category_id', 'product_id'),
+        db.Index('ix_products_brand_product_id', 'brand', 'product_id'),
+        # Conflict target of catalog imports (see app/services/catalog_import.py)
+        db.Index('ix_products_supplier_sku', 'supplier_sku', unique=True),
+        # Only the flash-sale products, which the stock consolidator refreshes
+        db.Index('ix_products_stock_sharded', 'product_id',
+                 postgresql_where=db.text('stock_sharded'), sqlite_where=db.text('stock_sharded')),
+    )
 
     product_id = db.Column(db.Integer, primary_key=True)
     name_en = db.Column(db.String(255), nullable=False)
@@ -35,6 +47,8 @@ class Product(db.Model):
     image_url = db.Column(db.String(500), nullable=True)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    supplier_sku = db.Column(db.String(64), nullable=True)
+    stock_sharded = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     # updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) # Optional
 
     # Relationship to cart items can be added later if needed from Product side
@@ -47,25 +61,7 @@ class Product(db.Model):
         """
         Serializes the Product object to a dictionary, providing data
         in the specified language and using a clean, consistent format.
+        Missing Arabic translations fall back to English.
         """
-        if lang == 'ar':
-            name = self.name_ar
-            description = self.description_ar
-        else:
-            name = self.name_en
-            description = self.description_en
-        
-        # The fallback `or self.name_en` is a robust way to handle cases
-        # where an Arabic translation might be missing for a product.
-        return {
-            "product_id": self.product_id,
-            "name": name or self.name_en,
-            "description": description or self.description_en,
-            "price": float(self.price),
-            "category_id": self.category_id,
-            "brand": self.brand,
-            "stock_quantity": self.stock_quantity,
-            "unit_type": self.unit_type,
-            "image_url": self.image_url,
-            "is_active": self.is_active
-        }
\ No newline at end of file
+        from app.services.product_serializer import product_dict
+        return product_dict(self, shape='localized', lang=lang)
@@ -0,0 +1,66 @@
+from app import db
+
+class ProductStats(db.Model):
+    """
+    Precomputed order statistics for a product, used for popularity ranking.
+
+    Rows are upserted incrementally by the outbox worker once an order has committed
+    (popularity_service.handle_order_placed); the orders table is never rescanned.
+
+    Attributes:
+        product_id (int): Primary key, and foreign key linking to the Product model.
+        order_count (int): Number of orders that included the product.
+        units_sold (int): Total quantity ordered.
+        last_ordered_at (datetime, optional): When the product was last ordered.
+    """
+    __tablename__ = 'product_stats'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    units_sold = db.Column(db.Integer, nullable=False, default=0)
+    last_ordered_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<ProductStats {self.product_id} (Orders {self.order_count}, Units {self.units_sold})>'
+
+
+class CustomerProductStats(db.Model):
+    """
+    How often a customer has ordered a product, used for per-customer affinity.
+
+    Attributes:
+        customer_id (int): Part of the primary key; foreign key linking to the Customer model.
+        product_id (int): Part of the primary key; foreign key linking to the Product model.
+        order_count (int): Number of the customer's orders that included the product.
+        units (int): Total quantity the customer has ordered.
+        last_ordered_at (datetime, optional): When the customer last ordered the product.
+    """
+    __tablename__ = 'customer_product_stats'
+
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    last_ordered_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<CustomerProductStats {self.customer_id}/{self.product_id} (Orders {self.order_count})>'
+
+
+class CustomerOrderStats(db.Model):
+    """
+    How many orders a customer has placed, the denominator of their repeat-purchase shares.
+
+    Attributes:
+        customer_id (int): Primary key, and foreign key linking to the Customer model.
+        order_count (int): Number of orders the customer has placed.
+        last_ordered_at (datetime, optional): When the customer last ordered.
+    """
+    __tablename__ = 'customer_order_stats'
+
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    last_ordered_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<CustomerOrderStats {self.customer_id} (Orders {self.order_count})>'
@@ -0,0 +1,23 @@
+from app import db
+
+class ProductStockShard(db.Model):
+    """
+    One of several stock counters of a product flagged `stock_sharded`.
+
+    The product's available stock is the sum of its shards; spreading it
+    over several rows lets concurrent holds of a flash-sale product lock
+    different rows (see app/services/stock_shards.py).
+
+    Attributes:
+        product_id (int): Part of the primary key; foreign key linking to the Product model.
+        shard_no (int): Part of the primary key; 0 to the product's shard count - 1.
+        quantity (int): Units in this shard.
+    """
+    __tablename__ = 'product_stock_shards'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), primary_key=True)
+    shard_no = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ProductStockShard Product {self.product_id} #{self.shard_no} (Qty {self.quantity})>'
@@ -0,0 +1,30 @@
+from app import db
+
+class StockReservation(db.Model):
+    """
+    Units of a product held for a cart until checkout or expiry.
+
+    Held units have already been taken off `Product.stock_quantity`, so
+    checkout converts them into order lines without touching the product
+    row; expired holds are given back by the reservation sweeper (see
+    app/services/stock_reservations.py).
+
+    Attributes:
+        cart_id (int): Part of the primary key; foreign key linking to the ShoppingCart model.
+        product_id (int): Part of the primary key; foreign key linking to the Product model.
+        quantity (int): Units held.
+        expires_at (datetime): When the hold lapses; refreshed whenever the cart line changes.
+    """
+    __tablename__ = 'stock_reservations'
+    __table_args__ = (
+        # The sweeper scans expired holds oldest first
+        db.Index('ix_stock_reservations_expires_at', 'expires_at'),
+    )
+
+    cart_id = db.Column(db.Integer, db.ForeignKey('shoppingcarts.cart_id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<StockReservation Cart {self.cart_id} Product {self.product_id} (Qty {self.quantity})>'
@@ -97,7 +97,12 @@ def login():
 
     # Create the access token. The identity can be any data that is json serializable.
     # Using customer_id is a good choice.
-    access_token = create_access_token(identity=str(customer.customer_id))
+    # The preferred language travels as a claim so the voice pipeline can
+    # use it as an ASR prior without a DB read.
+    access_token = create_access_token(
+        identity=str(customer.customer_id),
+        additional_claims={"lang": customer.preferred_language or "en"}
+    )
     print(f"--- Login successful for {data.get('email')}, token generated. ---")
     
     return jsonify(access_token=access_token), 200
@@ -1,10 +1,12 @@
 # app/routes/cart.py
 from flask import Blueprint, request, jsonify, current_app
 from app import db
-from app.models.shopping_cart import ShoppingCart # Your ShoppingCart model
 from app.models.cart_item import CartItem       # Your CartItem model
 from app.models.product import Product
-from decimal import Decimal
+from app.models.stock_reservation import StockReservation
+from app.services.cart_service import add_item, add_items, get_cart_summary, lock_cart, set_line_quantity
+from app.services.checkout_service import checkout_lock_stats, process_checkout
+from app.services.stock_shards import shard_totals
 
 # from app.models.customer import Customer # Not directly queried if using JWT identity
 from flask_jwt_extended import jwt_required, get_jwt_identity
@@ -42,50 +44,86 @@ def add_to_cart():
     if quantity <= 0:
         return jsonify({"msg": "Quantity must be a positive integer."}), 400
 
-    product = Product.query.get(product_id)
-    if not product:
-        return jsonify({"msg": f"Product with ID {product_id} not found."}), 404
-    if not product.is_active:
-        return jsonify({"msg": f"Product '{product.name_en}' is currently unavailable."}), 400
-    
-    shopping_cart = ShoppingCart.query.filter_by(customer_id=current_user_id).first()
-    if not shopping_cart:
-        shopping_cart = ShoppingCart(customer_id=current_user_id)
-        db.session.add(shopping_cart)
-        db.session.flush() 
-
-    cart_item = CartItem.query.filter_by(cart_id=shopping_cart.cart_id, product_id=product_id).first()
-
-    if cart_item:
-        new_quantity_in_cart = cart_item.quantity + quantity
-        if product.stock_quantity < new_quantity_in_cart:
-            return jsonify({"msg": f"Insufficient stock for '{product.name_en}'. Requested total: {new_quantity_in_cart}, Available: {product.stock_quantity}"}), 400
-        cart_item.quantity = new_quantity_in_cart
-    else:
-        if product.stock_quantity < quantity:
-            return jsonify({"msg": f"Insufficient stock for '{product.name_en}'. Requested: {quantity}, Available: {product.stock_quantity}"}), 400
-        cart_item = CartItem(cart_id=shopping_cart.cart_id, product_id=product_id, quantity=quantity)
-        db.session.add(cart_item)
-    
+    # Cart creation, line upsert and stock check in one atomic statement
     try:
-        db.session.commit()
+        result = add_item(current_user_id, product_id, quantity)
     except Exception as e:
-        db.session.rollback()
         current_app.logger.error(f"Error adding to cart for customer {current_user_id}, product {product_id}: {str(e)}")
         return jsonify({"msg": "An error occurred while adding the item to the cart.", "error_details": str(e)}), 500
-            
+    if not result['success']:
+        return jsonify({"msg": result['error']}), result['status_code']
+
     return jsonify({
-        "msg": f"'{product.name_en}' (Qty: {quantity} requested) processed for cart.",
+        "msg": f"'{result['product_name']}' (Qty: {quantity} requested) processed for cart.",
         "cart_item_details": {
             # using cart_item_id from your model
-            "cart_item_id": cart_item.cart_item_id, 
-            "product_id": cart_item.product_id,
-            "product_name": product.name_en,
-            "updated_quantity_in_cart": cart_item.quantity,
-            "cart_id": shopping_cart.cart_id
+            "cart_item_id": result['cart_item_id'],
+            "product_id": result['product_id'],
+            "product_name": result['product_name'],
+            "updated_quantity_in_cart": result['quantity'],
+            "cart_id": result['cart_id']
         }
     }), 200
 
+MAX_BATCH_ITEMS = 100
+
+@cart_bp.route('/items:batch', methods=['POST'])
+@jwt_required()
+def add_to_cart_batch():
+    """
+    Adds several products to the authenticated user's cart in one transaction.
+    Expects JSON: {"items": [{"product_id": <int>, "quantity": <int, default 1>}, ...]}
+    Repeated product IDs are summed. Items that cannot be added (unknown,
+    unavailable or short on stock) are listed under "failed" without
+    preventing the others; the response is 400 only if nothing was added.
+    """
+    current_user_id_str = get_jwt_identity()
+    try:
+        current_user_id = int(current_user_id_str)
+    except ValueError:
+        return jsonify({"msg": "Invalid user identity in token. Must be an integer."}), 400
+
+    data = request.get_json()
+    if not data or not isinstance(data.get('items'), list) or not data['items']:
+        return jsonify({"msg": "A non-empty 'items' list is required in JSON body."}), 400
+    if len(data['items']) > MAX_BATCH_ITEMS:
+        return jsonify({"msg": f"At most {MAX_BATCH_ITEMS} items can be added per request."}), 400
+
+    lines = []
+    for index, item in enumerate(data['items']):
+        if not isinstance(item, dict) or item.get('product_id') is None:
+            return jsonify({"msg": f"Item {index}: Product ID is required."}), 400
+        try:
+            product_id = int(item['product_id'])
+            quantity = int(item.get('quantity', 1))
+        except (TypeError, ValueError):
+            return jsonify({"msg": f"Item {index}: Product ID and quantity must be integers."}), 400
+        if quantity <= 0:
+            return jsonify({"msg": f"Item {index}: Quantity must be a positive integer."}), 400
+        lines.append((product_id, quantity))
+
+    try:
+        result = add_items(current_user_id, lines)
+    except Exception as e:
+        current_app.logger.error(f"Error adding {len(lines)} items to cart for customer {current_user_id}: {str(e)}")
+        return jsonify({"msg": "An error occurred while adding the items to the cart.", "error_details": str(e)}), 500
+
+    added, failed = result['added'], result['failed']
+    response = {
+        "msg": f"{len(added)} of {len(added) + len(failed)} products processed for cart.",
+        "added": [
+            {
+                "cart_item_id": line['cart_item_id'],
+                "product_id": line['product_id'],
+                "product_name": line['product_name'],
+                "updated_quantity_in_cart": line['quantity'],
+                "cart_id": line['cart_id']
+            } for line in added
+        ],
+        "failed": [{"product_id": line['product_id'], "msg": line['error']} for line in failed]
+    }
+    return jsonify(response), 200 if added else 400
+
 @cart_bp.route('', methods=['GET'])
 @jwt_required()
 def view_cart():
@@ -95,55 +133,32 @@ def view_cart():
     except ValueError:
         return jsonify({"msg": "Invalid user identity in token. Must be an integer."}), 400
 
-    shopping_cart = ShoppingCart.query.filter_by(customer_id=current_user_id).first()
+    # Cart, lines, products and totals in one query
+    summary = get_cart_summary(current_user_id)
 
-    if not shopping_cart:
+    if not summary:
         return jsonify({"msg": "Your shopping cart is empty.", "items": [], "total_price": 0.0}), 200
 
-    cart_items_query_result = shopping_cart.items.all()
-
-    if not cart_items_query_result:
+    if not summary["items"]:
         return jsonify({
-            "cart_id": shopping_cart.cart_id,
+            "cart_id": summary["cart_id"],
             "msg": "Your shopping cart is empty.",
             "items": [],
             "total_price": 0.0
         }), 200
 
-    items_response = []
-    # Initialize grand_total_price as a Decimal
-    grand_total_price = Decimal('0.0')
-
-    for item in cart_items_query_result:
-        product = Product.query.get(item.product_id)
-        
-        if product:
-            # product.price is Decimal, item.quantity is int.
-            # item_subtotal will be Decimal.
-            item_subtotal = product.price * item.quantity
-            
-            items_response.append({
-                "cart_item_id": item.cart_item_id,
-                "product_id": product.product_id,
-                "name_en": product.name_en,
-                "name_ar": product.name_ar,
-                "price_per_unit": float(product.price), # Still convert to float for individual item display
-                "quantity": item.quantity,
-                "unit_type": product.unit_type,
-                "image_url": product.image_url,
-                "subtotal": float(item_subtotal) # Still convert to float for individual item display
-            })
-            # Now this is Decimal += Decimal, which is valid
-            grand_total_price += item_subtotal
-        else:
-            current_app.logger.warning(f"Data integrity issue: Product ID {item.product_id} found in cart (cart_item_id: {item.cart_item_id}, cart_id: {shopping_cart.cart_id}) but no matching product in products table.")
-            
+    # Money is computed as Decimal in SQL and converted to float for display
+    items_response = [
+        dict(item, price_per_unit=float(item["price_per_unit"]), subtotal=float(item["subtotal"]))
+        for item in summary["items"]
+    ]
     return jsonify({
-        "cart_id": shopping_cart.cart_id,
-        "customer_id": shopping_cart.customer_id,
+        "cart_id": summary["cart_id"],
+        "customer_id": summary["customer_id"],
         "items": items_response,
-        # Convert the final Decimal grand_total_price to float for JSON serialization
-        "total_price": float(grand_total_price)
+        "item_count": summary["item_count"],
+        "total_units": summary["total_units"],
+        "total_price": float(summary["total_price"])
     }), 200
 
 @cart_bp.route('/items/<int:cart_item_id_from_url>', methods=['DELETE'])
@@ -159,15 +174,16 @@ def remove_cart_item(cart_item_id_from_url):
     except ValueError:
         return jsonify({"msg": "Invalid user identity in token."}), 400
 
-    # Find the cart item to be deleted
+    # Lock the user's shopping cart while its stock holds change, then find the
+    # cart item to be deleted under that lock so a concurrent change can't make it stale
+    user_shopping_cart = lock_cart(current_user_id)
     cart_item_to_delete = CartItem.query.get(cart_item_id_from_url)
 
     if not cart_item_to_delete:
         return jsonify({"msg": "Cart item not found."}), 404
 
     # Security Check: Verify the item belongs to the current user's cart
-    # 1. Get the user's shopping cart
-    user_shopping_cart = ShoppingCart.query.filter_by(customer_id=current_user_id).first()
+    # 1. The user must have a shopping cart
     if not user_shopping_cart:
         # This user doesn't even have a cart, so the item can't be theirs.
         return jsonify({"msg": "Shopping cart not found for user."}), 404 
@@ -181,9 +197,9 @@ def remove_cart_item(cart_item_id_from_url):
         )
         return jsonify({"msg": "This item does not belong to your cart."}), 403 # Forbidden
 
-    # If all checks pass, delete the item
+    # If all checks pass, delete the item and give its held stock back
     try:
-        db.session.delete(cart_item_to_delete)
+        set_line_quantity(cart_item_to_delete, 0)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -196,7 +212,12 @@ def remove_cart_item(cart_item_id_from_url):
 @jwt_required()
 def checkout():
     current_user_id_str = get_jwt_identity()
-    result = process_checkout(customer_id=current_user_id_str)
+    try:
+        current_user_id = int(current_user_id_str)
+    except ValueError:
+        return jsonify({"msg": "Invalid user identity in token. Must be an integer."}), 400
+
+    result = process_checkout(customer_id=current_user_id)
 
     if not result['success']:
         return jsonify({"msg": "Checkout process failed.", "error_details": result['error']}), result['status_code']
@@ -207,6 +228,12 @@ def checkout():
         "total_amount": float(result['total_amount'])
     }), result['status_code']
 
+# --- Checkout lock metrics (how long product rows stay locked) ---
+@cart_bp.route('/checkout/metrics', methods=['GET'])
+@jwt_required()
+def get_checkout_metrics():
+    return jsonify(checkout_lock_stats.metrics())
+
 @cart_bp.route('/items/<int:cart_item_id_from_url>', methods=['PUT'])
 @jwt_required()
 def update_cart_item_quantity(cart_item_id_from_url):
@@ -234,14 +261,14 @@ def update_cart_item_quantity(cart_item_id_from_url):
     if new_quantity < 0:
         return jsonify({"msg": "Quantity cannot be negative."}), 400
 
-    # Find the cart item to be updated
+    # Lock the user's cart while its stock holds change, then find the cart item to be updated under that lock
+    user_shopping_cart = lock_cart(current_user_id)
     cart_item_to_update = CartItem.query.get(cart_item_id_from_url)
 
     if not cart_item_to_update:
         return jsonify({"msg": "Cart item not found."}), 404
 
     # Security Check: Verify the item belongs to the current user's cart
-    user_shopping_cart = ShoppingCart.query.filter_by(customer_id=current_user_id).first()
     if not user_shopping_cart or cart_item_to_update.cart_id != user_shopping_cart.cart_id:
         current_app.logger.warning(
             f"Security attempt: User {current_user_id} tried to update cart_item {cart_item_id_from_url} "
@@ -251,9 +278,9 @@ def update_cart_item_quantity(cart_item_id_from_url):
 
     # Handle quantity update
     if new_quantity == 0:
-        # If new quantity is 0, remove the item
+        # If new quantity is 0, remove the item and give its held stock back
         try:
-            db.session.delete(cart_item_to_update)
+            set_line_quantity(cart_item_to_update, 0)
             db.session.commit()
             return jsonify({"msg": f"Cart item with ID {cart_item_id_from_url} removed as quantity set to 0."}), 200
         except Exception as e:
@@ -270,11 +297,12 @@ def update_cart_item_quantity(cart_item_id_from_url):
         if not product.is_active:
              return jsonify({"msg": f"Product '{product.name_en}' is currently unavailable."}), 400
 
-        if product.stock_quantity < new_quantity:
-            return jsonify({"msg": f"Insufficient stock for '{product.name_en}'. Requested: {new_quantity}, Available: {product.stock_quantity}"}), 400
-        
-        cart_item_to_update.quantity = new_quantity
+        # Hold (or give back) the difference; units this cart already holds count as available
         try:
+            if not set_line_quantity(cart_item_to_update, new_quantity):
+                available = _available_to_cart(product, cart_item_to_update.cart_id)
+                db.session.rollback()
+                return jsonify({"msg": f"Insufficient stock for '{product.name_en}'. Requested: {new_quantity}, Available: {available}"}), 400
             db.session.commit()
         except Exception as e:
             db.session.rollback()
@@ -302,19 +330,28 @@ def update_cart_item(item_id):
     if not new_quantity or not isinstance(new_quantity, int) or new_quantity <= 0:
         return jsonify({"error": "A valid quantity is required"}), 400
 
+    # Lock the cart while its stock holds change, then load the line under that lock
+    cart = lock_cart(current_user_id)
     cart_item = CartItem.query.get_or_404(item_id)
 
     # Security check: Ensure the item belongs to the current user's cart
-    cart = ShoppingCart.query.filter_by(customer_id=current_user_id, cart_id=cart_item.cart_id).first()
-    if not cart:
+    if not cart or cart.cart_id != cart_item.cart_id:
         return jsonify({"error": "Item not found in your cart"}), 404
 
-    # Check stock
+    # Hold (or give back) the difference in stock
     product = Product.query.get(cart_item.product_id)
-    if product.stock_quantity < new_quantity:
-        return jsonify({"error": f"Insufficient stock for {product.name_en}. Only {product.stock_quantity} available."}), 400
+    if not set_line_quantity(cart_item, new_quantity):
+        available = _available_to_cart(product, cart_item.cart_id)
+        db.session.rollback()
+        return jsonify({"error": f"Insufficient stock for {product.name_en}. Only {available} available."}), 400
 
-    cart_item.quantity = new_quantity
     db.session.commit()
 
-    return jsonify({"message": "Cart updated successfully"}), 200
\ No newline at end of file
+    return jsonify({"message": "Cart updated successfully"}), 200
+
+def _available_to_cart(product, cart_id):
+    """Stock this cart could take: what is on the shelf plus what the cart already holds."""
+    hold = db.session.get(StockReservation, (cart_id, product.product_id))
+    on_shelf = shard_totals(db.session, [product.product_id]).get(product.product_id, 0) \
+        if product.stock_sharded else product.stock_quantity
+    return on_shelf + (hold.quantity if hold else 0)
@@ -0,0 +1,75 @@
+"""
+Category routes for the Flask application.
+
+Browses the category hierarchy and lists the products of a category
+together with all of its subcategories. Both names are returned in
+English and Arabic, like the product routes.
+"""
+from flask import Blueprint, current_app, request, jsonify
+from app.services.catalog_cache import catalog_cache
+from app.services.category_tree import category_tree
+from app.services.product_listing import (ListingError, conditional_json_response, list_products_page,
+                                          listing_response, parse_listing_args)
+import logging
+
+logger = logging.getLogger(__name__)
+
+categories_bp = Blueprint('categories', __name__, url_prefix='/api/categories')
+
+
+@categories_bp.route('', methods=['GET'])
+def get_categories():
+    """
+    Returns the whole category tree as nested objects, each with its 'children'
+    and 'product_count' (active products in the category and its descendants).
+
+    Served from a snapshot rebuilt only when the catalog version changes, with
+    ETag / Last-Modified revalidation answered by 304.
+    """
+    try:
+        snapshot = catalog_cache.get('categories', lambda: current_app.json.dumps_bytes(
+            {"categories": category_tree.roots()}))
+        return conditional_json_response(snapshot.body, snapshot.etag, snapshot.last_modified)
+    except Exception as e:
+        logger.error("Error fetching categories.", exc_info=True)
+        return jsonify({"error": "An error occurred while fetching categories."}), 500
+
+
+@categories_bp.route('/<int:category_id>', methods=['GET'])
+def get_category(category_id):
+    """
+    Returns a category with its nested subcategories and its 'path' of ancestors from the root.
+    """
+    try:
+        if not category_tree.exists(category_id):
+            return jsonify({"error": "Category not found"}), 404
+        snapshot = catalog_cache.get(f'category:{category_id}', lambda: current_app.json.dumps_bytes(
+            category_tree.subtree(category_id)))
+        return conditional_json_response(snapshot.body, snapshot.etag, snapshot.last_modified)
+    except Exception as e:
+        logger.error(f"Error fetching category ID {category_id}.", exc_info=True)
+        return jsonify({"error": "An error occurred while fetching the category."}), 500
+
+
+@categories_bp.route('/<int:category_id>/products', methods=['GET'])
+def get_category_products(category_id):
+    """
+    Lists active products in the category and all of its descendants, at any depth.
+
+    Takes the same keyset pagination, filter and projection parameters as
+    GET /api/products (?limit, &after_id / &cursor, &brand, &min_price,
+    &max_price, &fields); 'category_id' narrows the page to one category
+    of the subtree. Each page is a single indexed query on the category
+    closure table.
+    """
+    if not category_tree.exists(category_id):
+        return jsonify({"error": "Category not found"}), 404
+    try:
+        listing_args = parse_listing_args(request.args)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return listing_response(*list_products_page(subtree_category_id=category_id, **listing_args))
+    except Exception as e:
+        logger.error(f"Error fetching products of category ID {category_id}.", exc_info=True)
+        return jsonify({"error": "An error occurred while fetching products."}), 500
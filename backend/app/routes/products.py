@@ -4,44 +4,83 @@ Product-related routes for the Flask application.
 Handles listing, searching, and retrieving details for products
 with full bilingual support - returns both English and Arabic names.
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from app.models.product import Product
 from app import db
-from sqlalchemy import or_
+from app.services.catalog_cache import catalog_cache
+from app.services.product_index import product_index
+from app.services.product_search import search_products_ranked
+from app.services.product_listing import (LIST_QUERY_PARAMS, ListingError, conditional_json_response,
+                                          list_products_page, listing_response, parse_listing_args)
+from app.services.product_serializer import json_object, product_fragments
+from app.services.semantic_search import semantic_index
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Page size bounds for product search results
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 200
+SEARCH_MODES = ('keyword', 'semantic')
+
 products_bp = Blueprint('products', __name__, url_prefix='/api/products')
 
+
+def _active_products_in_order(product_ids):
+    """Loads active products by id, preserving the given ranking."""
+    if not product_ids:
+        return []
+    rank = {product_id: position for position, product_id in enumerate(product_ids)}
+    products = Product.query.filter(Product.product_id.in_(rank.keys()), Product.is_active == True).all()
+    products.sort(key=lambda p: rank[p.product_id])
+    return products
+
+
+def _serialize_active_products():
+    """
+    Serializes every active product for the /api/products response body,
+    leaving the stock open to be filled in per request.
+    """
+    products = Product.query.filter_by(is_active=True).order_by(Product.product_id).all()
+    logger.info(f"Serializing {len(products)} products with bilingual data.")
+    return product_fragments.stock_template(products)
+
+
+def _active_stock():
+    """Current stock of every active product, in one narrow query."""
+    return dict(db.session.query(Product.product_id, Product.stock_quantity)
+                .filter(Product.is_active == True).all())
+
 @products_bp.route('', methods=['GET'])
 def get_products():
     """
     Retrieve a list of all active products with both English and Arabic names.
     Returns both language versions so frontend can display title/subtitle.
+
+    Without parameters the whole catalog is returned from a snapshot cache
+    that is rebuilt only when the catalog version changes; only the stock is
+    read per request. Any of these
+    parameters switches to keyset pagination ordered by product_id:
+    ?limit=N (default 50, max 200)
+    &after_id=ID or &cursor=ID (the 'next_cursor' of the previous page)
+    &category_id=ID&brand=NAME&min_price=X&max_price=Y (filters)
+    &fields=product_id,name_en,price (projection; product_id is always included)
+
+    Responses carry an ETag, and If-None-Match revalidation is answered with 304.
     """
-    logger.info("Fetching all active products with bilingual support")
     try:
-        products = Product.query.filter_by(is_active=True).all()
-        result = []
-        for product in products:
-            result.append({
-                'product_id': product.product_id,
-                'name_en': product.name_en,
-                'name_ar': product.name_ar,
-                'description_en': product.description_en,
-                'description_ar': product.description_ar,
-                'price': float(product.price),
-                'brand': product.brand,
-                'stock_quantity': product.stock_quantity,
-                'unit_type': product.unit_type,
-                'image_url': product.image_url,
-                'category_id': product.category_id,
-                'is_active': product.is_active
-            })
-        
-        logger.info(f"Successfully fetched {len(result)} products with bilingual data.")
-        return jsonify({"products": result}), 200
+        if not any(param in request.args for param in LIST_QUERY_PARAMS):
+            snapshot = catalog_cache.get('products', _serialize_active_products)
+            body = json_object(products=snapshot.body.render(_active_stock()))
+            # Stock changes do not move the catalog's Last-Modified, so only the ETag is sent
+            return conditional_json_response(body, hashlib.sha1(body).hexdigest()[:20])
+
+        try:
+            listing_args = parse_listing_args(request.args)
+        except ListingError as e:
+            return jsonify({"error": str(e)}), 400
+        return listing_response(*list_products_page(**listing_args))
     except Exception as e:
         logger.error("Error fetching products.", exc_info=True)
         return jsonify({"error": "An error occurred while fetching products."}), 500
@@ -50,52 +89,46 @@ def get_products():
 def search_products():
     """
     Search for active products in both English and Arabic.
-    Returns bilingual results regardless of search language.
+    Returns bilingual results regardless of search language, best match first.
     ?q=search_term&lang=en/ar (lang used to determine which fields to search in)
+    &limit=N&offset=M (optional paging of the ranked results)
+    &mode=keyword|semantic (semantic matches by meaning and across languages,
+    e.g. "حليب" finds "Milk" and "breakfast" finds cereal)
     """
     query_param = request.args.get('q', '')
     lang = request.args.get('lang', 'en').lower()
+    mode = request.args.get('mode', 'keyword').lower()
 
     if not query_param:
         return jsonify({"error": "Search query parameter 'q' is required."}), 400
+    if mode not in SEARCH_MODES:
+        return jsonify({"error": f"'mode' must be one of: {', '.join(SEARCH_MODES)}."}), 400
 
-    logger.info(f"Searching for '{query_param}' in language context: {lang}")
     try:
-        search_filter = Product.is_active == True
-        
-        if lang == 'ar':
-            # Search in Arabic fields but return bilingual results
-            search_filter = db.and_(search_filter, or_(
-                Product.name_ar.ilike(f"%{query_param}%"),
-                Product.description_ar.ilike(f"%{query_param}%")
-            ))
+        limit = min(int(request.args.get('limit', SEARCH_DEFAULT_LIMIT)), SEARCH_MAX_LIMIT)
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({"error": "'limit' and 'offset' must be integers."}), 400
+    if limit <= 0 or offset < 0:
+        return jsonify({"error": "'limit' must be positive and 'offset' non-negative."}), 400
+
+    logger.info(f"Searching for '{query_param}' in language context: {lang} (mode: {mode})")
+    try:
+        fuzzy_match = False
+        if mode == 'semantic':
+            matches = semantic_index.search(query_param, k=offset + limit)[offset:]
+            products = _active_products_in_order([m['product_id'] for m in matches])
         else:
-            # Search in English fields but return bilingual results
-            search_filter = db.and_(search_filter, or_(
-                Product.name_en.ilike(f"%{query_param}%"),
-                Product.description_en.ilike(f"%{query_param}%")
-            ))
-
-        products = Product.query.filter(search_filter).all()
-        result = []
-        for product in products:
-            result.append({
-                'product_id': product.product_id,
-                'name_en': product.name_en,
-                'name_ar': product.name_ar,
-                'description_en': product.description_en,
-                'description_ar': product.description_ar,
-                'price': float(product.price),
-                'brand': product.brand,
-                'stock_quantity': product.stock_quantity,
-                'unit_type': product.unit_type,
-                'image_url': product.image_url,
-                'category_id': product.category_id,
-                'is_active': product.is_active
-            })
-        
-        logger.info(f"Found {len(result)} products matching search criteria.")
-        return jsonify({"products": result}), 200
+            # Ranking, limit and offset are pushed into SQL and served by the search indexes
+            products = search_products_ranked(query_param, lang=lang, limit=limit, offset=offset)
+            if not products and offset == 0:
+                # Nothing contains the query verbatim; offer near-misses (typos, ASR errors)
+                candidates = product_index.fuzzy_search(query_param, limit=min(limit, 10))
+                products = _active_products_in_order([c['product_id'] for c in candidates])
+                fuzzy_match = bool(products)
+        logger.info(f"Found {len(products)} products matching search criteria (fuzzy: {fuzzy_match}).")
+        body = json_object(products=product_fragments.encode_list(products), fuzzy_match=fuzzy_match, mode=mode)
+        return current_app.response_class(body, mimetype='application/json'), 200
     except Exception as e:
         logger.error(f"Error during product search for query '{query_param}'.", exc_info=True)
         return jsonify({"error": "An error occurred during product search."}), 500
@@ -112,19 +145,5 @@ def get_product(product_id):
     if not product or not product.is_active:
         return jsonify({"error": "Product not found or is not active"}), 404
     
-    result = {
-        'product_id': product.product_id,
-        'name_en': product.name_en,
-        'name_ar': product.name_ar,
-        'description_en': product.description_en,
-        'description_ar': product.description_ar,
-        'price': float(product.price),
-        'brand': product.brand,
-        'stock_quantity': product.stock_quantity,
-        'unit_type': product.unit_type,
-        'image_url': product.image_url,
-        'category_id': product.category_id,
-        'is_active': product.is_active
-    }
-    
-    return jsonify(result), 200
\ No newline at end of file
+    body = product_fragments.fragment(product)
+    return current_app.response_class(body, mimetype='application/json'), 200
\ No newline at end of file
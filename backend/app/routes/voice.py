@@ -1,48 +1,207 @@
 # In backend/app/routes/voice.py
 
 from flask import Blueprint, request, jsonify, send_from_directory
-from pydub import AudioSegment
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 import os
 import tempfile
-import uuid
 import logging
 
 # --- Project-specific imports ---
 from app.services.language_service import detect_language
 from app.services.asr_service import WhisperASRService
 from app.services.nlu_service import RasaNLUService
-from app.services.tts_service import CoquiTTSService
+from app.services.tts_service import SPEAKER_MAP, TTS_OUTPUT_DIR, CoquiTTSService, save_as_mp3
 from app.services.checkout_service import process_checkout
-from app.models.product import Product
-from app.models.shopping_cart import ShoppingCart
-from app.models.cart_item import CartItem
+from app.services.order_confirmation import confirmation_audio_filename, confirmation_text
+from app.services.session_service import create_session_store
+from app.services.language_prior_service import LanguagePriorTracker
+from app.services.deadline import Deadline, deadline_for, bound_statement_timeout
+from app.services.admission import AdmissionPool, AdmissionRejected
+from app.services.single_flight import SingleFlight
+from app.services.product_index import MATCH_EXACT, product_index
+from app.services.semantic_search import semantic_index
+from app.services.popularity_service import popularity_ranker, usual_basket
+from app.services.cart_service import add_items, get_cart_summary
+from app.services.item_extraction import extract_items, parse_quantity
 from app import db
+from config import Config
+from sqlalchemy.exc import OperationalError
 
 # --- Initial Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-TTS_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'tts_output')
-os.makedirs(TTS_OUTPUT_DIR, exist_ok=True)
 
 # --- Blueprint and Service Instantiation ---
 voice_bp = Blueprint('voice', __name__, url_prefix='/api/voice')
 asr_service = WhisperASRService()
 nlu_service = RasaNLUService()
 tts_service = CoquiTTSService()
+session_store = create_session_store(Config)
+language_prior = LanguagePriorTracker()
 
-# This dictionary maps a language code to the chosen speaker ID.
-# 'Ana Florence' is a high-quality English voice.
-# 'Suad Qasim' is the corresponding high-quality Arabic voice.
-SPEAKER_MAP = {
-    "en": "Ana Florence",
-    "ar": "Suad Qasim"
-}
+# Separate bounded pools so Whisper and XTTS saturation are shed independently
+asr_pool = AdmissionPool("asr", Config.ASR_MAX_CONCURRENCY, Config.ASR_MAX_QUEUE, Config.ASR_MAX_WAIT_SECONDS)
+tts_pool = AdmissionPool("tts", Config.TTS_MAX_CONCURRENCY, Config.TTS_MAX_QUEUE, Config.TTS_MAX_WAIT_SECONDS)
 
-# --- Helper function for shared dialogue logic ---
-def _handle_dialogue_logic(transcript, customer_id):
+# Concurrent requests naming the same product share one lookup
+product_resolution_flight = SingleFlight("product_resolution")
+
+# How many search hits are kept in the dialogue context for follow-ups.
+SESSION_SEARCH_RESULTS_LIMIT = 5
+# How many equally good name matches are weighed by popularity when resolving a spoken name
+PRODUCT_CANDIDATES_LIMIT = 10
+
+# How many cart lines are read out by name in a spoken cart summary
+CART_SUMMARY_SPOKEN_ITEMS = 3
+
+# Minimum remaining budget (seconds) for a stage to use its full-quality path.
+# Below these thresholds the stage degrades instead of risking the deadline.
+ASR_FULL_DECODE_MIN_BUDGET = 6.0
+NLU_MIN_BUDGET = 1.0
+TTS_MIN_BUDGET = 3.0
+
+# --- Helpers for shared dialogue logic ---
+def _product_summary(match):
+    """
+    Returns the minimal product data kept in the dialogue context.
+    """
+    return {"product_id": match["product_id"], "name_en": match["name_en"], "name_ar": match["name_ar"]}
+
+def _lookup_candidates(item_name, language):
+    # Resolve the spoken name against the in-memory product-name index; no DB round-trip.
+    # Only the best match tier is kept: those are the genuinely ambiguous candidates.
+    matches = product_index.lookup(item_name, language=language, limit=PRODUCT_CANDIDATES_LIMIT)
+    return [_product_summary(m) for m in matches if m["match"] == matches[0]["match"]]
+
+def _resolve_product(item_name, language, customer_id=None):
+    """
+    Resolves a spoken product name to a product summary, or None.
+
+    When several products match equally well, the one this customer orders
+    most wins, then the most ordered overall. The candidate lookup is shared
+    between concurrent requests; the per-customer choice is not.
+    Only plain dicts cross the single-flight boundary, never ORM objects,
+    since each waiting request thread has its own DB session.
+    """
+    key = (language, item_name.strip().lower())
+    candidates = product_resolution_flight.do(key, _lookup_candidates, item_name, language)
+    if not candidates:
+        return None
+    return dict(popularity_ranker.rank(candidates, customer_id)[0])
+
+def _cart_summary_text(customer_id, language):
+    """
+    Describes the customer's cart (main lines and total) for a spoken reply.
+    """
+    summary = get_cart_summary(customer_id)
+    if not summary or not summary["items"]:
+        return "سلتك فارغة حالياً." if language == 'ar' else "Your cart is empty."
+
+    items = summary["items"]
+    if language == 'ar':
+        names = [f"{item['quantity']} {item['name_ar'] or item['name_en']}" for item in items[:CART_SUMMARY_SPOKEN_ITEMS]]
+        listed = "، ".join(names)
+        if len(items) > CART_SUMMARY_SPOKEN_ITEMS:
+            listed += f" و{len(items) - CART_SUMMARY_SPOKEN_ITEMS} منتجات أخرى"
+        return f"في سلتك {summary['item_count']} منتجات: {listed}. المبلغ الإجمالي هو {summary['total_price']:.2f} درهم."
+    names = [f"{item['quantity']} {item['name_en']}" for item in items[:CART_SUMMARY_SPOKEN_ITEMS]]
+    listed = ", ".join(names)
+    if len(items) > CART_SUMMARY_SPOKEN_ITEMS:
+        listed += f" and {len(items) - CART_SUMMARY_SPOKEN_ITEMS} more"
+    noun = "item" if summary['item_count'] == 1 else "items"
+    return f"You have {summary['item_count']} {noun} in your cart: {listed}. The total is AED {summary['total_price']:.2f}."
+
+def _is_product_name(language):
+    """
+    Returns a predicate telling whether a spoken span is itself a product name,
+    so names such as "salt and vinegar chips" are not split as a list.
+    """
+    def is_product_name(phrase):
+        matches = product_index.lookup(phrase, language=language, limit=1, fuzzy=False)
+        return bool(matches) and matches[0]["match"] == MATCH_EXACT
+    return is_product_name
+
+def _names_a_product(language):
+    """
+    Returns a predicate telling whether a spoken name matches any product
+    (exactly, by prefix or by all of its words), without fuzzy matching.
+    """
+    def names_a_product(phrase):
+        return bool(product_index.lookup(phrase, language=language, limit=1, fuzzy=False))
+    return names_a_product
+
+def _spoken_list(names, language, conjunction=None):
+    """
+    Joins names the way they are read out: "a, b and c" / "أ، ب و ج".
+    """
+    if language == 'ar':
+        conjunction = conjunction or "و"
+        return names[0] if len(names) == 1 else "، ".join(names[:-1]) + f" {conjunction}" + names[-1]
+    conjunction = conjunction or "and"
+    return names[0] if len(names) == 1 else ", ".join(names[:-1]) + f" {conjunction} " + names[-1]
+
+def _add_to_cart_text(added, refused, not_found, language):
+    """
+    Builds one confirmation for a (possibly multi-item) add to cart.
+
+    Args:
+        added (list): (product summary, quantity) pairs that were added.
+        refused (list): Product summaries refused for lack of stock.
+        not_found (list): Spoken names no product matched.
+    """
+    def display(product, quantity=1):
+        name = (product['name_ar'] or product['name_en']) if language == 'ar' else product['name_en']
+        return f"{quantity} {name}" if quantity > 1 else name
+
+    sentences = []
+    if language == 'ar':
+        if added:
+            sentences.append(f"تمام، لقد أضفت {_spoken_list([display(p, q) for p, q in added], language)} إلى سلتك.")
+        if refused:
+            sentences.append(f"عذراً، لا يمكن إضافة {_spoken_list([display(p) for p in refused], language)} "
+                             f"حالياً، الكمية المتوفرة غير كافية.")
+        if not_found:
+            quoted = _spoken_list([f"'{name}'" for name in not_found], language, "أو ")
+            sentences.append(f"عذراً، لم أجد منتجاً باسم {quoted}.")
+    else:
+        if added:
+            sentences.append(f"Okay, I've added {_spoken_list([display(p, q) for p, q in added], language)} to your cart.")
+        if refused:
+            sentences.append(f"Sorry, I can't add {_spoken_list([display(p) for p in refused], language)} "
+                             f"right now; there isn't enough in stock.")
+        if not_found:
+            quoted = _spoken_list([f"'{name}'" for name in not_found], language, "or")
+            sentences.append(f"Sorry, I couldn't find an item named {quoted}.")
+    return " ".join(sentences)
+
+def _parse_with_budget(transcript, language, deadline):
+    """
+    Runs NLU within the remaining budget, degrading to a cached or
+    keyword-based parse when Rasa cannot answer in time.
+    """
+    if deadline.has(NLU_MIN_BUDGET):
+        nlu_result = nlu_service.parse(transcript, language=language, timeout=deadline.timeout())
+        if nlu_result and "error" not in nlu_result:
+            return nlu_result
+        reason = "nlu_unavailable"
+    else:
+        reason = "nlu_budget_exhausted"
+
+    if language not in ("en", "ar"):
+        return None
+    cached = nlu_service.cached_parse(transcript, language=language)
+    if cached:
+        deadline.degrade(f"{reason}:cached_nlu")
+        return cached
+    deadline.degrade(f"{reason}:fast_path_nlu")
+    return nlu_service.fast_parse(transcript, language=language)
+
+def _handle_dialogue_logic(transcript, customer_id, deadline=None):
     """
     Handles NLU parsing, intent logic, and response generation.
+
+    Every stage runs within `deadline`; degradations are recorded on it.
     """
+    deadline = deadline or Deadline()
     response_text = ""
     order_id = None
     language = "en"  # Default language
@@ -54,7 +213,7 @@ def _handle_dialogue_logic(transcript, customer_id):
         language = detect_language(transcript)
         logging.info(f"Detected language: '{language}'.")
 
-        nlu_result = nlu_service.parse(transcript, language=language)
+        nlu_result = _parse_with_budget(transcript, language, deadline)
 
         if not nlu_result or "error" in nlu_result:
             logging.error("NLU service failed or returned an error.")
@@ -68,10 +227,29 @@ def _handle_dialogue_logic(transcript, customer_id):
             intent_name = intent.get("name", "N/A")
             logging.info(f"Rasa NLU Intent: '{intent_name}' (Confidence: {intent.get('confidence', 0.0):.2f})")
 
+            # Keep DB statements within what is left of the request budget
+            bound_statement_timeout(db.session, deadline)
+
             # --- Bilingual Intent Handling Logic ---
             if intent_name == "search_product":
                 entities = nlu_result.get("entities", [])
                 item_name = next((e['value'] for e in entities if e['entity'] == 'product_name'), None)
+                if item_name:
+                    # Keep the hits so a follow-up "add it to my cart" needs no new lookup
+                    matches = product_index.lookup(item_name, language=language, limit=SESSION_SEARCH_RESULTS_LIMIT)
+                    if matches:
+                        matches = popularity_ranker.rank(matches, customer_id)
+                    else:
+                        # No name matches: fall back to matching by meaning ("something for breakfast")
+                        related = semantic_index.search(item_name, k=SESSION_SEARCH_RESULTS_LIMIT)
+                        matches = product_index.summaries(m['product_id'] for m in related)
+                    found = [_product_summary(m) for m in matches]
+                    session_store.update_context(
+                        customer_id,
+                        language=language,
+                        last_search={"query": item_name, "products": found},
+                        last_products=found[:1]
+                    )
                 if language == 'ar':
                     response_text = f"جاري البحث عن {item_name}." if item_name else "عذراً، عن أي منتج تبحث؟"
                 else:
@@ -80,60 +258,80 @@ def _handle_dialogue_logic(transcript, customer_id):
             elif intent_name == "add_to_cart":
                 logging.info(f"Handling 'add_to_cart' intent for customer {customer_id}")
                 entities = nlu_result.get("entities", [])
-                item_name = next((e['value'] for e in entities if e['entity'] == 'product_name'), None)
+                # "Add milk, bread and two kilos of apples": every product with its quantity
+                items = extract_items(entities, language, keep_whole=_is_product_name(language),
+                                      resolves=_names_a_product(language))
+
+                # Names resolve against the in-memory index; no DB round-trip per item
+                requested, products, not_found = {}, {}, []
+                for item in items:
+                    product_data = _resolve_product(item['name'], language, customer_id)
+                    if product_data:
+                        products[product_data['product_id']] = product_data
+                        requested[product_data['product_id']] = requested.get(product_data['product_id'], 0) + item['quantity']
+                    else:
+                        not_found.append(item['name'])
+                if not items:
+                    # Follow-up such as "add two of these to my cart": resolve against the session context
+                    context = session_store.get_context(customer_id)
+                    last_products = context.get("last_products") or []
+                    if last_products:
+                        product_data = last_products[0]
+                        quantity = next((parse_quantity(e['value']) for e in entities if e['entity'] == 'quantity'
+                                         and parse_quantity(e['value'])), 1)
+                        products[product_data['product_id']] = product_data
+                        requested[product_data['product_id']] = quantity
+                        logging.info(f"Resolved follow-up to product {product_data['product_id']} from session context.")
 
-                if not item_name:
+                if requested:
+                    # Every line in one cart transaction
+                    result = add_items(customer_id, requested.items())
+                    added = [(products[line['product_id']], requested[line['product_id']]) for line in result['added']]
+                    refused = [products[line['product_id']] for line in result['failed']]
+                    for line in result['failed']:
+                        logging.info(f"Voice add to cart refused for customer {customer_id}: {line['error']}")
+                    session_store.update_context(customer_id, language=language,
+                                                 last_products=[p for p, _ in added] or refused)
+                    response_text = _add_to_cart_text(added, refused, not_found, language)
+                elif not items:
                     # If the user just says "add to cart" without specifying an item
                     response_text = "الرجاء تحديد المنتج الذي ترغب في إضافته." if language == 'ar' else "Please specify which item you'd like to add."
                 else:
-                    # Find the product in the database using the extracted name
-                    if language == 'ar':
-                        product_query = Product.query.filter(Product.name_ar.ilike(f'%{item_name}%'))
-                    else:
-                        product_query = Product.query.filter(Product.name_en.ilike(f'%{item_name}%'))
-                    
-                    product = product_query.first()
-
-                    if product:
-                        # Find or create the user's cart
-                        cart = ShoppingCart.query.filter_by(customer_id=customer_id).first()
-                        if not cart:
-                            cart = ShoppingCart(customer_id=customer_id)
-                            db.session.add(cart)
-                        
-                        # Check if the item is already in the cart
-                        cart_item = CartItem.query.filter_by(cart_id=cart.cart_id, product_id=product.product_id).first()
-                        if cart_item:
-                            cart_item.quantity += 1  # Increment quantity
-                        else:
-                            cart_item = CartItem(cart_id=cart.cart_id, product_id=product.product_id, quantity=1)
-                            db.session.add(cart_item)
-                        
-                        db.session.commit()
-                        
-                        # Generate confirmation response
-                        product_display_name = product.name_ar if language == 'ar' else product.name_en
-                        if language == 'ar':
-                            response_text = f"تمام، لقد أضفت {product_display_name} إلى سلتك."
-                        else:
-                            response_text = f"Okay, I've added {product_display_name} to your cart."
-                    else:
-                        # Product not found
-                        if language == 'ar':
-                            response_text = f"عذراً، لم أجد منتجاً باسم '{item_name}'."
-                        else:
-                            response_text = f"Sorry, I couldn't find an item named '{item_name}'."
-            
+                    # No product found
+                    response_text = _add_to_cart_text([], [], not_found, language)
+
+            elif intent_name == "reorder_usual":
+                logging.info(f"Adding the usual basket of customer {customer_id}")
+                # Read from the repeat-purchase index; no scan of past orders
+                basket = usual_basket(int(customer_id))
+                if basket:
+                    products = {item['product_id']: _product_summary(item) for item in basket}
+                    requested = {item['product_id']: item['quantity'] for item in basket}
+                    # The whole basket in one cart transaction
+                    result = add_items(customer_id, requested.items())
+                    added = [(products[line['product_id']], requested[line['product_id']]) for line in result['added']]
+                    refused = [products[line['product_id']] for line in result['failed']]
+                    for line in result['failed']:
+                        logging.info(f"Usual basket line refused for customer {customer_id}: {line['error']}")
+                    session_store.update_context(customer_id, language=language,
+                                                 last_products=[p for p, _ in added] or refused)
+                    response_text = _add_to_cart_text(added, refused, [], language)
+                elif language == 'ar':
+                    response_text = "لا أعرف طلبك المعتاد بعد. أخبرني بالمنتجات التي تريدها."
+                else:
+                    response_text = "I don't know your usual order yet. Tell me which items you'd like."
+
+            elif intent_name == "view_cart":
+                logging.info(f"Reading out the cart of customer {customer_id}")
+                response_text = _cart_summary_text(customer_id, language)
+
             elif intent_name == "go_to_checkout":
                 logging.info(f"User {customer_id} initiated checkout via voice.")
-                checkout_result = process_checkout(customer_id=customer_id)
+                # The spoken confirmation is synthesized after commit by the outbox worker
+                checkout_result = process_checkout(customer_id=customer_id, confirmation_language=language)
                 if checkout_result['success']:
                     order_id = checkout_result['order_id']
-                    total_amount = checkout_result['total_amount']
-                    if language == 'ar':
-                        response_text = f"تم تأكيد طلبك بنجاح. المبلغ الإجمالي هو {total_amount:.2f} درهم."
-                    else:
-                        response_text = f"Your order has been placed successfully. The total is AED {total_amount:.2f}."
+                    response_text = confirmation_text(checkout_result['total_amount'], language)
                 else:
                     error_msg = checkout_result.get('error', 'Please try again.')
                     response_text = f"فشلت عملية الدفع. {error_msg}" if language == 'ar' else f"Checkout failed. {error_msg}"
@@ -146,54 +344,110 @@ def _handle_dialogue_logic(transcript, customer_id):
 
     return response_text, nlu_result, order_id, language
 
+def _run_dialogue(transcript, customer_id, deadline):
+    """
+    Runs the dialogue logic, turning a DB statement timeout into a spoken apology.
+    """
+    try:
+        return _handle_dialogue_logic(transcript, customer_id, deadline)
+    except OperationalError as e:
+        db.session.rollback()
+        logging.error(f"Dialogue DB stage failed within the latency budget: {e}")
+        deadline.degrade("db_timeout")
+        language = detect_language(transcript) if transcript else "en"
+        if language == 'ar':
+            response_text = "عذراً، استغرق ذلك وقتاً طويلاً. الرجاء المحاولة مرة أخرى."
+        else:
+            response_text = "Sorry, that took too long. Please try again."
+        nlu_result = {"intent": {"name": "timeout_error"}, "entities": [], "transcript": transcript or ""}
+        return response_text, nlu_result, None, language
+
+def _synthesize_response_audio(response_text, language, deadline):
+    """
+    Synthesizes the spoken response and converts it to MP3.
+
+    Returns the MP3 filename, or None when there is no audio (TTS failed or
+    the remaining budget only allows a text-only response).
+    """
+    if not response_text:
+        return None
+    if not deadline.has(TTS_MIN_BUDGET):
+        deadline.degrade("text_only_response")
+        return None
+
+    # Select the speaker ID based on the detected language, defaulting to English
+    speaker_id = SPEAKER_MAP.get(language, SPEAKER_MAP["en"])
+
+    # The dialogue has already run (e.g. an item was added), so a saturated
+    # TTS pool degrades to a text-only reply rather than a 429.
+    try:
+        with tts_pool.slot(timeout=deadline.timeout()):
+            # Call the TTS service with the correct speaker ID
+            audio_response_data = tts_service.synthesize(response_text, language=language, speaker_idx=speaker_id,
+                                                         timeout=deadline.timeout())
+    except AdmissionRejected:
+        deadline.degrade("tts_shed")
+        return None
+    if not audio_response_data:
+        deadline.degrade("tts_unavailable")
+        return None
+
+    return save_as_mp3(audio_response_data, TTS_OUTPUT_DIR)
+
+def _response_audio(response_text, order_id, language, deadline):
+    """
+    The reply's MP3 filename: synthesized now, or, after a checkout, the
+    confirmation the outbox worker is writing (see order_confirmation).
+    """
+    if order_id is not None:
+        return confirmation_audio_filename(order_id, language)
+    return _synthesize_response_audio(response_text, language, deadline)
+
 # --- Main Production Route (Handles Audio Files) ---
 @voice_bp.route('/process', methods=['POST'])
 @jwt_required()
 def process_voice():
     customer_id = get_jwt_identity()
+    deadline = deadline_for(request.endpoint)
     
     if 'audio' not in request.files:
         return jsonify({"error": "No audio file part in the request"}), 400
 
+    # Turn requests away before any work when the TTS backlog is already full
+    tts_pool.check_capacity()
+
     audio_file = request.files['audio']
     with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
         audio_file.save(temp_audio.name)
         temp_audio_path = temp_audio.name
     
-    transcript = asr_service.transcribe(temp_audio_path)
-    os.remove(temp_audio_path)
+    # Force the profile language in Whisper when the customer's history agrees with it
+    forced_language = language_prior.choose_asr_language(customer_id, get_jwt().get("lang"))
+    try:
+        with asr_pool.slot(timeout=deadline.timeout()):
+            # Time spent queueing counts against the budget, so decide on the decode mode once admitted
+            fast_decode = not deadline.has(ASR_FULL_DECODE_MIN_BUDGET)
+            if fast_decode:
+                deadline.degrade("fast_asr_decode")
+            transcript = asr_service.transcribe(temp_audio_path, language=forced_language, fast=fast_decode)
+    finally:
+        os.remove(temp_audio_path)
     logging.info(f"Whisper Transcript: '{transcript}'")
 
-    response_text, nlu_result, order_id, language = _handle_dialogue_logic(transcript, customer_id)
-
-    audio_filename = None
-    if response_text:
-        # Select the speaker ID based on the detected language, defaulting to English
-        speaker_id = SPEAKER_MAP.get(language, SPEAKER_MAP["en"])
-        
-        # Call the TTS service with the correct speaker ID
-        audio_response_data = tts_service.synthesize(response_text, language=language, speaker_idx=speaker_id)
-        
-        if audio_response_data:
-            temp_wav_path = os.path.join(TTS_OUTPUT_DIR, f"{uuid.uuid4()}.wav")
-            with open(temp_wav_path, 'wb') as f: f.write(audio_response_data)
-            try:
-                sound = AudioSegment.from_wav(temp_wav_path)
-                audio_filename = f"{uuid.uuid4()}.mp3"
-                mp3_output_path = os.path.join(TTS_OUTPUT_DIR, audio_filename)
-                sound.export(mp3_output_path, format="mp3")
-                logging.info(f"Successfully converted audio to MP3: {audio_filename}")
-            except Exception as e:
-                logging.error(f"Failed to convert WAV to MP3: {e}")
-            finally:
-                if os.path.exists(temp_wav_path): os.remove(temp_wav_path)
+    response_text, nlu_result, order_id, language = _run_dialogue(transcript, customer_id, deadline)
+    if transcript and not forced_language:
+        language_prior.record(customer_id, language)
+
+    audio_filename = _response_audio(response_text, order_id, language, deadline)
 
     return jsonify({
         "nlu_result": nlu_result,
         "response_text": response_text,
         "audio_filename": audio_filename,
+        "audio_pending": order_id is not None,
         "order_id": order_id,
-        "detected_language": language
+        "detected_language": language,
+        "degradations": deadline.degradations
     })
 
 # --- Temporary Testing Route (Handles JSON Text) ---
@@ -201,44 +455,57 @@ def process_voice():
 @jwt_required()
 def process_text_for_testing():
     customer_id = get_jwt_identity()
+    deadline = deadline_for(request.endpoint)
     data = request.get_json()
 
     if not data or 'transcript' not in data:
         return jsonify({"error": "Request must be JSON with a 'transcript' field"}), 400
 
+    # Text requests skip ASR entirely; only shed them when the TTS backlog is full
+    tts_pool.check_capacity()
+
     transcript = data.get('transcript')
     logging.info(f"Received Text for Processing: '{transcript}'")
     
-    response_text, nlu_result, order_id, language = _handle_dialogue_logic(transcript, customer_id)
+    response_text, nlu_result, order_id, language = _run_dialogue(transcript, customer_id, deadline)
     
-    audio_filename = None
-    if response_text:
-        # Select the speaker ID based on the detected language, defaulting to English
-        speaker_id = SPEAKER_MAP.get(language, SPEAKER_MAP["en"])
-
-        # Call the TTS service with the correct speaker ID
-        audio_response_data = tts_service.synthesize(response_text, language=language, speaker_idx=speaker_id)
-
-        if audio_response_data:
-            temp_wav_path = os.path.join(TTS_OUTPUT_DIR, f"{uuid.uuid4()}.wav")
-            with open(temp_wav_path, 'wb') as f: f.write(audio_response_data)
-            try:
-                sound = AudioSegment.from_wav(temp_wav_path)
-                audio_filename = f"{uuid.uuid4()}.mp3"
-                mp3_output_path = os.path.join(TTS_OUTPUT_DIR, audio_filename)
-                sound.export(mp3_output_path, format="mp3")
-                logging.info(f"Successfully converted audio to MP3: {audio_filename}")
-            except Exception as e:
-                logging.error(f"Failed to convert WAV to MP3: {e}")
-            finally:
-                if os.path.exists(temp_wav_path): os.remove(temp_wav_path)
+    audio_filename = _response_audio(response_text, order_id, language, deadline)
 
     return jsonify({
         "nlu_result": nlu_result,
         "response_text": response_text,
         "audio_filename": audio_filename,
+        "audio_pending": order_id is not None,
         "order_id": order_id,
-        "detected_language": language
+        "detected_language": language,
+        "degradations": deadline.degradations
+    })
+
+@voice_bp.errorhandler(AdmissionRejected)
+def handle_admission_rejected(error):
+    """
+    Sheds load with a fast 429 and a Retry-After hint.
+    """
+    logging.warning(f"Voice request shed: {error}")
+    response = jsonify({"error": "The voice service is busy. Please try again shortly.",
+                        "retry_after": error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+# --- Pipeline metrics (admission queues and request coalescing) ---
+@voice_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+def get_voice_metrics():
+    return jsonify({
+        "admission": {
+            "asr": asr_pool.metrics(),
+            "tts": tts_pool.metrics()
+        },
+        "coalescing": {
+            "nlu": nlu_service.single_flight.metrics(),
+            "tts": tts_service.single_flight.metrics(),
+            "product_resolution": product_resolution_flight.metrics()
+        }
     })
 
 # --- Route to serve the generated audio files ---
@@ -0,0 +1,138 @@
+# In app/services/admission.py
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a pool cannot admit more work; maps to HTTP 429."""
+
+    def __init__(self, pool_name: str, retry_after: int, reason: str):
+        super().__init__(f"{pool_name} pool rejected request: {reason}")
+        self.pool_name = pool_name
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionPool:
+    """
+    A bounded concurrency pool with a bounded FIFO wait queue.
+
+    At most `max_concurrent` callers hold a slot at once. Up to `max_queue`
+    more wait for a slot, each for at most `max_wait_seconds`; anything
+    beyond that is rejected immediately so overload turns into fast 429s
+    instead of threads piling up inside Whisper or XTTS.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait_seconds: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._in_flight = 0
+        # Metrics
+        self._admitted = 0
+        self._rejected_queue_full = 0
+        self._rejected_timeout = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_service = 0.0
+        self._completed = 0
+
+    def _retry_after(self) -> int:
+        """Estimates when a slot frees up, from the average service time."""
+        average_service = self._total_service / self._completed if self._completed else 1.0
+        backlog = (len(self._waiters) + 1) / self.max_concurrent
+        return max(1, math.ceil(average_service * backlog))
+
+    def check_capacity(self) -> None:
+        """
+        Rejects up front when the wait queue is already full.
+
+        Used at request entry for work that will only need the pool later,
+        so a request is turned away before it causes any side effects.
+        """
+        with self._lock:
+            if self._in_flight >= self.max_concurrent and len(self._waiters) >= self.max_queue:
+                self._rejected_queue_full += 1
+                raise AdmissionRejected(self.name, self._retry_after(), "queue full")
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        Takes a slot, waiting in FIFO order if necessary.
+
+        Args:
+            timeout (float, optional): Wait limit; capped at `max_wait_seconds`.
+
+        Returns:
+            float: Seconds spent waiting in the queue.
+        """
+        wait_limit = self.max_wait_seconds if timeout is None else min(timeout, self.max_wait_seconds)
+        started = time.monotonic()
+        with self._lock:
+            if self._in_flight < self.max_concurrent and not self._waiters:
+                self._in_flight += 1
+                self._admitted += 1
+                return 0.0
+            if len(self._waiters) >= self.max_queue:
+                self._rejected_queue_full += 1
+                raise AdmissionRejected(self.name, self._retry_after(), "queue full")
+            granted = threading.Event()
+            self._waiters.append(granted)
+
+        granted.wait(wait_limit)
+        waited = time.monotonic() - started
+        with self._lock:
+            if not granted.is_set():
+                # Timed out; the slot may still be handed over right now, so re-check under the lock
+                self._waiters.remove(granted)
+                self._rejected_timeout += 1
+                raise AdmissionRejected(self.name, self._retry_after(), "wait timeout")
+            self._admitted += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        return waited
+
+    def release(self, service_seconds: float = 0.0) -> None:
+        with self._lock:
+            self._completed += 1
+            self._total_service += service_seconds
+            if self._waiters:
+                # Hand the slot straight to the oldest waiter; _in_flight is unchanged
+                self._waiters.popleft().set()
+            else:
+                self._in_flight -= 1
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """Context manager holding a slot for the duration of the block."""
+        self.acquire(timeout)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            admitted = self._admitted
+            return {
+                "in_flight": self._in_flight,
+                "queue_length": len(self._waiters),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "admitted": admitted,
+                "rejected_queue_full": self._rejected_queue_full,
+                "rejected_timeout": self._rejected_timeout,
+                "avg_wait_seconds": self._total_wait / admitted if admitted else 0.0,
+                "max_wait_seconds": self._max_wait,
+                "avg_service_seconds": self._total_service / self._completed if self._completed else 0.0,
+            }
@@ -6,6 +6,13 @@ import logging
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# A single greedy pass: no temperature fallback re-decodes and no conditioning
+# on previous windows. Noticeably faster on long or noisy clips.
+FAST_DECODE_OPTIONS = {
+    "temperature": 0.0,
+    "condition_on_previous_text": False,
+}
+
 class WhisperASRService:
     """
     A service class for handling audio transcription using OpenAI's Whisper.
@@ -30,7 +37,7 @@ class WhisperASRService:
         self.model = whisper.load_model(model_size)
         logger.info("Whisper model loaded and ready for multilingual transcription.")
 
-    def transcribe(self, audio_file_path: str, language: Optional[str] = None) -> Union[str, None]:
+    def transcribe(self, audio_file_path: str, language: Optional[str] = None, fast: bool = False) -> Union[str, None]:
         """
         Transcribes the audio from a given file path with optional language specification.
 
@@ -38,25 +45,28 @@ class WhisperASRService:
             audio_file_path (str): The path to the audio file to be transcribed.
             language (str, optional): Force a specific language ('en', 'ar', etc.). 
                                     If None, Whisper will auto-detect the language.
+            fast (bool): Use a single greedy decode without temperature fallback
+                         or the Arabic retry. Used when the latency budget is short.
 
         Returns:
             str: The transcribed text.
             None: If an error occurs during transcription.
         """
+        decode_options = FAST_DECODE_OPTIONS if fast else {}
         try:
             if language:
                 # Force specific language (crucial for Arabic)
                 logger.info(f"Transcribing with forced language: {language}")
-                result = self.model.transcribe(audio_file_path, language=language)
+                result = self.model.transcribe(audio_file_path, language=language, **decode_options)
             else:
                 # Auto-detect language
                 logger.info("Transcribing with auto-detection")
-                result = self.model.transcribe(audio_file_path)
+                result = self.model.transcribe(audio_file_path, **decode_options)
                 detected_lang = result.get('language', 'unknown')
                 logger.info(f"Auto-detected language: {detected_lang}")
                 
                 # If detected as English but might be Arabic, retry with Arabic
-                if detected_lang == 'en' and self._might_be_arabic(result["text"]):
+                if not fast and detected_lang == 'en' and self._might_be_arabic(result["text"]):
                     logger.info("Detected English but text appears to be Arabic, retrying with Arabic")
                     result = self.model.transcribe(audio_file_path, language='ar')
             
@@ -0,0 +1,254 @@
+# In app/services/cart_service.py
+"""
+Read and write paths of customers' shopping carts, shared by the REST and voice routes.
+
+Writes use PostgreSQL or SQLite (3.35+) upserts with RETURNING.
+"""
+import json
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import case, func, text
+
+from app import db
+from app.models.cart_item import CartItem
+from app.models.product import Product
+from app.models.shopping_cart import ShoppingCart
+from app.models.stock_reservation import StockReservation
+from app.services.stock_reservations import hold_stock
+from app.services.stock_shards import shard_totals
+
+logger = logging.getLogger(__name__)
+
+_MONEY = db.Numeric(12, 2)
+
+_UPSERT_CART = text("""
+    INSERT INTO shoppingcarts (customer_id, created_at, updated_at) VALUES (:customer_id, :now, :now)
+    ON CONFLICT (customer_id) DO UPDATE SET updated_at = excluded.updated_at
+    RETURNING cart_id
+""")
+
+# Adds to each wanted line, or inserts it; stock was already held for them.
+# ("WHERE true" keeps SQLite from reading ON CONFLICT as a join constraint.)
+_UPSERT_LINES = """
+    INSERT INTO cartitems (cart_id, product_id, quantity)
+    SELECT :cart_id, w.product_id, w.quantity FROM wanted w WHERE true
+    ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = cartitems.quantity + excluded.quantity
+    RETURNING cart_item_id, cart_id, product_id, quantity,
+        (SELECT name_en FROM products WHERE product_id = cartitems.product_id) AS product_name
+"""
+# The wanted lines arrive as two arrays on PostgreSQL, as a JSON array of pairs on SQLite
+_UPSERT_LINES_POSTGRESQL = text("""
+    WITH wanted (product_id, quantity) AS (
+        SELECT * FROM unnest(CAST(:product_ids AS integer[]), CAST(:quantities AS integer[]))
+    )
+""" + _UPSERT_LINES)
+_UPSERT_LINES_SQLITE = text("""
+    WITH wanted (product_id, quantity) AS (
+        SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(:lines)
+    )
+""" + _UPSERT_LINES)
+
+
+def get_cart_summary(customer_id: int) -> Optional[Dict]:
+    """
+    Loads a customer's cart, its lines and their products in one query.
+
+    Line subtotals and the cart totals are computed by the database (window
+    aggregates over the joined rows), so the query count is constant
+    whatever the size of the cart.
+
+    Args:
+        customer_id (int): The cart owner.
+
+    Returns:
+        dict or None: None if the customer has no cart; otherwise cart_id,
+            customer_id, items (each with cart_item_id, product_id, name_en,
+            name_ar, price_per_unit, quantity, unit_type, image_url and
+            subtotal), item_count, total_units and total_price. Money values
+            are Decimals.
+    """
+    subtotal = Product.price * CartItem.quantity
+    rows = db.session.query(
+        ShoppingCart.cart_id, ShoppingCart.customer_id,
+        CartItem.cart_item_id, CartItem.product_id, CartItem.quantity,
+        Product.product_id.label('found_product_id'), Product.name_en, Product.name_ar, Product.price,
+        Product.unit_type, Product.image_url,
+        subtotal.cast(_MONEY).label('subtotal'),
+        func.sum(subtotal).over().cast(_MONEY).label('total_price'),
+        func.count(Product.product_id).over().label('item_count'),
+        # Lines whose product is missing are left out of every total
+        func.sum(case((Product.product_id.isnot(None), CartItem.quantity))).over().label('total_units'),
+    ).outerjoin(CartItem, CartItem.cart_id == ShoppingCart.cart_id) \
+        .outerjoin(Product, Product.product_id == CartItem.product_id) \
+        .filter(ShoppingCart.customer_id == customer_id) \
+        .order_by(CartItem.cart_item_id).all()
+
+    if not rows:
+        return None
+    first = rows[0]
+    items = []
+    for row in rows:
+        if row.cart_item_id is None:
+            continue  # The cart has no lines
+        if row.found_product_id is None:
+            logger.warning(f"Data integrity issue: Product ID {row.product_id} found in cart (cart_item_id: "
+                           f"{row.cart_item_id}, cart_id: {row.cart_id}) but no matching product in products table.")
+            continue
+        items.append({
+            "cart_item_id": row.cart_item_id,
+            "product_id": row.product_id,
+            "name_en": row.name_en,
+            "name_ar": row.name_ar,
+            "price_per_unit": row.price,
+            "quantity": row.quantity,
+            "unit_type": row.unit_type,
+            "image_url": row.image_url,
+            "subtotal": row.subtotal,
+        })
+    return {
+        "cart_id": first.cart_id,
+        "customer_id": first.customer_id,
+        "items": items,
+        "item_count": first.item_count or 0,
+        "total_units": first.total_units or 0,
+        "total_price": first.total_price if items else Decimal('0.00'),
+    }
+
+
+def add_items(customer_id: int, lines: Iterable[Tuple[int, int]]) -> Dict:
+    """
+    Adds several products to the customer's cart in one transaction and commits.
+
+    The cart upsert locks the cart row; the added units are then held for
+    the cart in one batched stock statement (see stock_reservations), and
+    the lines of the products that could be held are inserted or
+    incremented by one upsert relying on the unique (cart_id, product_id)
+    constraint. Lines that cannot be added are reported without
+    preventing the others.
+
+    Args:
+        customer_id (int): The cart owner.
+        lines (iterable): (product_id, quantity) pairs; quantities must be
+            positive, and repeated products are summed.
+
+    Returns:
+        dict: "added" (dicts with cart_item_id, cart_id, product_id,
+            product_name and the line's new total "quantity") and "failed"
+            (dicts with product_id, error and status_code), both in the
+            order the products were first given.
+    """
+    wanted: Dict[int, int] = {}
+    for product_id, quantity in lines:
+        wanted[int(product_id)] = wanted.get(int(product_id), 0) + int(quantity)
+    if not wanted:
+        return {"added": [], "failed": []}
+
+    now = datetime.utcnow()
+    try:
+        cart_id = db.session.execute(_UPSERT_CART, {"customer_id": customer_id, "now": now}).scalar()
+        in_cart = dict(db.session.query(CartItem.product_id, CartItem.quantity)
+                       .filter(CartItem.cart_id == cart_id, CartItem.product_id.in_(list(wanted))).all())
+        held = hold_stock(db.session, cart_id, {product_id: in_cart.get(product_id, 0) + quantity
+                                                for product_id, quantity in wanted.items()}, now=now)
+        rows = _upsert_lines(cart_id, {product_id: wanted[product_id] for product_id in wanted if product_id in held})
+        added = {row.product_id: row for row in rows}
+        failed = {product_id: quantity for product_id, quantity in wanted.items() if product_id not in added}
+        failures = _explain_failures(cart_id, failed) if failed else {}
+        if added:
+            db.session.commit()
+        else:
+            db.session.rollback()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {
+        "added": [{"cart_item_id": added[product_id].cart_item_id, "cart_id": added[product_id].cart_id,
+                   "product_id": product_id, "product_name": added[product_id].product_name,
+                   "quantity": added[product_id].quantity}
+                  for product_id in wanted if product_id in added],
+        "failed": [dict(failures[product_id], product_id=product_id) for product_id in wanted if product_id in failed],
+    }
+
+
+def add_item(customer_id: int, product_id: int, quantity: int = 1) -> Dict:
+    """
+    Adds `quantity` of one product to the customer's cart and commits (see `add_items`).
+
+    Returns:
+        dict: {"success": True, "cart_item_id", "cart_id", "product_id",
+            "product_name", "quantity" (the line's new total)} or
+            {"success": False, "error", "status_code"}.
+    """
+    result = add_items(customer_id, [(product_id, quantity)])
+    if result["added"]:
+        return dict(result["added"][0], success=True)
+    failure = result["failed"][0]
+    return {"success": False, "error": failure["error"], "status_code": failure["status_code"]}
+
+
+def set_line_quantity(cart_item: CartItem, quantity: int) -> bool:
+    """
+    Sets a cart line's quantity, holding or giving back the difference in stock.
+
+    A quantity of 0 deletes the line and releases its hold. The caller
+    commits, and must hold the cart's row lock (see `lock_cart`).
+
+    Returns:
+        bool: False if the product cannot be held at that quantity; nothing is changed then.
+    """
+    if not hold_stock(db.session, cart_item.cart_id, {cart_item.product_id: quantity}):
+        return False
+    if quantity:
+        cart_item.quantity = quantity
+    else:
+        db.session.delete(cart_item)
+    return True
+
+
+def lock_cart(customer_id) -> Optional[ShoppingCart]:
+    """Loads the customer's cart, locking its row until commit (a no-op lock on SQLite)."""
+    return ShoppingCart.query.filter_by(customer_id=customer_id).with_for_update().first()
+
+
+def _upsert_lines(cart_id, quantities: Dict[int, int]):
+    """Adds `quantities` to the cart's lines, creating them as needed; returns the new lines."""
+    if not quantities:
+        return []
+    dialect = db.session.bind.dialect.name
+    if dialect == 'postgresql':
+        return db.session.execute(_UPSERT_LINES_POSTGRESQL, {
+            "cart_id": cart_id, "product_ids": list(quantities), "quantities": list(quantities.values())}).fetchall()
+    return db.session.execute(_UPSERT_LINES_SQLITE, {
+        "cart_id": cart_id, "lines": json.dumps(list(quantities.items()))}).fetchall()
+
+
+def _explain_failures(cart_id, failed: Dict[int, int]) -> Dict[int, Dict]:
+    """Explains why lines were refused, in one query; only runs on the failure path."""
+    rows = db.session.query(Product.product_id, Product.name_en, Product.is_active, Product.stock_quantity,
+                            Product.stock_sharded, CartItem.quantity, StockReservation.quantity.label('held')) \
+        .select_from(Product) \
+        .outerjoin(CartItem, (CartItem.cart_id == cart_id) & (CartItem.product_id == Product.product_id)) \
+        .outerjoin(StockReservation, (StockReservation.cart_id == cart_id)
+                   & (StockReservation.product_id == Product.product_id)) \
+        .filter(Product.product_id.in_(list(failed))).all()
+    found = {row.product_id: row for row in rows}
+    live = shard_totals(db.session, [row.product_id for row in rows if row.stock_sharded])
+    failures = {}
+    for product_id, quantity in failed.items():
+        row = found.get(product_id)
+        if row is None:
+            failures[product_id] = {"error": f"Product with ID {product_id} not found.", "status_code": 404}
+        elif not row.is_active:
+            failures[product_id] = {"error": f"Product '{row.name_en}' is currently unavailable.", "status_code": 400}
+        else:
+            in_cart = row.quantity or 0
+            requested = f"Requested total: {in_cart + quantity}" if in_cart else f"Requested: {quantity}"
+            # Units this cart already holds are available to it
+            available = live.get(product_id, 0) if row.stock_sharded else row.stock_quantity
+            failures[product_id] = {"status_code": 400,
+                                    "error": f"Insufficient stock for '{row.name_en}'. {requested}, "
+                                             f"Available: {available + (row.held or 0)}"}
+    return failures
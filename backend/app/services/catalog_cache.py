@@ -0,0 +1,130 @@
+# In app/services/catalog_cache.py
+"""
+Versioned, pre-serialized catalog responses shared by all requests of a worker.
+
+The catalog_version row (see catalog_events) is the source of truth for
+whether a worker's in-memory copies are current. Checking it is throttled
+to once per `check_interval_seconds`, and a commit made by this worker
+forces the next check, so most requests touch neither the database nor the
+serializer.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.exc import DBAPIError
+
+from app import db
+from app.services import catalog_events
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CatalogSnapshot = namedtuple('CatalogSnapshot', ['body', 'etag', 'last_modified', 'version'])
+
+
+class CatalogVersionTracker:
+    """
+    Throttled reader of the shared catalog version.
+
+    `current_version()` returns None when the version cannot be read (for
+    instance before the migration creating it has been applied); callers
+    then treat their caches as unversioned.
+    """
+
+    def __init__(self, check_interval_seconds: float = 2.0):
+        self.check_interval_seconds = check_interval_seconds
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._version: Optional[int] = None
+        self._updated_at: Optional[datetime] = None
+
+    def _refresh(self) -> None:
+        from app.models.catalog_version import CatalogVersion
+
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval_seconds:
+            return
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval_seconds:
+                return
+            try:
+                row = db.session.query(CatalogVersion.version, CatalogVersion.updated_at) \
+                    .filter(CatalogVersion.id == 1).first()
+            except DBAPIError:
+                db.session.rollback()
+                logger.warning("Catalog version unavailable; catalog caches are disabled. "
+                               "Run 'flask db upgrade' to create it.", exc_info=True)
+                row = None
+            self._version, self._updated_at = (row.version, row.updated_at) if row else (None, None)
+            self._checked_at = now
+
+    def current_version(self) -> Optional[int]:
+        self._refresh()
+        return self._version
+
+    def last_modified(self) -> Optional[datetime]:
+        self._refresh()
+        return self._updated_at
+
+    def expire(self, *args) -> None:
+        """Forces the next call to read the version again (e.g. after a local commit)."""
+        self._checked_at = None
+
+
+class CatalogSnapshotCache:
+    """
+    Serialized catalog responses, keyed by response shape, each valid for one catalog version.
+
+    The ETag is derived from the body itself, so every worker serving the
+    same catalog hands out the same tag. A snapshot whose body is not bytes
+    (e.g. a product_serializer.StockTemplate completed per request) has no
+    ETag; the caller derives it from the completed response.
+    """
+
+    def __init__(self, tracker: CatalogVersionTracker):
+        self.tracker = tracker
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, CatalogSnapshot] = {}
+
+    def get(self, key: str, build: Callable[[], bytes]) -> CatalogSnapshot:
+        """
+        Returns the cached snapshot for `key`, rebuilding it if the catalog changed.
+
+        Args:
+            key (str): Identifies the response shape (e.g. 'products').
+            build (callable): Produces the serialized response body (or a template of it).
+
+        Returns:
+            CatalogSnapshot: body, etag, last_modified and version.
+        """
+        version = self.tracker.current_version()
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and version is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None and version is not None and snapshot.version == version:
+                return snapshot
+            body = build()
+            etag = hashlib.sha1(body).hexdigest()[:20] if isinstance(body, bytes) else None
+            snapshot = CatalogSnapshot(body=body, etag=etag,
+                                       last_modified=self.tracker.last_modified(), version=version)
+            if version is not None:
+                self._snapshots[key] = snapshot
+            logger.info(f"Catalog snapshot '{key}' built for version {version}.")
+            return snapshot
+
+    def clear(self, *args) -> None:
+        with self._lock:
+            self._snapshots.clear()
+
+
+catalog_version = CatalogVersionTracker(check_interval_seconds=Config.CATALOG_VERSION_CHECK_SECONDS)
+catalog_cache = CatalogSnapshotCache(catalog_version)
+catalog_events.subscribe(catalog_version.expire, catalog_version.expire)
+catalog_events.subscribe(catalog_cache.clear, catalog_cache.clear)
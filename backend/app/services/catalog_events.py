@@ -0,0 +1,135 @@
+# In app/services/catalog_events.py
+"""
+Committed product changes, fanned out to in-process catalog caches.
+
+ORM writes to products are captured at flush time and dispatched only
+after the transaction commits, so subscribers never see rolled-back
+changes. Each change is a tuple ``(kind, product_id, data)`` where kind is
+'upsert' (data holds the product's column values) or 'delete' (data is None).
+
+The first product write of a transaction also bumps the shared
+catalog_version row in that transaction; subscribers receive the new
+version with the changes, and other workers notice it via
+catalog_cache.CatalogVersionTracker.
+
+Other catalog tables (e.g. categories, see category_tree) call
+`record_catalog_write` from their own listeners: their commits bump the
+version and reach subscribers with an empty change list.
+
+Bulk Core statements bypass the ORM and therefore these events; code that
+issues them must call `bump_catalog_version` in its transaction and
+`notify_catalog_reload` after committing. Stock moved by cart holds and
+checkout is deliberately not published (see stock_reservations); cached
+product JSON leaves stock out and reads it live (see product_serializer).
+"""
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+CatalogChange = Tuple[str, int, Optional[Dict]]
+
+_subscribers: List[Callable[[List[CatalogChange], Optional[int]], None]] = []
+_reload_subscribers: List[Callable[[], None]] = []
+_listeners_registered = False
+
+_PENDING_KEY = 'catalog_changes'
+_VERSION_KEY = 'catalog_version'
+
+
+def subscribe(on_changes: Callable[[List[CatalogChange], Optional[int]], None],
+              on_reload: Callable[[], None] = None) -> None:
+    """
+    Registers a cache to be told about committed product changes.
+
+    Args:
+        on_changes: Called with the list of changes and the catalog version
+            they produced after each commit touching the catalog.
+        on_reload (optional): Called when the whole catalog must be reloaded.
+    """
+    _subscribers.append(on_changes)
+    if on_reload:
+        _reload_subscribers.append(on_reload)
+
+
+def notify_catalog_reload() -> None:
+    """Tells every subscriber to drop its state and reload the whole catalog."""
+    for callback in _reload_subscribers:
+        try:
+            callback()
+        except Exception:
+            logger.error("Catalog reload subscriber failed.", exc_info=True)
+
+
+def bump_catalog_version(connection) -> int:
+    """
+    Increments the catalog version inside the connection's transaction.
+
+    Returns:
+        int: The new version.
+    """
+    from app.models.catalog_version import CatalogVersion
+
+    table = CatalogVersion.__table__
+    connection.execute(table.update().where(table.c.id == 1)
+                       .values(version=table.c.version + 1, updated_at=datetime.utcnow()))
+    return connection.execute(select(table.c.version).where(table.c.id == 1)).scalar()
+
+
+def _snapshot(product) -> Dict:
+    return {column.key: getattr(product, column.key) for column in product.__table__.columns}
+
+
+def record_catalog_write(connection, session) -> None:
+    """
+    Bumps the catalog version for the session's transaction, once per transaction.
+
+    Called from flush-time listeners of any table whose rows are part of the
+    cached catalog.
+    """
+    if _VERSION_KEY not in session.info:
+        # One bump per transaction; the row lock is held only until commit
+        session.info[_VERSION_KEY] = bump_catalog_version(connection)
+
+
+def _record(connection, session, kind: str, product) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    pending[product.product_id] = (kind, product.product_id, _snapshot(product) if kind == 'upsert' else None)
+    record_catalog_write(connection, session)
+
+
+def _after_commit(session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    version = session.info.pop(_VERSION_KEY, None)
+    if not pending and version is None:
+        return
+    changes = list(pending.values()) if pending else []
+    for callback in _subscribers:
+        try:
+            callback(changes, version)
+        except Exception:
+            logger.error("Catalog change subscriber failed.", exc_info=True)
+
+
+def _after_rollback(session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_VERSION_KEY, None)
+
+
+def register_catalog_listeners() -> None:
+    """Installs the ORM and session listeners once per process."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    from app.models.product import Product
+
+    event.listen(Product, 'after_insert', lambda mapper, connection, target: _record(connection, Session.object_session(target), 'upsert', target))
+    event.listen(Product, 'after_update', lambda mapper, connection, target: _record(connection, Session.object_session(target), 'upsert', target))
+    event.listen(Product, 'after_delete', lambda mapper, connection, target: _record(connection, Session.object_session(target), 'delete', target))
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_rollback', _after_rollback)
+    _listeners_registered = True
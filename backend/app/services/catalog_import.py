@@ -0,0 +1,389 @@
+# In app/services/catalog_import.py
+"""
+Streaming bulk import of supplier catalogs from CSV or JSON Lines.
+
+Rows are read one at a time, validated, and written in batches keyed by
+products.supplier_sku: one executemany of INSERT ... ON CONFLICT DO UPDATE
+(see upsert.py) and one transaction per batch, so memory is bounded by the
+batch size whatever the size of the file. In update-only mode (nightly
+price and stock feeds) existing products are updated with one executemany
+UPDATE per batch and unknown SKUs are counted and skipped.
+
+Imported stock is the supplier's on-hand count. products.stock_quantity
+holds the stock still available to new carts, so the units held by carts
+(stock_reservations, given back by the sweeper or turned into orders) are
+subtracted from the imported value in the same statement that writes it.
+The stock of a flash-sale product with sharded stock lives in its shards,
+which are rewritten from the imported value (see stock_shards) in the
+same transaction, so the consolidator does not overwrite it.
+
+Database search indexes follow the rows through their triggers and
+generated columns. The in-process catalog caches are not told about each
+batch: the catalog version is bumped and the caches reloaded once, after
+the last batch, together with a refresh of the search index statistics.
+"""
+import csv
+import json
+import logging
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, literal_column, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.services.catalog_events import bump_catalog_version, notify_catalog_reload
+from app.services.stock_shards import set_sharded_stock
+from app.services.upsert import upsert
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+# Product columns an import may set; columns missing from a row are left untouched
+IMPORT_COLUMNS = ('name_en', 'name_ar', 'description_en', 'description_ar', 'price', 'brand',
+                  'stock_quantity', 'unit_type', 'image_url', 'is_active')
+# A full import must be able to insert every row
+REQUIRED_COLUMNS = ('name_en', 'price', 'category_id')
+# Empty cells in these columns leave the stored value untouched
+TYPED_COLUMNS = ('price', 'stock_quantity', 'is_active')
+MAX_REPORTED_ERRORS = 20
+PROGRESS_EVERY_ROWS = 10000
+
+_TRUE = {'1', 'true', 'yes', 'y'}
+_FALSE = {'0', 'false', 'no', 'n'}
+
+
+class RowError(ValueError):
+    """Raised for an invalid input row; the row is skipped and reported."""
+
+
+class ImportReport:
+    """
+    Counters of one import run.
+
+    Attributes:
+        rows_read (int): Data rows read from the input.
+        imported (int): Rows written (inserted or updated).
+        unknown (int): Update-only rows whose SKU matched no product.
+        invalid (int): Rows skipped because they failed validation.
+        errors (list): (line number, message) of the first invalid rows.
+        elapsed (float): Wall-clock seconds of the run.
+    """
+
+    def __init__(self):
+        self.rows_read = 0
+        self.imported = 0
+        self.unknown = 0
+        self.invalid = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.rows_read} rows read, {self.imported} imported, {self.unknown} unknown SKUs, "
+                f"{self.invalid} invalid in {self.elapsed:.1f}s ({self.rows_per_second:.0f} rows/s)")
+
+
+def detect_format(path: str) -> Optional[str]:
+    """Guesses the input format from a file name ('.csv', '.jsonl' or '.ndjson')."""
+    lowered = path.lower()
+    if lowered.endswith('.csv'):
+        return 'csv'
+    if lowered.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return None
+
+
+def read_records(stream, fmt: str) -> Iterator[Tuple[int, object]]:
+    """
+    Lazily yields (line number, record) from an open text stream.
+
+    CSV records are dicts keyed by the header row; JSON Lines records are
+    the raw lines, decoded during validation so a bad line only skips itself.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                yield line_number, line
+    else:
+        raise ValueError(f"Unsupported import format '{fmt}'; expected one of: {', '.join(IMPORT_FORMATS)}.")
+
+
+class CatalogImporter:
+    """
+    Validates catalog rows and upserts them in batches.
+
+    Args:
+        session: The SQLAlchemy session to write with; each batch is committed.
+        batch_size (int): Rows per statement and per transaction.
+        update_only (bool): Only update products whose SKU already exists.
+    """
+
+    def __init__(self, session, batch_size: int = None, update_only: bool = False):
+        from app.models.product import Product
+        from app.models.stock_reservation import StockReservation
+
+        self.session = session
+        self.table = Product.__table__
+        holds = StockReservation.__table__
+        # Units carts hold of the product being written. The product column is named
+        # literally: SQLAlchemy does not correlate with the target row of ON CONFLICT DO UPDATE
+        self._held_units = select(func.coalesce(func.sum(holds.c.quantity), 0)) \
+            .where(holds.c.product_id == literal_column(f'{self.table.name}.product_id')).scalar_subquery()
+        self.update_only = update_only
+        self.dialect = session.bind.dialect.name
+        self.batch_size = batch_size or Config.CATALOG_IMPORT_BATCH_SIZE
+        self._categories_by_name: Optional[Dict[str, int]] = None
+        self._category_ids: set = set()
+
+    # --- validation ---
+
+    def _load_categories(self) -> None:
+        from app.models.category import Category
+
+        rows = self.session.query(Category.category_id, Category.name_en).all()
+        self._categories_by_name = {row.name_en.strip().lower(): row.category_id for row in rows}
+        self._category_ids = {row.category_id for row in rows}
+
+    def _category_id(self, raw: Dict) -> Optional[int]:
+        """Resolves 'category_id' or 'category_en' (creating the category in full imports)."""
+        from app.models.category import Category
+
+        if self._categories_by_name is None:
+            self._load_categories()
+        if _present(raw.get('category_id')):
+            try:
+                category_id = int(raw['category_id'])
+            except (TypeError, ValueError):
+                raise RowError(f"category_id '{raw['category_id']}' is not an integer.")
+            if category_id not in self._category_ids:
+                raise RowError(f"Unknown category_id {category_id}.")
+            return category_id
+        name = _text(raw.get('category_en'))
+        if name is None:
+            return None
+        category_id = self._categories_by_name.get(name.lower())
+        if category_id is None:
+            if self.update_only:
+                raise RowError(f"Unknown category '{name}'.")
+            category = Category(name_en=name, name_ar=_text(raw.get('category_ar')))
+            self.session.add(category)
+            self.session.flush()
+            category_id = category.category_id
+            self._categories_by_name[name.lower()] = category_id
+            self._category_ids.add(category_id)
+            logger.info(f"Created category '{name}' (ID: {category_id}) during import.")
+        return category_id
+
+    def validate(self, record) -> Dict:
+        """
+        Converts one input record into column values.
+
+        Args:
+            record: A CSV row dict or a JSON Lines line.
+
+        Returns:
+            dict: supplier_sku plus the product columns the record sets.
+
+        Raises:
+            RowError: If the record cannot be imported.
+        """
+        if isinstance(record, str):
+            try:
+                record = json.loads(record)
+            except ValueError as e:
+                raise RowError(f"Invalid JSON: {e}.")
+        if not isinstance(record, dict):
+            raise RowError("Each record must be an object.")
+
+        sku = _text(record.get('supplier_sku', record.get('sku')))
+        if sku is None:
+            raise RowError("supplier_sku is required.")
+        row = {'supplier_sku': sku}
+        for column in IMPORT_COLUMNS:
+            if column not in record or (column in TYPED_COLUMNS and not _present(record[column])):
+                continue
+            row[column] = self._convert(column, record[column])
+        category_id = self._category_id(record)
+        if category_id is not None:
+            row['category_id'] = category_id
+
+        for column, value in row.items():
+            length = getattr(self.table.c[column].type, 'length', None)
+            if length and isinstance(value, str) and len(value) > length:
+                raise RowError(f"{column} is longer than {length} characters.")
+        if self.update_only:
+            if len(row) == 1:
+                raise RowError("Nothing to update.")
+        else:
+            missing = [column for column in REQUIRED_COLUMNS if row.get(column) is None]
+            if missing:
+                raise RowError(f"Missing required fields: {', '.join(missing)}.")
+        if 'name_en' in row and row['name_en'] is None:
+            raise RowError("name_en cannot be empty.")
+        return row
+
+    @staticmethod
+    def _convert(column: str, value):
+        if column == 'price':
+            try:
+                price = Decimal(str(value).strip()).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                raise RowError(f"price '{value}' is not a number.")
+            if price < 0 or not price.is_finite():
+                raise RowError(f"price '{value}' must be a non-negative number.")
+            return price
+        if column == 'stock_quantity':
+            try:
+                quantity = int(str(value).strip())
+            except ValueError:
+                raise RowError(f"stock_quantity '{value}' is not an integer.")
+            if quantity < 0:
+                raise RowError("stock_quantity cannot be negative.")
+            return quantity
+        if column == 'is_active':
+            if isinstance(value, bool):
+                return value
+            flag = str(value).strip().lower()
+            if flag not in _TRUE | _FALSE:
+                raise RowError(f"is_active '{value}' is not a boolean.")
+            return flag in _TRUE
+        return _text(value)
+
+    # --- writing ---
+
+    def run(self, records: Iterable[Tuple[int, object]]) -> ImportReport:
+        """
+        Imports every record, committing one batch at a time.
+
+        Args:
+            records: (line number, record) pairs, e.g. from `read_records`.
+
+        Returns:
+            ImportReport: What was read, written and skipped.
+        """
+        report = ImportReport()
+        started = time.perf_counter()
+        # Rows are grouped by the columns they set, and deduplicated by SKU (last one wins)
+        pending: Dict[frozenset, Dict[str, Dict]] = {}
+        try:
+            for line_number, record in records:
+                report.rows_read += 1
+                try:
+                    row = self.validate(record)
+                except RowError as e:
+                    report.invalid += 1
+                    if len(report.errors) < MAX_REPORTED_ERRORS:
+                        report.errors.append((line_number, str(e)))
+                    continue
+                group = pending.setdefault(frozenset(row), {})
+                group[row['supplier_sku']] = row
+                if len(group) >= self.batch_size:
+                    self._write(list(group.values()), report)
+                    group.clear()
+                if report.rows_read % PROGRESS_EVERY_ROWS == 0:
+                    elapsed = time.perf_counter() - started
+                    logger.info(f"Catalog import: {report.rows_read} rows read ({report.rows_read / elapsed:.0f} rows/s).")
+            for group in pending.values():
+                if group:
+                    self._write(list(group.values()), report)
+        except SQLAlchemyError:
+            self.session.rollback()
+            logger.error(f"Catalog import failed after {report.imported} committed rows.", exc_info=True)
+            raise
+        finally:
+            if report.imported:
+                self._finish()
+            report.elapsed = time.perf_counter() - started
+        logger.info(f"Catalog import finished: {report.summary()}.")
+        return report
+
+    def _write(self, rows: List[Dict], report: ImportReport) -> None:
+        columns = [column for column in rows[0] if column != 'supplier_sku']
+        if self.update_only:
+            skus = [row['supplier_sku'] for row in rows]
+            existing = {sku for (sku,) in self.session.execute(
+                select(self.table.c.supplier_sku).where(self.table.c.supplier_sku.in_(skus)))}
+            report.unknown += len(rows) - len(existing)
+            rows = [row for row in rows if row['supplier_sku'] in existing]
+            if rows:
+                values = {column: bindparam(f'b_{column}') for column in columns}
+                if 'stock_quantity' in values:
+                    values['stock_quantity'] = values['stock_quantity'] - self._held_units
+                statement = self.table.update() \
+                    .where(self.table.c.supplier_sku == bindparam('b_supplier_sku')) \
+                    .values(values)
+                self.session.execute(statement, [{f'b_{key}': value for key, value in row.items()} for row in rows])
+        else:
+            # New products have no holds; existing ones keep their held units out of stock_quantity
+            expressions = {'stock_quantity': lambda imported: imported - self._held_units} \
+                if 'stock_quantity' in columns else None
+            upsert(self.session, self.table, rows, key_columns=['supplier_sku'],
+                   replace_columns=[column for column in columns if column != 'stock_quantity'],
+                   replace_expressions=expressions)
+        if 'stock_quantity' in columns:
+            self._write_sharded_stock(rows)
+        self.session.commit()
+        report.imported += len(rows)
+
+    def _write_sharded_stock(self, rows: List[Dict]) -> None:
+        """Moves the imported stock of sharded products into their shards."""
+        on_hand = {row['supplier_sku']: row['stock_quantity'] for row in rows}
+        sharded = self.session.execute(
+            select(self.table.c.product_id, self.table.c.supplier_sku)
+            .where(self.table.c.stock_sharded == True, self.table.c.supplier_sku.in_(on_hand))).fetchall()
+        if sharded:
+            set_sharded_stock(self.session, {row.product_id: on_hand[row.supplier_sku] for row in sharded})
+
+    def _finish(self) -> None:
+        """Bumps the catalog version and refreshes search indexes and caches, once per import."""
+        bump_catalog_version(self.session.connection())
+        self.session.commit()
+        try:
+            if self.dialect == 'postgresql':
+                # Planner statistics for the search and listing indexes
+                self.session.execute(text("ANALYZE products"))
+            elif self.dialect == 'sqlite':
+                # Merge the FTS5 segments written batch by batch
+                self.session.execute(text("INSERT INTO products_fts(products_fts) VALUES ('optimize')"))
+            self.session.commit()
+        except SQLAlchemyError:
+            self.session.rollback()
+            logger.warning("Search index refresh after catalog import failed.", exc_info=True)
+        notify_catalog_reload()
+
+
+def _present(value) -> bool:
+    return value is not None and not (isinstance(value, str) and not value.strip())
+
+
+def _text(value) -> Optional[str]:
+    if not _present(value):
+        return None
+    return str(value).strip()
+
+
+def import_catalog(session, stream, fmt: str, batch_size: int = None, update_only: bool = False) -> ImportReport:
+    """
+    Imports a CSV or JSON Lines catalog from an open text stream.
+
+    Args:
+        session: The SQLAlchemy session to write with.
+        stream: The input, opened in text mode (newline='' for CSV).
+        fmt (str): 'csv' or 'jsonl'.
+        batch_size (int, optional): Rows per batch; defaults to CATALOG_IMPORT_BATCH_SIZE.
+        update_only (bool): Only update existing SKUs (e.g. nightly price and stock feeds).
+
+    Returns:
+        ImportReport: What was read, written and skipped.
+    """
+    importer = CatalogImporter(session, batch_size=batch_size, update_only=update_only)
+    return importer.run(read_records(stream, fmt))
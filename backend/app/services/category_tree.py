@@ -0,0 +1,200 @@
+# In app/services/category_tree.py
+"""
+The category hierarchy: closure-table maintenance and an in-memory tree.
+
+Every ORM write to categories keeps category_closure in step within the
+same flush, so "this category and everything below it" is one indexed
+lookup on ancestor_id whatever the depth. Category writes also bump the
+catalog version (see catalog_events), which is what tells each worker's
+CategoryTree and the cached category responses to reload.
+
+Bulk Core statements against categories bypass these listeners; code that
+issues them must rebuild the closure (see the backfill in the migration
+adding it) and bump the catalog version itself.
+"""
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, func, inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app import db
+from app.services import catalog_events
+from app.services.catalog_cache import CatalogVersionTracker, catalog_version
+
+logger = logging.getLogger(__name__)
+
+_listeners_registered = False
+
+_INSERT_NODE = text("""
+    INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+    SELECT ancestor_id, :node, depth + 1 FROM category_closure WHERE descendant_id = :parent
+    UNION ALL
+    SELECT :node, :node, 0
+""")
+
+# Links from the subtree's old ancestors (those outside the subtree) to its nodes
+_DETACH_SUBTREE = text("""
+    DELETE FROM category_closure
+    WHERE descendant_id IN (SELECT descendant_id FROM category_closure WHERE ancestor_id = :node)
+      AND ancestor_id NOT IN (SELECT descendant_id FROM category_closure WHERE ancestor_id = :node)
+""")
+
+_ATTACH_SUBTREE = text("""
+    INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+    SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+    FROM category_closure above, category_closure below
+    WHERE above.descendant_id = :parent AND below.ancestor_id = :node
+""")
+
+_IS_DESCENDANT = text("SELECT 1 FROM category_closure WHERE ancestor_id = :node AND descendant_id = :candidate")
+
+_DELETE_NODE = text("DELETE FROM category_closure WHERE ancestor_id = :node OR descendant_id = :node")
+
+
+def _after_insert(mapper, connection, target) -> None:
+    connection.execute(_INSERT_NODE, {"node": target.category_id, "parent": target.parent_category_id})
+    catalog_events.record_catalog_write(connection, Session.object_session(target))
+
+
+def _parent_changed(target) -> bool:
+    return inspect(target).attrs.parent_category_id.history.has_changes()
+
+
+def _before_update(mapper, connection, target) -> None:
+    new_parent = target.parent_category_id
+    if new_parent is None or not _parent_changed(target):
+        return
+    if new_parent == target.category_id or connection.execute(
+            _IS_DESCENDANT, {"node": target.category_id, "candidate": new_parent}).first():
+        raise ValueError(f"Category {target.category_id} cannot be moved under its own subtree ({new_parent}).")
+
+
+def _after_update(mapper, connection, target) -> None:
+    if _parent_changed(target):
+        connection.execute(_DETACH_SUBTREE, {"node": target.category_id})
+        if target.parent_category_id is not None:
+            connection.execute(_ATTACH_SUBTREE, {"node": target.category_id, "parent": target.parent_category_id})
+    catalog_events.record_catalog_write(connection, Session.object_session(target))
+
+
+def _before_delete(mapper, connection, target) -> None:
+    # Children have already been re-parented (or deleted) earlier in the flush
+    connection.execute(_DELETE_NODE, {"node": target.category_id})
+    catalog_events.record_catalog_write(connection, Session.object_session(target))
+
+
+def register_category_listeners() -> None:
+    """Installs the closure-maintaining ORM listeners once per process."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    from app.models.category import Category
+
+    event.listen(Category, 'after_insert', _after_insert)
+    event.listen(Category, 'before_update', _before_update)
+    event.listen(Category, 'after_update', _after_update)
+    event.listen(Category, 'before_delete', _before_delete)
+    _listeners_registered = True
+
+
+class CategoryTree:
+    """
+    The whole category hierarchy of one catalog version, loaded in two queries.
+
+    Each node carries `product_count`, the number of active products in the
+    category and all of its descendants.
+    """
+
+    def __init__(self, version_tracker: CatalogVersionTracker):
+        self.version_tracker = version_tracker
+        self._lock = threading.Lock()
+        self._nodes: Dict[int, Dict] = {}
+        self._children: Dict[Optional[int], List[int]] = {}
+        self._built = False
+        self._built_version = None
+
+    def build(self) -> None:
+        from app.models.category import Category
+        from app.models.category_closure import CategoryClosure
+        from app.models.product import Product
+
+        version = self.version_tracker.current_version()
+        rows = db.session.query(Category.category_id, Category.name_en, Category.name_ar,
+                                Category.parent_category_id).order_by(Category.category_id).all()
+        try:
+            counts = dict(db.session.query(CategoryClosure.ancestor_id, func.count(Product.product_id))
+                          .join(Product, Product.category_id == CategoryClosure.descendant_id)
+                          .filter(Product.is_active == True)
+                          .group_by(CategoryClosure.ancestor_id).all())
+        except DBAPIError:
+            db.session.rollback()
+            logger.warning("Category closure unavailable; product counts are omitted. "
+                           "Run 'flask db upgrade' to create it.", exc_info=True)
+            counts = {}
+
+        nodes, children = {}, {}
+        for row in rows:
+            nodes[row.category_id] = {"category_id": row.category_id, "name_en": row.name_en, "name_ar": row.name_ar,
+                                      "parent_category_id": row.parent_category_id,
+                                      "product_count": counts.get(row.category_id, 0)}
+        for row in rows:
+            # Categories whose parent no longer exists are shown as roots
+            parent = row.parent_category_id if row.parent_category_id in nodes else None
+            children.setdefault(parent, []).append(row.category_id)
+        with self._lock:
+            self._nodes, self._children = nodes, children
+            self._built, self._built_version = True, version
+        logger.info(f"Category tree built for catalog version {version} ({len(nodes)} categories).")
+
+    def ensure_fresh(self) -> None:
+        """Rebuilds the tree if the catalog version moved on since it was built."""
+        version = self.version_tracker.current_version()
+        if not self._built or version is None or version != self._built_version:
+            self.build()
+
+    def _nested(self, category_id: int) -> Dict:
+        node = dict(self._nodes[category_id])
+        node["children"] = [self._nested(child) for child in self._children.get(category_id, ())]
+        return node
+
+    def roots(self) -> List[Dict]:
+        """Returns the whole hierarchy as nested dicts, one per root category."""
+        self.ensure_fresh()
+        with self._lock:
+            return [self._nested(category_id) for category_id in self._children.get(None, ())]
+
+    def exists(self, category_id: int) -> bool:
+        self.ensure_fresh()
+        return category_id in self._nodes
+
+    def subtree(self, category_id: int) -> Optional[Dict]:
+        """Returns the category with its nested descendants, or None if it does not exist."""
+        self.ensure_fresh()
+        with self._lock:
+            if category_id not in self._nodes:
+                return None
+            node = self._nested(category_id)
+            node["path"] = self._path(category_id)
+            return node
+
+    def _path(self, category_id: int) -> List[Dict]:
+        path, seen = [], set()
+        parent = self._nodes[category_id]["parent_category_id"]
+        while parent in self._nodes and parent not in seen:
+            seen.add(parent)
+            path.append({"category_id": parent, "name_en": self._nodes[parent]["name_en"],
+                         "name_ar": self._nodes[parent]["name_ar"]})
+            parent = self._nodes[parent]["parent_category_id"]
+        path.reverse()
+        return path
+
+    def invalidate(self, *args) -> None:
+        """Forces a rebuild on next use."""
+        self._built = False
+
+
+category_tree = CategoryTree(catalog_version)
+catalog_events.subscribe(category_tree.invalidate, category_tree.invalidate)
@@ -1,74 +1,193 @@
 # In backend/app/services/checkout_service.py
+"""
+Checkout: turns a customer's cart into an order in one short transaction.
+
+The cart's lines were given stock holds when they were added (see
+stock_reservations), so checkout locks only the customer's own cart rows
+and claims those holds: in the common case no product row is written or
+waited for, and checkouts of the same hot product run side by side. Only
+lines whose hold lapsed or fell short take stock, with one conditional
+UPDATE whose product rows are locked in product_id order. The rest is a
+fixed number of set-based statements whatever the size of the cart: one
+order insert, one bulk insert of its items, one DELETE of the cart lines
+and one outbox insert. Everything that follows an order (popularity
+statistics, the spoken confirmation) is queued in the outbox in the same
+transaction and delivered by the outbox worker, so a checkout waits only
+for its own commit.
+"""
+import threading
+import time
+from decimal import Decimal
+from typing import Dict
 
 from flask import current_app # <-- Import current_app directly from Flask
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+
 from app import db            # Keep importing db from your app package
 from app.models.shopping_cart import ShoppingCart
 from app.models.cart_item import CartItem
 from app.models.product import Product
 from app.models.order import Order
 from app.models.order_item import OrderItem
-from decimal import Decimal
+from app.services.outbox import publish
+from app.services.popularity_service import popularity_ranker
+from app.services.stock_reservations import adjust_stock, claim_holds
+from config import Config
 
-def process_checkout(customer_id: int):
+# PostgreSQL's SQLSTATE for lock_not_available (lock_timeout expired)
+_LOCK_NOT_AVAILABLE = '55P03'
+
+
+class CheckoutLockStats:
     """
-    Processes the checkout for a given customer.
-    Creates an order, decrements stock, and clears the cart.
-    Returns a dictionary with the result.
+    How long checkouts wait for and then hold their row locks.
+
+    Wait is the duration of the query locking the cart; hold runs from the
+    moment it returns to the end of the commit that releases every lock the
+    checkout took (its cart rows, and the product rows of lines whose stock
+    hold fell short).
+    """
+
+    def __init__(self, warning_seconds: float):
+        self.warning_seconds = warning_seconds
+        self._lock = threading.Lock()
+        self._checkouts = 0
+        self._lock_timeouts = 0
+        self._slow_holds = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_hold = 0.0
+        self._max_hold = 0.0
+
+    def observe(self, wait_seconds: float, hold_seconds: float, lines: int) -> None:
+        with self._lock:
+            self._checkouts += 1
+            self._total_wait += wait_seconds
+            self._max_wait = max(self._max_wait, wait_seconds)
+            self._total_hold += hold_seconds
+            self._max_hold = max(self._max_hold, hold_seconds)
+            if hold_seconds > self.warning_seconds:
+                self._slow_holds += 1
+        if hold_seconds > self.warning_seconds:
+            current_app.logger.warning(f"Checkout of {lines} lines held its locks for {hold_seconds:.3f}s.")
+
+    def observe_timeout(self) -> None:
+        with self._lock:
+            self._lock_timeouts += 1
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                "checkouts": checkouts,
+                "lock_timeouts": self._lock_timeouts,
+                "slow_holds": self._slow_holds,
+                "avg_lock_wait_seconds": self._total_wait / checkouts if checkouts else 0.0,
+                "max_lock_wait_seconds": self._max_wait,
+                "avg_lock_hold_seconds": self._total_hold / checkouts if checkouts else 0.0,
+                "max_lock_hold_seconds": self._max_hold,
+                "lock_timeout_seconds": Config.CHECKOUT_LOCK_TIMEOUT_SECONDS,
+            }
+
+
+checkout_lock_stats = CheckoutLockStats(Config.CHECKOUT_LOCK_HOLD_WARNING_SECONDS)
+
+
+def _lock_cart_lines(customer_id: int):
+    """
+    Loads the customer's cart lines with their products, locking the cart and its lines (not the products).
     """
-    shopping_cart = ShoppingCart.query.filter_by(customer_id=customer_id).first()
+    products = Product.__table__
+    return db.session.execute(
+        select(products, ShoppingCart.cart_id, CartItem.cart_item_id, CartItem.quantity.label('cart_quantity'))
+        .join(CartItem.__table__, CartItem.product_id == products.c.product_id)
+        .join(ShoppingCart.__table__, ShoppingCart.cart_id == CartItem.cart_id)
+        .where(ShoppingCart.customer_id == customer_id)
+        .order_by(products.c.product_id)
+        .with_for_update(of=[ShoppingCart.__table__, CartItem.__table__])
+    ).fetchall()
 
-    if not shopping_cart or not shopping_cart.items.first():
-        return {"success": False, "error": "Your shopping cart is empty.", "status_code": 400}
 
-    order_items_data = []
-    calculated_total = Decimal('0.0')
-    cart_items_to_process = shopping_cart.items.all()
+def process_checkout(customer_id: int, confirmation_language: str = None):
+    """
+    Processes the checkout for a given customer.
+    Creates an order, converts the cart's stock holds into it, and clears the cart.
+    Returns a dictionary with the result.
 
+    `confirmation_language` ('en' or 'ar') asks the outbox worker to
+    synthesize a spoken confirmation of the order (see order_confirmation).
+    """
     try:
-        # Validate stock and prepare order data
-        for item in cart_items_to_process:
-            # Lock the product row for the duration of the transaction to prevent race conditions
-            product = Product.query.with_for_update().get(item.product_id)
-            if not product or not product.is_active or product.stock_quantity < item.quantity:
-                raise ValueError(f"Insufficient stock or unavailable product: {product.name_en if product else 'N/A'}")
-            
-            price = product.price
-            order_items_data.append({
-                'product': product,
-                'quantity': item.quantity,
-                'price_at_purchase': price
-            })
-            calculated_total += price * item.quantity
+        if db.session.bind.dialect.name == 'postgresql':
+            # Fail fast instead of queueing behind another transaction's locks
+            db.session.execute(text(f"SET LOCAL lock_timeout = {int(Config.CHECKOUT_LOCK_TIMEOUT_SECONDS * 1000)}"))
+
+        started = time.monotonic()
+        lines = _lock_cart_lines(customer_id)
+        locked = time.monotonic()
+        if not lines:
+            db.session.rollback()
+            return {"success": False, "error": "Your shopping cart is empty.", "status_code": 400}
+        for line in lines:
+            if not line.is_active:
+                raise ValueError(f"Insufficient stock or unavailable product: {line.name_en}")
+        cart_id = lines[0].cart_id
+        quantities = {line.product_id: line.cart_quantity for line in lines}
+
+        # Convert the holds; only lines whose hold lapsed (or differs) touch product stock
+        held = claim_holds(db.session, cart_id, quantities)
+        deltas = {product_id: quantity - held.get(product_id, 0) for product_id, quantity in quantities.items()}
+        deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+        applied = adjust_stock(db.session, deltas)
+        for line in lines:
+            if line.product_id in deltas and line.product_id not in applied:
+                raise ValueError(f"Insufficient stock or unavailable product: {line.name_en}")
+        calculated_total = sum((line.price * line.cart_quantity for line in lines), Decimal('0.0'))
 
         # Create the Order
         new_order = Order(customer_id=customer_id, total_amount=calculated_total, status='pending')
         db.session.add(new_order)
         db.session.flush()  # Get the new_order.order_id
 
-        # Create OrderItems and decrement stock
-        for data in order_items_data:
-            order_item = OrderItem(
-                order_id=new_order.order_id,
-                product_id=data['product'].product_id,
-                quantity=data['quantity'],
-                price_at_purchase=data['price_at_purchase']
-            )
-            db.session.add(order_item)
-            data['product'].stock_quantity -= data['quantity']
+        # Create all OrderItems in one executemany
+        db.session.execute(OrderItem.__table__.insert(), [
+            {"order_id": new_order.order_id, "product_id": line.product_id, "quantity": line.cart_quantity,
+             "price_at_purchase": line.price} for line in lines
+        ])
+
+        # Clear the ordered lines; anything added meanwhile stays in the cart
+        db.session.execute(CartItem.__table__.delete()
+                           .where(CartItem.cart_item_id.in_([line.cart_item_id for line in lines])))
 
-        # Clear the cart
-        for item in cart_items_to_process:
-            db.session.delete(item)
+        # Queue the order's side effects; they are delivered once this commits
+        publish(db.session, "order_placed", {
+            "order_id": new_order.order_id, "customer_id": int(customer_id),
+            "quantities": quantities, "total_amount": str(calculated_total),
+            "ordered_at": new_order.order_date.isoformat(), "confirmation_language": confirmation_language,
+        })
 
-        db.session.commit() # Commit the entire transaction
+        order_id = new_order.order_id  # Read before commit expires it, saving a reload
+        db.session.commit() # Commit the entire transaction, releasing the locks
+        checkout_lock_stats.observe(locked - started, time.monotonic() - locked, len(lines))
+        popularity_ranker.observe_order(customer_id, quantities.keys())
 
         return {
             "success": True,
-            "order_id": new_order.order_id,
-            "total_amount": new_order.total_amount,
+            "order_id": order_id,
+            "total_amount": calculated_total,
             "status_code": 201
         }
 
+    except OperationalError as e:
+        db.session.rollback()
+        if getattr(e.orig, 'pgcode', None) != _LOCK_NOT_AVAILABLE:
+            current_app.logger.error(f"Checkout service failed for user {customer_id}: {str(e)}")
+            return {"success": False, "error": str(e), "status_code": 400}
+        checkout_lock_stats.observe_timeout()
+        current_app.logger.warning(f"Checkout for user {customer_id} timed out waiting for a lock.")
+        return {"success": False, "error": "The store is busy right now. Please try again in a moment.",
+                "status_code": 503}
     except Exception as e:
         db.session.rollback() # Roll back all changes if any part of the transaction fails
         # Now this logger call will work correctly
@@ -0,0 +1,77 @@
+# In app/services/deadline.py
+import logging
+import math
+import time
+from typing import List, Optional
+
+from flask import current_app
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """
+    A per-request latency budget shared by every stage of the voice pipeline.
+
+    Stages ask how much time is left before calling a dependency, pass the
+    remaining budget down as a timeout, and record a named degradation
+    whenever they fall back to a cheaper alternative. The collected
+    degradations are reported back to the client.
+    """
+
+    def __init__(self, budget_seconds: Optional[float] = None):
+        self.budget_seconds = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds if budget_seconds else math.inf
+        self.degradations: List[str] = []
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def has(self, seconds: float) -> bool:
+        """Whether at least `seconds` of budget remain."""
+        return self.remaining() >= seconds
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """
+        Returns a timeout for a blocking call: the remaining budget, optionally capped.
+
+        Returns None only when there is neither a deadline nor a cap.
+        """
+        remaining = self.remaining()
+        if cap is not None:
+            remaining = min(remaining, cap)
+        return None if math.isinf(remaining) else remaining
+
+    def degrade(self, name: str) -> None:
+        """Records that a stage fell back to a cheaper alternative."""
+        if name not in self.degradations:
+            logger.warning(f"Latency budget degradation applied: {name} ({self.remaining():.2f}s left)")
+            self.degradations.append(name)
+
+
+def deadline_for(endpoint: str) -> Deadline:
+    """
+    Creates the deadline configured for a Flask endpoint in REQUEST_DEADLINES.
+    """
+    budget = current_app.config.get('REQUEST_DEADLINES', {}).get(endpoint)
+    return Deadline(budget)
+
+
+def bound_statement_timeout(session, deadline: Deadline, minimum_seconds: float = 1.0) -> None:
+    """
+    Caps the statements of the current transaction to the remaining budget.
+
+    Only PostgreSQL supports a per-transaction statement timeout; other
+    dialects are left untouched. `minimum_seconds` keeps a nearly expired
+    budget from failing writes that are already committed to by the user.
+    """
+    timeout = deadline.timeout()
+    if timeout is None or session.bind.dialect.name != 'postgresql':
+        return
+    milliseconds = int(max(timeout, minimum_seconds) * 1000)
+    session.execute(text(f"SET LOCAL statement_timeout = {milliseconds}"))
@@ -0,0 +1,226 @@
+# In app/services/fuzzy_match.py
+"""
+Fuzzy and phonetic matching of product names, tolerant of ASR errors.
+
+Names and queries are compared in a shared Latin form: Arabic is
+transliterated, so "tufah" can still find "تفاح". Candidates come from a
+trigram index over that form and from phonetic-key buckets, and are then
+verified with a bounded edit distance.
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from app.services.text_normalization import normalize_tokens
+
+logger = logging.getLogger(__name__)
+
+_ARABIC_TO_LATIN = {
+    "ا": "a", "ب": "b", "ت": "t", "ث": "th", "ج": "j", "ح": "h", "خ": "kh",
+    "د": "d", "ذ": "th", "ر": "r", "ز": "z", "س": "s", "ش": "sh", "ص": "s",
+    "ض": "d", "ط": "t", "ظ": "z", "ع": "a", "غ": "gh", "ف": "f", "ق": "q",
+    "ك": "k", "ل": "l", "م": "m", "ن": "n", "ه": "h", "و": "w", "ي": "y",
+    "ء": "", "پ": "p", "ڤ": "v", "گ": "g", "چ": "ch",
+}
+_ARABIC_TRANSLIT_TABLE = str.maketrans(_ARABIC_TO_LATIN)
+
+# Letter groups that ASR and transliteration routinely confuse
+_PHONETIC_REPLACEMENTS = (("ph", "f"), ("kh", "k"), ("gh", "g"), ("sh", "s"), ("th", "t"),
+                          ("ck", "k"), ("q", "k"), ("c", "k"), ("z", "s"), ("x", "ks"), ("v", "f"), ("j", "g"))
+_VOWELS = set("aeiouwy")
+
+# A token must be at least this long to be indexed on its own
+MIN_TOKEN_ENTRY_LENGTH = 4
+# Extra cost for matching a single word of a multi-word name
+TOKEN_ENTRY_PENALTY = 0.05
+# How many trigram candidates are verified with the edit distance
+MAX_VERIFIED_CANDIDATES = 64
+
+
+def transliterate(text: str) -> str:
+    """Maps Arabic letters to a Latin approximation; other text is lowercased."""
+    return text.translate(_ARABIC_TRANSLIT_TABLE).lower()
+
+
+def phonetic_key(text: str) -> str:
+    """
+    A coarse sound-alike key: confusable letters folded, vowels after the
+    first letter dropped and repeated letters collapsed.
+    """
+    latin = "".join(ch for ch in transliterate(text) if ch.isalpha())
+    for source, target in _PHONETIC_REPLACEMENTS:
+        latin = latin.replace(source, target)
+    if not latin:
+        return ""
+    key = [latin[0]]
+    for ch in latin[1:]:
+        if ch in _VOWELS or ch == key[-1]:
+            continue
+        key.append(ch)
+    return "".join(key)
+
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> int:
+    """
+    Edit distance between `a` and `b`, or `max_distance + 1` as soon as it
+    is known to exceed `max_distance`.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) > len(b):
+        a, b = b, a
+    previous = list(range(len(a) + 1))
+    for i, cb in enumerate(b, 1):
+        current = [i] + [0] * len(a)
+        row_min = i
+        for j, ca in enumerate(a, 1):
+            cost = 0 if ca == cb else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def default_max_distance(length: int) -> int:
+    if length <= 4:
+        return 1
+    if length <= 8:
+        return 2
+    return 3
+
+
+def _trigrams(form: str) -> set:
+    padded = f"  {form} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyMatcher:
+    """
+    Trigram and phonetic index over product names for near-miss lookups.
+
+    Each product contributes one entry per language for its whole name
+    (spaces removed, so split or merged words still line up) plus one per
+    long-enough word of the name.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: Dict[int, tuple] = {}  # entry_id -> (product_id, form, key, penalty)
+        self._entries_by_product: Dict[int, List[int]] = defaultdict(list)
+        self._trigram_postings: Dict[str, set] = defaultdict(set)
+        self._phonetic_buckets: Dict[str, set] = defaultdict(set)
+        self._next_entry_id = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._entries_by_product.clear()
+            self._trigram_postings.clear()
+            self._phonetic_buckets.clear()
+
+    def add(self, product_id: int, *names: Optional[str]) -> None:
+        """Indexes the given names (any language) for a product."""
+        with self._lock:
+            seen = set()
+            for name in names:
+                tokens = normalize_tokens(name or "")
+                if not tokens:
+                    continue
+                forms = [("".join(tokens), 0.0)]
+                if len(tokens) > 1:
+                    forms += [(token, TOKEN_ENTRY_PENALTY) for token in tokens if len(token) >= MIN_TOKEN_ENTRY_LENGTH]
+                for raw_form, penalty in forms:
+                    form = transliterate(raw_form)
+                    if form in seen:
+                        continue
+                    seen.add(form)
+                    entry_id = self._next_entry_id
+                    self._next_entry_id += 1
+                    key = phonetic_key(raw_form)
+                    self._entries[entry_id] = (product_id, form, key, penalty)
+                    self._entries_by_product[product_id].append(entry_id)
+                    for trigram in _trigrams(form):
+                        self._trigram_postings[trigram].add(entry_id)
+                    if key:
+                        self._phonetic_buckets[key].add(entry_id)
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            for entry_id in self._entries_by_product.pop(product_id, []):
+                _, form, key, _ = self._entries.pop(entry_id)
+                for trigram in _trigrams(form):
+                    postings = self._trigram_postings.get(trigram)
+                    if postings is not None:
+                        postings.discard(entry_id)
+                        if not postings:
+                            del self._trigram_postings[trigram]
+                bucket = self._phonetic_buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(entry_id)
+                    if not bucket:
+                        del self._phonetic_buckets[key]
+
+    def search(self, query: str, k: int = 5, max_distance: Optional[int] = None,
+               budget_seconds: float = 0.01) -> List[Dict]:
+        """
+        Returns up to `k` products whose names are close to `query`.
+
+        Args:
+            query (str): The (possibly misheard) product name.
+            k (int): Maximum number of results.
+            max_distance (int, optional): Edit-distance bound; scales with the query length by default.
+            budget_seconds (float): Soft time limit; candidate generation and
+                verification stop early and return the best found so far.
+
+        Returns:
+            list: Dicts with 'product_id' and 'score' (0..1], best first.
+        """
+        started = time.perf_counter()
+        tokens = normalize_tokens(query)
+        if not tokens:
+            return []
+        raw_form = "".join(tokens)
+        form = transliterate(raw_form)
+        key = phonetic_key(raw_form)
+        if max_distance is None:
+            max_distance = default_max_distance(len(form))
+
+        with self._lock:
+            overlap: Dict[int, int] = defaultdict(int)
+            # Rare trigrams first: they are the most selective and the cheapest
+            query_trigrams = sorted(_trigrams(form), key=lambda t: len(self._trigram_postings.get(t, ())))
+            for trigram in query_trigrams:
+                for entry_id in self._trigram_postings.get(trigram, ()):
+                    overlap[entry_id] += 1
+                if time.perf_counter() - started > budget_seconds / 2:
+                    break
+            phonetic_matches = set(self._phonetic_buckets.get(key, ())) if key else set()
+
+            candidates = heapq.nlargest(MAX_VERIFIED_CANDIDATES, overlap.items(), key=lambda item: (item[1], -item[0]))
+            candidate_ids = [entry_id for entry_id, _ in candidates]
+            candidate_ids += sorted(phonetic_matches.difference(candidate_ids))
+
+            best: Dict[int, float] = {}
+            for entry_id in candidate_ids:
+                if time.perf_counter() - started > budget_seconds:
+                    logger.info(f"Fuzzy search for '{query}' hit its latency budget.")
+                    break
+                product_id, entry_form, entry_key, penalty = self._entries[entry_id]
+                distance = bounded_levenshtein(form, entry_form, max_distance)
+                sounds_alike = key and entry_key == key
+                if distance > max_distance and not sounds_alike:
+                    continue
+                length = max(len(form), len(entry_form)) or 1
+                score = 1.0 - min(distance, length) / length - penalty
+                if sounds_alike:
+                    score = max(score, 0.6 - penalty)
+                if score > best.get(product_id, 0.0):
+                    best[product_id] = score
+
+        ranked = sorted(best.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [{"product_id": product_id, "score": round(score, 3)} for product_id, score in ranked if score > 0]
@@ -0,0 +1,188 @@
+# In app/services/item_extraction.py
+"""
+Turns "add milk, bread and two kilos of apples" into (product name, quantity) items.
+
+Works on Rasa's product_name / quantity entities, and splits a single
+product_name span that still holds a spoken list (as produced by the
+keyword fast path, or by Rasa on unseen phrasings). Quantities may be
+digits (Western or Arabic-Indic) or number words in English or Arabic;
+unit words ("kilos of", "علب") are dropped, since a cart line counts the
+product's own unit.
+"""
+import re
+from typing import Callable, Dict, List, Optional
+
+# Largest quantity a single spoken item may ask for; guards against mishearings like "two thousand"
+MAX_SPOKEN_QUANTITY = 99
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "a couple of": 2, "couple of": 2,
+    "واحد": 1, "واحدة": 1, "اثنين": 2, "اثنان": 2, "اتنين": 2, "ثنتين": 2, "ثلاثة": 3, "ثلاث": 3, "تلاتة": 3,
+    "أربعة": 4, "اربعة": 4, "أربع": 4, "اربع": 4, "خمسة": 5, "خمس": 5, "ستة": 6, "ست": 6, "سبعة": 7, "سبع": 7,
+    "ثمانية": 8, "ثمان": 8, "تسعة": 9, "تسع": 9, "عشرة": 10, "عشر": 10,
+}
+
+UNIT_WORDS = {
+    "en": ["kilos", "kilo", "kilograms", "kilogram", "kg", "kgs", "grams", "gram", "liters", "liter", "litres",
+           "litre", "bottles", "bottle", "packs", "pack", "packets", "packet", "cans", "can", "boxes", "box",
+           "bags", "bag", "pieces", "piece", "loaves", "loaf", "cartons", "carton", "dozen", "bunches", "bunch"],
+    "ar": ["كيلو", "كيلوات", "كيلوغرام", "كغ", "لتر", "لترات", "علبة", "علب", "كيس", "أكياس", "اكياس",
+           "زجاجة", "زجاجات", "قنينة", "حبة", "حبات", "ربطة", "كرتونة", "باكيت"],
+}
+
+_ARABIC_INDIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩", "0123456789")
+# Words after which an attached "و" is a conjunction ("وكيلو تفاح", "وثلاث علب")
+_ARABIC_ITEM_STARTS = "|".join(sorted(
+    [re.escape(w) for w in UNIT_WORDS["ar"] + [w for w in NUMBER_WORDS if not w.isascii()]], key=len, reverse=True))
+# List separators; every attached "و" is split off ("حليب وخبز")
+_SEPARATORS = {
+    "en": re.compile(r"\s*(?:,|&|\band\b|\bplus\b|\balso\b)\s*"),
+    "ar": re.compile(r"\s*(?:[،,]|\s+و\s+|\s+و(?=\S)|\bكمان\b)\s*"),
+}
+# An attached "و" is surely a conjunction before a definite article ("والخبز"),
+# a quantity or a unit; before any other word it may be the word's own first
+# letter ("ماء ورد"), so split_items checks that the part after it names a product
+_ATTACHED_WAW = re.compile(r"\s+و")
+_CONJUNCTION_AFTER_WAW = re.compile(rf"(?:ال|\d|(?:{_ARABIC_ITEM_STARTS})(?:\s|$))")
+_FILLERS = {
+    "en": re.compile(r"^(?:some|of|(?:my|the)(?:\s+usual)?)\s+"),
+    "ar": re.compile(r"^(?:من|بعض)\s+"),
+}
+# "my usual milk" / "الحليب المعتاد" names no product by itself; which milk is
+# left to the resolver, which prefers what the customer orders most
+_TRAILING_FILLERS = {
+    "en": re.compile(r"\s+(?:as usual|again)$"),
+    "ar": re.compile(r"\s+(?:ال)?معتادة?$"),
+}
+
+
+def parse_quantity(text) -> Optional[int]:
+    """
+    Reads a spoken or written quantity ('2', '٣', 'two', 'ثلاثة').
+
+    Returns:
+        int or None: The quantity, or None if the text is not a quantity.
+    """
+    if text is None:
+        return None
+    value = str(text).strip().lower().translate(_ARABIC_INDIC_DIGITS)
+    if value.isdigit():
+        quantity = int(value)
+    else:
+        quantity = NUMBER_WORDS.get(value)
+    if not quantity or quantity > MAX_SPOKEN_QUANTITY:
+        return None
+    return quantity
+
+
+def _quantity_prefix(words: List[str]):
+    """Splits leading number words off a phrase; returns (quantity or None, remaining words)."""
+    for size in (3, 2, 1):
+        if len(words) > size:
+            quantity = parse_quantity(" ".join(words[:size]))
+            if quantity:
+                return quantity, words[size:]
+    return None, words
+
+
+def parse_item(phrase: str, language: str = "en") -> Optional[Dict]:
+    """
+    Parses one spoken item such as "two kilos of apples" or "٣ علب حليب".
+
+    Returns:
+        dict or None: {"name", "quantity" (None when not said)}, or None if no product name is left.
+    """
+    text = " ".join(phrase.lower().translate(_ARABIC_INDIC_DIGITS).split())
+    quantity, words = _quantity_prefix(text.split())
+    units = UNIT_WORDS.get(language, UNIT_WORDS["en"])
+    if words and words[0] in units:
+        words = words[1:]
+    rest = _FILLERS.get(language, _FILLERS["en"]).sub("", " ".join(words))
+    rest = _TRAILING_FILLERS.get(language, _TRAILING_FILLERS["en"]).sub("", rest).strip()
+    if not rest:
+        return None
+    return {"name": rest, "quantity": quantity}
+
+
+def _uncertain_split(separator: str, following: str) -> bool:
+    """Tells whether a separator is an attached "و" that may belong to the following word."""
+    return bool(_ATTACHED_WAW.fullmatch(separator)) and not _CONJUNCTION_AFTER_WAW.match(following)
+
+
+def split_items(phrase: str, language: str = "en",
+                keep_whole: Optional[Callable[[str], bool]] = None,
+                resolves: Optional[Callable[[str], bool]] = None) -> List[Dict]:
+    """
+    Splits a spoken list ("milk, bread and two kilos of apples") into items.
+
+    Args:
+        phrase (str): The spoken list.
+        language (str): 'en' or 'ar'.
+        keep_whole (callable, optional): Tells whether the name in a run of
+            adjacent parts, separators included, is itself a product name
+            ("salt and vinegar chips"); the longest such run is kept as one item.
+        resolves (callable, optional): Tells whether a name matches any product;
+            a split at an attached "و" is undone when the part after it does not.
+
+    Returns:
+        list: {"name", "quantity"} dicts in spoken order; quantities default to 1.
+    """
+    separator = _SEPARATORS.get(language, _SEPARATORS["en"])
+    # Odd positions hold the separators, kept so runs can be rejoined as spoken
+    pieces = re.split(f"({separator.pattern})", phrase)
+    parts = [(pieces[k], pieces[k + 1] if k + 1 < len(pieces) else "") for k in range(0, len(pieces), 2)]
+
+    def run_text(first, last):
+        return "".join(text + sep for text, sep in parts[first:last - 1]) + parts[last - 1][0]
+
+    items, start = [], 0
+    while start < len(parts):
+        end, item = start + 1, parse_item(parts[start][0], language) if parts[start][0].strip() else None
+        for candidate in range(len(parts), start + 1, -1) if keep_whole else ():
+            run = parse_item(run_text(start, candidate), language)
+            if run and keep_whole(run["name"]):
+                end, item = candidate, run
+                break
+        while resolves and end < len(parts) and _uncertain_split(parts[end - 1][1], parts[end][0]):
+            following = parse_item(parts[end][0], language)
+            if following and resolves(following["name"]):
+                break
+            end += 1
+            item = parse_item(run_text(start, end), language)
+        if item:
+            items.append(dict(item, quantity=item["quantity"] or 1))
+        start = end
+    return items
+
+
+def extract_items(entities: List[Dict], language: str = "en",
+                  keep_whole: Optional[Callable[[str], bool]] = None,
+                  resolves: Optional[Callable[[str], bool]] = None) -> List[Dict]:
+    """
+    Pairs the product_name and quantity entities of an utterance into items.
+
+    A quantity entity applies to the next product_name entity after it; a
+    product_name span holding a whole list is split with `split_items`.
+
+    Args:
+        entities (list): Rasa-style entities with 'entity', 'value' and, when known, 'start'.
+        language (str): 'en' or 'ar'.
+        keep_whole (callable, optional): Passed to `split_items`.
+        resolves (callable, optional): Passed to `split_items`.
+
+    Returns:
+        list: {"name", "quantity"} dicts in spoken order.
+    """
+    ordered = sorted(enumerate(entities), key=lambda e: (e[1].get("start", e[0]), e[0]))
+    items, pending_quantity = [], None
+    for _, entity in ordered:
+        if entity.get("entity") == "quantity":
+            pending_quantity = parse_quantity(entity.get("value")) or pending_quantity
+        elif entity.get("entity") == "product_name" and entity.get("value"):
+            parts = split_items(str(entity["value"]), language, keep_whole, resolves)
+            if parts and pending_quantity:
+                parts[0]["quantity"] = pending_quantity
+            items.extend(parts)
+            pending_quantity = None
+    return items
@@ -0,0 +1,98 @@
+# In app/services/language_prior_service.py
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_LANGUAGES = ("en", "ar")
+
+
+class _CustomerLanguageStats:
+    """Recent auto-detected languages for one customer."""
+    __slots__ = ("recent", "forced_since_probe")
+
+    def __init__(self, window: int):
+        self.recent = deque(maxlen=window)
+        self.forced_since_probe = 0
+
+
+class LanguagePriorTracker:
+    """
+    Decides when the customer's preferred language can be forced in Whisper.
+
+    Forcing a language skips Whisper's auto-detection and the Arabic retry
+    heuristic in WhisperASRService. It is only done once the customer's
+    recent auto-detected utterances agree with their profile language, and
+    it backs off as soon as they switch language. Because a forced run
+    cannot reveal a switch, every `probe_interval`-th utterance falls back
+    to auto-detection to re-check the prior.
+
+    Statistics are kept per worker in a bounded LRU map; losing them only
+    costs a few auto-detected utterances.
+    """
+
+    def __init__(self, window: int = 10, min_samples: int = 3, agreement_threshold: float = 0.8,
+                 switch_window: int = 2, probe_interval: int = 10, max_customers: int = 50000):
+        self.window = window
+        self.min_samples = min_samples
+        self.agreement_threshold = agreement_threshold
+        self.switch_window = switch_window
+        self.probe_interval = probe_interval
+        self.max_customers = max_customers
+        self._stats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_stats(self, customer_id) -> _CustomerLanguageStats:
+        stats = self._stats.get(customer_id)
+        if stats is None:
+            stats = _CustomerLanguageStats(self.window)
+            self._stats[customer_id] = stats
+            while len(self._stats) > self.max_customers:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(customer_id)
+        return stats
+
+    def choose_asr_language(self, customer_id, preferred_language: Optional[str]) -> Optional[str]:
+        """
+        Returns the language to force in Whisper, or None to auto-detect.
+
+        Args:
+            customer_id: The customer issuing the voice command.
+            preferred_language (str, optional): The profile language carried in the JWT.
+
+        Returns:
+            str: The preferred language, when the customer's history agrees with it.
+            None: When auto-detection should be used.
+        """
+        if preferred_language not in SUPPORTED_LANGUAGES:
+            return None
+
+        with self._lock:
+            stats = self._get_stats(customer_id)
+            recent = list(stats.recent)
+            if len(recent) < self.min_samples:
+                return None
+            # Any switch in the last few utterances disables the prior immediately
+            if any(lang != preferred_language for lang in recent[-self.switch_window:]):
+                return None
+            agreement = recent.count(preferred_language) / len(recent)
+            if agreement < self.agreement_threshold:
+                return None
+            if stats.forced_since_probe >= self.probe_interval:
+                stats.forced_since_probe = 0
+                logger.info(f"Probing language auto-detection for customer {customer_id}.")
+                return None
+            stats.forced_since_probe += 1
+            return preferred_language
+
+    def record(self, customer_id, detected_language: str) -> None:
+        """
+        Records the language detected for an auto-detected (not forced) utterance.
+        """
+        if detected_language not in SUPPORTED_LANGUAGES:
+            return
+        with self._lock:
+            self._get_stats(customer_id).recent.append(detected_language)
@@ -1,7 +1,12 @@
 # In app/services/nlu_service.py
+import re
 import requests
 import logging
-from typing import Dict, Union
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Union
+
+from app.services.single_flight import SingleFlight
 
 # Define the URLs for your two separate Rasa servers
 RASA_SERVER_URLS = {
@@ -9,12 +14,58 @@ RASA_SERVER_URLS = {
     "ar": "http://localhost:5006/model/parse",
 }
 
+# Upper bound for a Rasa call when the caller gives no tighter deadline
+RASA_TIMEOUT_SECONDS = 5.0
+
+# Keyword rules used when there is no time left to ask Rasa. Each rule is
+# (intent, pattern); a 'product' group, when present, becomes a product_name entity.
+FAST_PATH_RULES = {
+    "en": [
+        # Before checkout and add_to_cart: "reorder my usual" is neither
+        # ("add my usual milk" names a product, so "usual" must end the utterance)
+        ("reorder_usual", re.compile(r"\b(my|the) (usual|regular)( (order|basket|groceries|items|shopping))?( please)?$|"
+                                     r"\b(buy|order) (it |them |everything )?again\b|"
+                                     r"\b(re-?order|repeat)\b.*\b(usual|last|same)\b|\bsame as last\b")),
+        ("go_to_checkout", re.compile(r"\b(check ?out|pay|place (my )?order)\b")),
+        ("view_cart", re.compile(r"\b(show|view|open|check)\b.*\b(cart|basket)\b|\bwhat'?s in my (cart|basket)\b")),
+        ("add_to_cart", re.compile(r"^(please )?(add|put|buy|i want( to buy)?|i'?d like)\s+(some |a |an |one |the )?"
+                                   r"(?P<product>.+?)(\s+(to|in|into) (my |the )?(cart|basket))?$")),
+        ("search_product", re.compile(r"^(find|search for|show me|look for|do you have)\s+(some |any )?(?P<product>.+)$")),
+        ("greet", re.compile(r"^(hi|hello|hey|good (morning|evening))\b")),
+    ],
+    "ar": [
+        ("reorder_usual", re.compile(r"(اطلب|أطلب) (طلبي )?المعتاد|^المعتاد|نفس (ال)?طلب|كرر طلبي|"
+                                     r"(أغراضي|مشترياتي|طلبي) (ال)?معتاد")),
+        ("go_to_checkout", re.compile(r"(ادفع|الدفع|اتمام الطلب|إتمام الطلب)")),
+        ("view_cart", re.compile(r"(سلتي|السلة|سلة التسوق)")),
+        ("add_to_cart", re.compile(r"^(من فضلك )?(أضف|اضف|ضيف|أريد|اريد)\s+(?P<product>.+?)(\s+(إلى|الى|في) (سلتي|السلة))?$")),
+        ("search_product", re.compile(r"^(ابحث عن|دور على|هل عندك|هل يوجد)\s+(?P<product>.+)$")),
+        ("greet", re.compile(r"^(مرحبا|أهلا|اهلا|السلام عليكم)")),
+    ],
+}
+
+
+def _normalize_utterance(text: str) -> str:
+    return " ".join(text.lower().strip(" .!?؟").split())
+
+
 class RasaNLUService:
     """
     A service class to interact with multiple running Rasa NLU servers,
     routing requests based on language.
+
+    Successful parses are kept in a small LRU cache so that, when a request
+    is running out of latency budget, a recent identical utterance can be
+    answered without calling Rasa. Concurrent identical utterances share a
+    single in-flight Rasa call.
     """
-    def parse(self, text: str, language: str = "en") -> Union[Dict, None]:
+    def __init__(self, cache_size: int = 2048):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.single_flight = SingleFlight("nlu")
+
+    def parse(self, text: str, language: str = "en", timeout: Optional[float] = None) -> Union[Dict, None]:
         """
         Sends text to the appropriate Rasa NLU server based on language.
 
@@ -22,6 +73,8 @@ class RasaNLUService:
             text (str): The user's text to be parsed.
             language (str): The detected language ('en' or 'ar'). This determines
                             which Rasa server to call.
+            timeout (float, optional): Seconds to wait for Rasa. Defaults to RASA_TIMEOUT_SECONDS;
+                0 or less (an exhausted budget) skips the call.
 
         Returns:
             dict: A dictionary containing the parsed data from the correct model.
@@ -31,17 +84,80 @@ class RasaNLUService:
             logging.error(f"Unsupported language provided to NLU service: {language}")
             return None
 
+        if timeout is None:
+            timeout = RASA_TIMEOUT_SECONDS
+        elif timeout <= 0:
+            # The request budget is spent; the caller falls back to the fast path
+            logging.warning(f"No budget left for an NLU request in '{language}'.")
+            return {"error": f"NLU service for language '{language}' is unavailable."}
+        try:
+            result = self.single_flight.do((language, text), self._request_parse, text, language, timeout,
+                                           wait_timeout=timeout)
+        except TimeoutError as e:
+            logging.error(f"Gave up waiting for an identical in-flight NLU request: {e}")
+            return {"error": f"NLU service for language '{language}' is unavailable."}
+        # Every caller gets its own copy; the dialogue logic mutates the result
+        return dict(result)
+
+    def _request_parse(self, text: str, language: str, timeout: float) -> Dict:
         # Select the correct server URL based on the detected language
         target_url = RASA_SERVER_URLS[language]
         payload = {"text": text}
-        
+
         try:
             logging.info(f"Sending NLU request for language '{language}' to {target_url}")
-            response = requests.post(target_url, json=payload)
+            response = requests.post(target_url, json=payload, timeout=timeout)
             response.raise_for_status()
-            return response.json()
-            
+            result = response.json()
+            self._remember(text, language, result)
+            return result
+
         except requests.exceptions.RequestException as e:
             logging.error(f"Error communicating with Rasa NLU server at {target_url}: {e}")
             return {"error": f"NLU service for language '{language}' is unavailable."}
 
+    def cached_parse(self, text: str, language: str = "en") -> Union[Dict, None]:
+        """
+        Returns a recent Rasa result for the same utterance, or None.
+        """
+        key = (language, _normalize_utterance(text))
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is None:
+                return None
+            self._cache.move_to_end(key)
+        return dict(result, text=text)
+
+    def fast_parse(self, text: str, language: str = "en") -> Dict:
+        """
+        Classifies an utterance with keyword rules instead of Rasa.
+
+        The result mimics Rasa's response format and is marked with
+        'fast_path': True. Unmatched utterances get the 'nlu_fallback' intent.
+        """
+        normalized = _normalize_utterance(text)
+        for intent_name, pattern in FAST_PATH_RULES.get(language, FAST_PATH_RULES["en"]):
+            match = pattern.search(normalized)
+            if not match:
+                continue
+            entities = []
+            product = match.groupdict().get("product")
+            if product:
+                entities.append({
+                    "entity": "product_name",
+                    "value": product,
+                    "start": match.start("product"),
+                    "end": match.end("product"),
+                    "extractor": "fast_path"
+                })
+            return {"text": text, "intent": {"name": intent_name, "confidence": 0.5},
+                    "entities": entities, "fast_path": True}
+        return {"text": text, "intent": {"name": "nlu_fallback", "confidence": 0.0}, "entities": [], "fast_path": True}
+
+    def _remember(self, text: str, language: str, result: Dict) -> None:
+        key = (language, _normalize_utterance(text))
+        with self._cache_lock:
+            self._cache[key] = dict(result)  # Callers may mutate the returned dict
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,55 @@
+# In app/services/order_confirmation.py
+"""
+The spoken confirmation of a voice checkout.
+
+The voice route answers a checkout with the confirmation text as soon as
+the order commits; the audio is synthesized afterwards by the outbox
+worker (`handle_order_placed`) under a name derived from the order, which
+the route returns right away so the client can fetch it once written.
+"""
+import logging
+import os
+from decimal import Decimal
+
+from app.services.tts_service import SPEAKER_MAP, TTS_OUTPUT_DIR, CoquiTTSService, save_as_mp3
+
+logger = logging.getLogger(__name__)
+
+tts_service = CoquiTTSService()
+
+
+def confirmation_text(total_amount, language: str) -> str:
+    """The spoken confirmation of an order of `total_amount` AED."""
+    if language == 'ar':
+        return f"تم تأكيد طلبك بنجاح. المبلغ الإجمالي هو {total_amount:.2f} درهم."
+    return f"Your order has been placed successfully. The total is AED {total_amount:.2f}."
+
+
+def confirmation_audio_filename(order_id: int, language: str) -> str:
+    """The MP3 the outbox worker writes for an order's confirmation."""
+    return f"order-{order_id}-{language}.mp3"
+
+
+def handle_order_placed(session, delivery) -> None:
+    """
+    Outbox handler: synthesizes the confirmation audio of an order placed by voice.
+
+    Orders placed without a confirmation language (REST checkouts) have
+    nothing to synthesize. The file name is derived from the order, so a
+    redelivery finds it written and stops.
+
+    Raises:
+        RuntimeError: If synthesis or conversion failed; the outbox retries later.
+    """
+    payload = delivery.payload
+    language = payload.get("confirmation_language")
+    if not language:
+        return
+    filename = confirmation_audio_filename(payload["order_id"], language)
+    if os.path.exists(os.path.join(TTS_OUTPUT_DIR, filename)):
+        return
+    text = confirmation_text(Decimal(payload["total_amount"]), language)
+    audio_data = tts_service.synthesize(text, language=language, speaker_idx=SPEAKER_MAP.get(language, SPEAKER_MAP["en"]))
+    if not audio_data or not save_as_mp3(audio_data, TTS_OUTPUT_DIR, filename):
+        raise RuntimeError(f"Could not synthesize the confirmation of order {payload['order_id']}.")
+    logger.info(f"Confirmation audio of order {payload['order_id']} written to {filename}.")
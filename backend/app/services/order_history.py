@@ -0,0 +1,153 @@
+# In app/services/order_history.py
+"""
+A customer's order history: keyset-paginated summaries and order details.
+
+Both read paths are a single query whatever the number of orders or
+lines: a page of summaries joins the page's orders to their first lines
+and computes the line counts with window aggregates, and the details of
+an order join its lines to their products.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, select, tuple_
+
+from app import db
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.product import Product
+
+HISTORY_DEFAULT_LIMIT = 20
+HISTORY_MAX_LIMIT = 100
+# Product names listed in each order summary
+PREVIEW_NAMES = 3
+# Shown for lines whose product has since been deleted
+UNKNOWN_PRODUCT = ("Unknown Product", "منتج غير معروف")
+
+
+class HistoryError(ValueError):
+    """Raised for invalid history parameters; the message is safe to return to clients."""
+
+
+def encode_cursor(order_date: datetime, order_id: int) -> str:
+    """The cursor of the page following the order (order_date, order_id)."""
+    return f"{order_date.isoformat()},{order_id}"
+
+
+def parse_history_args(args) -> Dict:
+    """
+    Validates ?limit=N&cursor=C of an order history request.
+
+    Returns:
+        dict: Keyword arguments for `list_orders_page`.
+    """
+    try:
+        limit = int(args.get('limit', HISTORY_DEFAULT_LIMIT))
+    except ValueError:
+        raise HistoryError("'limit' must be an integer.")
+    if not 0 < limit <= HISTORY_MAX_LIMIT:
+        raise HistoryError(f"'limit' must be between 1 and {HISTORY_MAX_LIMIT}.")
+    after = None
+    if args.get('cursor'):
+        try:
+            order_date, order_id = args['cursor'].rsplit(',', 1)
+            after = (datetime.fromisoformat(order_date), int(order_id))
+        except ValueError:
+            raise HistoryError("'cursor' must be the 'next_cursor' of a previous page.")
+    return {"limit": limit, "after": after}
+
+
+def list_orders_page(customer_id: int, limit: int,
+                     after: Optional[Tuple[datetime, int]] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Returns one page of the customer's orders, newest first, after the `after` key.
+
+    Keyset pagination on (order_date, order_id), served by the
+    (customer_id, order_date, order_id) index: each page is an index range
+    scan, so its cost does not grow with the page number or the history.
+
+    Returns:
+        tuple: (order summaries, each with order_id, order_date, total_amount,
+            status, item_count, total_units and product_names / product_names_ar
+            of its first PREVIEW_NAMES lines; next cursor or None)
+    """
+    page = select(Order.order_id, Order.order_date, Order.total_amount, Order.status) \
+        .where(Order.customer_id == customer_id)
+    if after is not None:
+        page = page.where(tuple_(Order.order_date, Order.order_id) < tuple_(*after))
+    # One extra row tells whether another page follows
+    page = page.order_by(Order.order_date.desc(), Order.order_id.desc()).limit(limit + 1).cte('page')
+
+    line_no = func.row_number().over(partition_by=OrderItem.order_id, order_by=OrderItem.order_item_id)
+    lines = select(OrderItem.order_id, Product.name_en, Product.name_ar, line_no.label('line_no'),
+                   func.count().over(partition_by=OrderItem.order_id).label('item_count'),
+                   func.sum(OrderItem.quantity).over(partition_by=OrderItem.order_id).label('total_units')) \
+        .outerjoin(Product, Product.product_id == OrderItem.product_id) \
+        .where(OrderItem.order_id.in_(select(page.c.order_id))).subquery('lines')
+
+    rows = db.session.execute(
+        select(page, lines.c.name_en, lines.c.name_ar, lines.c.line_no, lines.c.item_count, lines.c.total_units)
+        .outerjoin(lines, and_(lines.c.order_id == page.c.order_id, lines.c.line_no <= PREVIEW_NAMES))
+        .order_by(page.c.order_date.desc(), page.c.order_id.desc(), lines.c.line_no)
+    ).fetchall()
+
+    orders: Dict[int, Dict] = {}
+    for row in rows:
+        order = orders.get(row.order_id)
+        if order is None:
+            order = orders[row.order_id] = {
+                "order_id": row.order_id,
+                "order_date": row.order_date,
+                "total_amount": row.total_amount,
+                "status": row.status,
+                "item_count": row.item_count or 0,
+                "total_units": row.total_units or 0,
+                "product_names": [],
+                "product_names_ar": [],
+            }
+        if row.line_no is not None:
+            order["product_names"].append(row.name_en or UNKNOWN_PRODUCT[0])
+            order["product_names_ar"].append(row.name_ar or UNKNOWN_PRODUCT[1])
+    summaries = list(orders.values())
+    page_orders = summaries[:limit]
+    next_cursor = None
+    if len(summaries) > limit:
+        last = page_orders[-1]
+        next_cursor = encode_cursor(last["order_date"], last["order_id"])
+    return page_orders, next_cursor
+
+
+def get_order_details(customer_id: int, order_id: int) -> Optional[Dict]:
+    """
+    Loads one of the customer's orders with its lines and their bilingual product names, in one query.
+
+    Returns:
+        dict or None: None if the customer has no such order; otherwise
+            order_id, order_date, total_amount, status and items (each with
+            product_id, product_name, product_name_ar, quantity and
+            price_at_purchase), in the order they were added.
+    """
+    rows = db.session.query(
+        Order.order_id, Order.order_date, Order.total_amount, Order.status,
+        OrderItem.order_item_id, OrderItem.product_id, OrderItem.quantity, OrderItem.price_at_purchase,
+        Product.name_en, Product.name_ar,
+    ).outerjoin(OrderItem, OrderItem.order_id == Order.order_id) \
+        .outerjoin(Product, Product.product_id == OrderItem.product_id) \
+        .filter(Order.order_id == order_id, Order.customer_id == customer_id) \
+        .order_by(OrderItem.order_item_id).all()
+    if not rows:
+        return None
+    first = rows[0]
+    return {
+        "order_id": first.order_id,
+        "order_date": first.order_date,
+        "total_amount": first.total_amount,
+        "status": first.status,
+        "items": [{
+            "product_id": row.product_id,
+            "product_name": row.name_en or UNKNOWN_PRODUCT[0],
+            "product_name_ar": row.name_ar or UNKNOWN_PRODUCT[1],
+            "quantity": row.quantity,
+            "price_at_purchase": row.price_at_purchase,
+        } for row in rows if row.order_item_id is not None],
+    }
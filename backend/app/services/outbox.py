@@ -0,0 +1,162 @@
+# In app/services/outbox.py
+"""
+Transactional outbox: side effects of a write, delivered after it commits.
+
+`publish` inserts one `outbox_events` row per handler of the event inside
+the caller's transaction, so the side effects exist if and only if the
+write committed, and the request pays only for the insert. The outbox
+worker (outbox_worker.py) claims due rows in batches, leasing them for
+OUTBOX_LEASE_SECONDS so concurrent workers and crashed deliveries never
+block each other, and runs each handler in its own transaction.
+
+Delivery is idempotent: a handler's database writes commit together with
+the row being marked processed, and are rolled back if another worker
+marked it first, so they apply exactly once. Effects outside the database
+(audio files, calls to other services) are at least once; their handlers
+key them on the event (see `OutboxDelivery.event_id`). Failed attempts
+are retried with exponential backoff; rows that used up
+OUTBOX_MAX_ATTEMPTS stay in the table, unprocessed, for inspection.
+"""
+import importlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from sqlalchemy import text
+
+from app.models.outbox_event import OutboxEvent
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# event_type -> handler name -> "module:function"; handlers are imported on
+# first delivery, so publishing never depends on which modules are loaded
+HANDLERS: Dict[str, Dict[str, str]] = {
+    "order_placed": {
+        "popularity_stats": "app.services.popularity_service:handle_order_placed",
+        "confirmation_audio": "app.services.order_confirmation:handle_order_placed",
+    },
+}
+
+# Leases due rows and counts the attempt before any handler runs, so a
+# worker dying mid-delivery still uses one up
+_CLAIM = """
+    UPDATE outbox_events SET available_at = :lease_until, attempts = attempts + 1
+    WHERE event_id IN (
+        SELECT event_id FROM outbox_events
+        WHERE processed_at IS NULL AND available_at <= :now AND attempts < :max_attempts
+        ORDER BY available_at, event_id LIMIT :batch_size{locking}
+    )
+    RETURNING event_id, event_type, handler, payload, attempts
+"""
+# Rows another worker is claiming are left to it
+_CLAIM_POSTGRESQL = text(_CLAIM.format(locking=" FOR UPDATE SKIP LOCKED"))
+_CLAIM_SQLITE = text(_CLAIM.format(locking=""))
+
+_MARK_PROCESSED = text("""
+    UPDATE outbox_events SET processed_at = :now, last_error = NULL
+    WHERE event_id = :event_id AND processed_at IS NULL
+""")
+_MARK_FAILED = text("""
+    UPDATE outbox_events SET available_at = :retry_at, last_error = :error
+    WHERE event_id = :event_id AND processed_at IS NULL
+""")
+
+
+class OutboxDelivery:
+    """One claimed outbox row, as handed to its handler."""
+
+    def __init__(self, event_id: int, event_type: str, handler: str, payload: Dict, attempts: int):
+        self.event_id = event_id
+        self.event_type = event_type
+        self.handler = handler
+        self.payload = payload
+        self.attempts = attempts
+
+
+def publish(session, event_type: str, payload: Dict, now: datetime = None) -> None:
+    """
+    Queues `event_type` for each of its handlers, inside the caller's transaction.
+
+    Args:
+        session: The session the triggering write is made with; nothing is committed.
+        event_type (str): A key of HANDLERS.
+        payload (dict): JSON-serializable event data.
+    """
+    handlers = HANDLERS[event_type]
+    now = now or datetime.utcnow()
+    body = json.dumps(payload)
+    session.execute(OutboxEvent.__table__.insert(), [
+        {"event_type": event_type, "handler": handler, "payload": body, "created_at": now, "available_at": now,
+         "attempts": 0} for handler in handlers])
+
+
+def _resolve(event_type: str, handler: str) -> Callable:
+    module_name, function_name = HANDLERS[event_type][handler].split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def claim(session, batch_size: int, now: datetime = None) -> List[OutboxDelivery]:
+    """
+    Leases up to `batch_size` due rows, oldest first, and commits the lease.
+
+    Returns:
+        list: The claimed deliveries.
+    """
+    now = now or datetime.utcnow()
+    statement = _CLAIM_POSTGRESQL if session.bind.dialect.name == 'postgresql' else _CLAIM_SQLITE
+    try:
+        rows = session.execute(statement, {
+            "now": now, "lease_until": now + timedelta(seconds=Config.OUTBOX_LEASE_SECONDS),
+            "max_attempts": Config.OUTBOX_MAX_ATTEMPTS, "batch_size": batch_size}).fetchall()
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return sorted((OutboxDelivery(row.event_id, row.event_type, row.handler, json.loads(row.payload), row.attempts)
+                   for row in rows), key=lambda delivery: delivery.event_id)
+
+
+def deliver(session, delivery: OutboxDelivery) -> bool:
+    """
+    Runs one delivery's handler and records the outcome, each in its own transaction.
+
+    Returns:
+        bool: True if the handler succeeded (or another worker already delivered it).
+    """
+    try:
+        _resolve(delivery.event_type, delivery.handler)(session, delivery)
+        if not session.execute(_MARK_PROCESSED, {"event_id": delivery.event_id, "now": datetime.utcnow()}).rowcount:
+            # Delivered meanwhile by a worker whose lease this one outlived
+            session.rollback()
+            return True
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        delay = Config.OUTBOX_RETRY_BASE_SECONDS * 2 ** (delivery.attempts - 1)
+        final = delivery.attempts >= Config.OUTBOX_MAX_ATTEMPTS
+        log = logger.error if final else logger.warning
+        log(f"Outbox event {delivery.event_id} ({delivery.event_type}/{delivery.handler}) failed attempt "
+            f"{delivery.attempts}{'; giving up' if final else f', retrying in {delay:.0f}s'}: {e}")
+        session.execute(_MARK_FAILED, {"event_id": delivery.event_id, "error": str(e)[:2000],
+                                       "retry_at": datetime.utcnow() + timedelta(seconds=delay)})
+        session.commit()
+        return False
+
+
+def drain(session, batch_size: int) -> Dict[str, int]:
+    """
+    Claims and delivers batches until none is due.
+
+    Returns:
+        dict: "delivered" and "failed" counts.
+    """
+    counts = {"delivered": 0, "failed": 0}
+    while True:
+        batch = claim(session, batch_size)
+        for delivery in batch:
+            counts["delivered" if deliver(session, delivery) else "failed"] += 1
+        if len(batch) < batch_size:
+            return counts
@@ -0,0 +1,61 @@
+# In app/services/periodic.py
+"""
+Background maintenance tasks run on a timer inside each worker process.
+
+Used for database housekeeping that must keep running without a request
+to trigger it (expired stock holds, sharded stock consolidation). Tasks
+must be safe to run concurrently from several workers.
+"""
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Calls `task()` inside an application context every `interval_seconds`, on a daemon thread.
+    """
+
+    def __init__(self, app, name: str, interval_seconds: float, task: Callable[[], object]):
+        self.app = app
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.task = task
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_once(self):
+        """Runs the task now, in the calling thread; returns its result."""
+        with self.app.app_context():
+            return self.task()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception:
+                logger.error(f"Periodic task '{self.name}' failed.", exc_info=True)
+
+
+def start_periodic_task(app, name: str, interval_seconds: float, task: Callable[[], object]):
+    """
+    Starts a task in this worker unless disabled (interval 0) or under test.
+
+    Returns:
+        PeriodicTask or None
+    """
+    if not interval_seconds or interval_seconds <= 0 or app.config.get('TESTING'):
+        return None
+    periodic = PeriodicTask(app, name, interval_seconds, task)
+    periodic.start()
+    return periodic
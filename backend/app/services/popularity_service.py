@@ -0,0 +1,199 @@
+# In app/services/popularity_service.py
+"""
+Popularity and per-customer affinity from precomputed order statistics.
+
+Each order's lines are upserted into `product_stats` and
+`customer_product_stats` by the outbox worker shortly after checkout
+commits (`handle_order_placed`), exactly once per order, so the
+aggregates stay current without ever rescanning the orders table and
+checkouts never queue on a popular product's stats row. The
+in-memory ranker reads those tables to order ambiguous product matches:
+what this customer usually buys first, then what everyone buys most.
+
+`customer_product_stats` with the per-customer order counts of
+`customer_order_stats` is also each customer's repeat-purchase index:
+`usual_basket` reads the products they buy in most of their orders
+straight from it, in one indexed query.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import DBAPIError
+
+from app import db
+from app.services.upsert import upsert
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# A product is part of a customer's usual basket if it was in at least this
+# share of their orders, and bought within the last USUAL_MAX_AGE_DAYS
+USUAL_MIN_SHARE = 0.5
+USUAL_MAX_AGE_DAYS = 90
+USUAL_MAX_ITEMS = 20
+
+
+def record_order_stats(session, customer_id: int, quantities: Dict[int, int],
+                       ordered_at: Optional[datetime] = None) -> None:
+    """
+    Adds one order's lines to the popularity aggregates, inside the caller's transaction.
+
+    Args:
+        session: The session the order is being written with.
+        customer_id (int): The ordering customer.
+        quantities (dict): product_id -> quantity ordered.
+        ordered_at (datetime, optional): Order time; defaults to now (UTC).
+    """
+    from app.models.product_stats import ProductStats, CustomerProductStats, CustomerOrderStats
+
+    if not quantities:
+        return
+    ordered_at = ordered_at or datetime.utcnow()
+    product_ids = sorted(quantities)  # Stable key order keeps concurrent upserts from deadlocking
+    upsert(session, ProductStats.__table__,
+           [{"product_id": pid, "order_count": 1, "units_sold": quantities[pid], "last_ordered_at": ordered_at}
+            for pid in product_ids],
+           key_columns=("product_id",), increment_columns=("order_count", "units_sold"),
+           replace_columns=("last_ordered_at",))
+    upsert(session, CustomerProductStats.__table__,
+           [{"customer_id": customer_id, "product_id": pid, "order_count": 1, "units": quantities[pid],
+             "last_ordered_at": ordered_at} for pid in product_ids],
+           key_columns=("customer_id", "product_id"), increment_columns=("order_count", "units"),
+           replace_columns=("last_ordered_at",))
+    upsert(session, CustomerOrderStats.__table__,
+           [{"customer_id": customer_id, "order_count": 1, "last_ordered_at": ordered_at}],
+           key_columns=("customer_id",), increment_columns=("order_count",), replace_columns=("last_ordered_at",))
+
+
+def handle_order_placed(session, delivery) -> None:
+    """Outbox handler: adds a committed order to the popularity aggregates."""
+    payload = delivery.payload
+    record_order_stats(session, payload["customer_id"],
+                       {int(product_id): quantity for product_id, quantity in payload["quantities"].items()},
+                       ordered_at=datetime.fromisoformat(payload["ordered_at"]))
+
+
+def usual_basket(customer_id: int, now: Optional[datetime] = None) -> List[Dict]:
+    """
+    The products a customer reorders regularly, with their usual quantities.
+
+    A product qualifies if it was in at least USUAL_MIN_SHARE of the
+    customer's orders and was last bought within USUAL_MAX_AGE_DAYS, and is
+    still on sale. The usual quantity is the average quantity per order
+    that contained it.
+
+    Returns:
+        list: Up to USUAL_MAX_ITEMS dicts with product_id, name_en, name_ar
+            and quantity, most regularly bought first. Empty for customers
+            with no orders yet.
+    """
+    from app.models.product import Product
+    from app.models.product_stats import CustomerProductStats, CustomerOrderStats
+
+    now = now or datetime.utcnow()
+    rows = db.session.query(
+        Product.product_id, Product.name_en, Product.name_ar,
+        CustomerProductStats.order_count, CustomerProductStats.units,
+    ).join(CustomerProductStats, CustomerProductStats.product_id == Product.product_id) \
+        .join(CustomerOrderStats, CustomerOrderStats.customer_id == CustomerProductStats.customer_id) \
+        .filter(CustomerProductStats.customer_id == customer_id,
+                CustomerProductStats.order_count >= CustomerOrderStats.order_count * USUAL_MIN_SHARE,
+                CustomerProductStats.last_ordered_at >= now - timedelta(days=USUAL_MAX_AGE_DAYS),
+                Product.is_active.is_(True)) \
+        .order_by(CustomerProductStats.order_count.desc(), CustomerProductStats.last_ordered_at.desc(),
+                  Product.product_id) \
+        .limit(USUAL_MAX_ITEMS).all()
+    return [{"product_id": row.product_id, "name_en": row.name_en, "name_ar": row.name_ar,
+             "quantity": max(1, round(row.units / row.order_count))} for row in rows]
+
+
+class PopularityRanker:
+    """
+    In-memory popularity and affinity scores used to order product matches.
+
+    Global order counts are loaded in one query and reloaded after
+    `max_age_seconds` (to see other workers' orders); per-customer counts
+    are loaded on first use and kept in a bounded LRU. Orders placed by
+    this worker are applied immediately via `observe_order`.
+    """
+
+    def __init__(self, max_age_seconds: float = 300.0, max_customers: int = 10000):
+        self.max_age_seconds = max_age_seconds
+        self.max_customers = max_customers
+        self._lock = threading.Lock()
+        self._popularity: Dict[int, int] = {}
+        self._loaded_at = None
+        self._affinity = OrderedDict()  # customer_id -> (loaded_at, {product_id: order_count})
+
+    def _ensure_popularity(self) -> None:
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.max_age_seconds:
+            return
+        from app.models.product_stats import ProductStats
+
+        rows = db.session.query(ProductStats.product_id, ProductStats.order_count).all()
+        with self._lock:
+            self._popularity = {row.product_id: row.order_count for row in rows}
+            self._loaded_at = time.monotonic()
+
+    def _customer_affinity(self, customer_id) -> Dict[int, int]:
+        with self._lock:
+            entry = self._affinity.get(customer_id)
+            if entry is not None and time.monotonic() - entry[0] < self.max_age_seconds:
+                self._affinity.move_to_end(customer_id)
+                return entry[1]
+        from app.models.product_stats import CustomerProductStats
+
+        rows = db.session.query(CustomerProductStats.product_id, CustomerProductStats.order_count) \
+            .filter(CustomerProductStats.customer_id == customer_id).all()
+        counts = {row.product_id: row.order_count for row in rows}
+        with self._lock:
+            self._affinity[customer_id] = (time.monotonic(), counts)
+            self._affinity.move_to_end(customer_id)
+            while len(self._affinity) > self.max_customers:
+                self._affinity.popitem(last=False)
+        return counts
+
+    def observe_order(self, customer_id, product_ids) -> None:
+        """Applies a just-committed order to the in-memory scores."""
+        customer_id = int(customer_id)  # JWT identities arrive as strings
+        with self._lock:
+            for product_id in set(product_ids):
+                self._popularity[product_id] = self._popularity.get(product_id, 0) + 1
+            entry = self._affinity.get(customer_id)
+            if entry is not None:
+                for product_id in set(product_ids):
+                    entry[1][product_id] = entry[1].get(product_id, 0) + 1
+
+    def rank(self, matches: List[Dict], customer_id=None) -> List[Dict]:
+        """
+        Orders product matches by match quality, then customer affinity, then popularity.
+
+        Args:
+            matches (list): Dicts with 'product_id' and optionally a 'match' tier
+                (lower is better) and a fuzzy 'score' (higher is better).
+            customer_id (optional): Whose order history to favour.
+
+        Returns:
+            list: The same dicts, best first. Ties keep their original order.
+        """
+        if len(matches) < 2:
+            return list(matches)
+        try:
+            self._ensure_popularity()
+            affinity = self._customer_affinity(int(customer_id)) if customer_id is not None else {}
+        except DBAPIError:
+            db.session.rollback()
+            logger.warning("Popularity statistics unavailable; keeping match order. "
+                           "Run 'flask db upgrade' to create them.", exc_info=True)
+            return list(matches)
+        popularity = self._popularity
+        return sorted(matches, key=lambda m: (m.get("match", 0), -m.get("score", 0),
+                                              -affinity.get(m["product_id"], 0),
+                                              -popularity.get(m["product_id"], 0)))
+
+
+popularity_ranker = PopularityRanker(max_age_seconds=Config.POPULARITY_MAX_AGE_SECONDS)
@@ -0,0 +1,229 @@
+# In app/services/product_index.py
+import bisect
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from app.services import catalog_events
+from app.services.catalog_cache import CatalogVersionTracker, catalog_version
+from app.services.text_normalization import normalize_name
+from app.services.fuzzy_match import FuzzyMatcher
+
+logger = logging.getLogger(__name__)
+
+# Match tiers, best first
+MATCH_EXACT = 0
+MATCH_PREFIX = 1
+MATCH_TOKENS = 2
+MATCH_FUZZY = 3
+
+# Fuzzy candidates below this score are not offered as matches
+FUZZY_MIN_SCORE = 0.5
+
+# Prefix scans stop after this many candidate keys
+MAX_PREFIX_CANDIDATES = 200
+
+
+class ProductNameIndex:
+    """
+    An in-memory index of active product names in English and Arabic.
+
+    Names are normalized (see text_normalization) and indexed three ways:
+    exact normalized name, sorted keys for prefix scans, and token postings
+    for "all spoken words appear in the name" matches. Results are ranked
+    deterministically by match tier, then whether the name is in the
+    requested language, then name length, then product_id. When none of
+    these match, a FuzzyMatcher over the same names catches ASR near-misses.
+
+    The index loads the active catalog on first use, follows committed ORM
+    product writes through catalog_events, and is rebuilt when the shared
+    catalog version shows writes it has not seen (e.g. from other workers).
+    """
+
+    def __init__(self, version_tracker: CatalogVersionTracker):
+        self.version_tracker = version_tracker
+        self._lock = threading.RLock()
+        self._built = False
+        self._built_version = None
+        self._products: Dict[int, Dict] = {}
+        self._keys_by_product: Dict[int, List[tuple]] = {}
+        self._exact: Dict[str, set] = {}
+        self._sorted_keys: List[tuple] = []  # (key, product_id)
+        self._postings: Dict[str, set] = {}
+        self._fuzzy = FuzzyMatcher()
+
+    # --- Building and maintenance ---
+
+    def _load_rows(self) -> List[Dict]:
+        from app import db
+        from app.models.product import Product
+
+        rows = db.session.query(Product.product_id, Product.name_en, Product.name_ar) \
+            .filter(Product.is_active == True).all()
+        return [{"product_id": r.product_id, "name_en": r.name_en, "name_ar": r.name_ar, "is_active": True} for r in rows]
+
+    def build(self, rows: Iterable[Dict]) -> None:
+        """Replaces the index contents with the given product rows."""
+        with self._lock:
+            self._products.clear()
+            self._keys_by_product.clear()
+            self._exact.clear()
+            self._sorted_keys = []
+            self._postings.clear()
+            self._fuzzy.clear()
+            for row in rows:
+                self._add(row, keep_sorted=False)
+            self._sorted_keys.sort()
+            self._built = True
+        logger.info(f"Product name index built with {len(self._products)} products.")
+
+    def _is_current(self, version) -> bool:
+        # An unknown version (not migrated yet) keeps whatever was built
+        return self._built and (version is None or version == self._built_version)
+
+    def ensure_fresh(self) -> None:
+        """Builds the index on first use and rebuilds it when the catalog version moved."""
+        version = self.version_tracker.current_version()
+        if self._is_current(version):
+            return
+        with self._lock:
+            if self._is_current(version):
+                return
+            self.build(self._load_rows())
+            self._built_version = version
+
+    def invalidate(self, *args) -> None:
+        """Forces a full rebuild on next use."""
+        with self._lock:
+            self._built = False
+
+    def apply_changes(self, changes, version=None) -> None:
+        """Applies committed product changes (see catalog_events)."""
+        with self._lock:
+            if not self._built:
+                return
+            for kind, product_id, data in changes:
+                self._remove(product_id)
+                if kind == 'upsert' and data.get("is_active", True):
+                    self._add(data, keep_sorted=True)
+            # Caught up only if no other transaction committed in between
+            if version is not None and self._built_version is not None and version == self._built_version + 1:
+                self._built_version = version
+
+    def _add(self, row: Dict, keep_sorted: bool) -> None:
+        product_id = row["product_id"]
+        self._products[product_id] = {"product_id": product_id, "name_en": row["name_en"], "name_ar": row.get("name_ar")}
+        keys = []
+        for language in ("en", "ar"):
+            key = normalize_name(row.get(f"name_{language}") or "")
+            if not key:
+                continue
+            keys.append((key, language))
+            self._exact.setdefault(key, set()).add(product_id)
+            if keep_sorted:
+                bisect.insort(self._sorted_keys, (key, product_id))
+            else:
+                self._sorted_keys.append((key, product_id))
+            for token in key.split():
+                self._postings.setdefault(token, set()).add(product_id)
+        self._keys_by_product[product_id] = keys
+        self._fuzzy.add(product_id, row["name_en"], row.get("name_ar"))
+
+    def _remove(self, product_id: int) -> None:
+        keys = self._keys_by_product.pop(product_id, None)
+        self._products.pop(product_id, None)
+        self._fuzzy.remove(product_id)
+        if not keys:
+            return
+        for key, _ in keys:
+            ids = self._exact.get(key)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._exact[key]
+            position = bisect.bisect_left(self._sorted_keys, (key, product_id))
+            if position < len(self._sorted_keys) and self._sorted_keys[position] == (key, product_id):
+                del self._sorted_keys[position]
+            for token in key.split():
+                postings = self._postings.get(token)
+                if postings is not None:
+                    postings.discard(product_id)
+                    if not postings:
+                        del self._postings[token]
+
+    # --- Lookups ---
+
+    def lookup(self, query: str, language: Optional[str] = None, limit: int = 5, fuzzy: bool = True) -> List[Dict]:
+        """
+        Finds active products whose name matches a spoken or typed query.
+
+        Args:
+            query (str): The product name as heard or typed.
+            language (str, optional): 'en' or 'ar'; names in this language rank first.
+            limit (int): Maximum number of results.
+            fuzzy (bool): Fall back to fuzzy matching when nothing matches exactly.
+
+        Returns:
+            list: Product summaries (product_id, name_en, name_ar) with their
+                  'match' tier, best first. Empty when nothing matches.
+        """
+        self.ensure_fresh()
+        key = normalize_name(query)
+        if not key:
+            return []
+
+        with self._lock:
+            tiers: Dict[int, int] = {}
+            for product_id in self._exact.get(key, ()):
+                tiers[product_id] = MATCH_EXACT
+
+            position = bisect.bisect_left(self._sorted_keys, (key, -1))
+            scanned = 0
+            while position < len(self._sorted_keys) and scanned < MAX_PREFIX_CANDIDATES:
+                candidate_key, product_id = self._sorted_keys[position]
+                if not candidate_key.startswith(key):
+                    break
+                tiers.setdefault(product_id, MATCH_PREFIX)
+                position += 1
+                scanned += 1
+
+            tokens = key.split()
+            postings = [self._postings.get(token) for token in tokens]
+            if all(postings):
+                postings.sort(key=len)
+                for product_id in set.intersection(*postings):
+                    tiers.setdefault(product_id, MATCH_TOKENS)
+
+            ranked = sorted(tiers.items(), key=lambda item: self._rank(item[0], item[1], language))
+            if ranked or not fuzzy:
+                return [dict(self._products[product_id], match=tier) for product_id, tier in ranked[:limit]]
+        return self.fuzzy_search(query, limit=limit)
+
+    def fuzzy_search(self, query: str, limit: int = 5, budget_seconds: float = 0.01) -> List[Dict]:
+        """
+        Returns near-miss matches for a query, each with a 'score', best first.
+        """
+        self.ensure_fresh()
+        matches = self._fuzzy.search(query, k=limit, budget_seconds=budget_seconds)
+        with self._lock:
+            return [dict(self._products[m["product_id"]], match=MATCH_FUZZY, score=m["score"])
+                    for m in matches if m["score"] >= FUZZY_MIN_SCORE and m["product_id"] in self._products]
+
+    def summaries(self, product_ids: Iterable[int]) -> List[Dict]:
+        """Returns the indexed summaries of the given products, in the given order."""
+        self.ensure_fresh()
+        with self._lock:
+            return [dict(self._products[product_id]) for product_id in product_ids if product_id in self._products]
+
+    def _rank(self, product_id: int, tier: int, language: Optional[str]) -> tuple:
+        keys = self._keys_by_product.get(product_id, [])
+        in_language = any(lang == language for _, lang in keys)
+        shortest = min((len(key) for key, lang in keys if lang == language or not in_language), default=0)
+        return (tier, not in_language, shortest, product_id)
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+
+product_index = ProductNameIndex(catalog_version)
+catalog_events.subscribe(product_index.apply_changes, product_index.invalidate)
@@ -0,0 +1,115 @@
+# In app/services/product_listing.py
+"""
+Keyset-paginated product listings shared by the product and category routes.
+"""
+import hashlib
+from datetime import timezone
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+from flask import current_app, request
+
+from app import db
+from app.models.category_closure import CategoryClosure
+from app.models.product import Product
+from app.services.product_serializer import BILINGUAL_FIELDS, json_object, product_fragments
+
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 200
+# Query parameters that opt a listing request into the paginated path
+LIST_QUERY_PARAMS = ('limit', 'after_id', 'cursor', 'category_id', 'brand', 'min_price', 'max_price', 'fields')
+# Fields a listing can project; product_id is always included
+PRODUCT_FIELDS = BILINGUAL_FIELDS
+
+
+class ListingError(ValueError):
+    """Raised for invalid listing parameters; the message is safe to return to clients."""
+
+
+def parse_listing_args(args):
+    """
+    Validates the pagination, filter and projection parameters of a listing request.
+
+    Args:
+        args: The request's query parameters.
+
+    Returns:
+        dict: Keyword arguments for `list_products_page`.
+    """
+    try:
+        limit = int(args.get('limit', LIST_DEFAULT_LIMIT))
+        after_id = int(args.get('after_id', args.get('cursor', 0)))
+        category_id = int(args['category_id']) if args.get('category_id') else None
+    except ValueError:
+        raise ListingError("'limit', 'after_id'/'cursor' and 'category_id' must be integers.")
+    if not 0 < limit <= LIST_MAX_LIMIT:
+        raise ListingError(f"'limit' must be between 1 and {LIST_MAX_LIMIT}.")
+    try:
+        min_price = Decimal(args['min_price']) if args.get('min_price') else None
+        max_price = Decimal(args['max_price']) if args.get('max_price') else None
+    except InvalidOperation:
+        raise ListingError("'min_price' and 'max_price' must be numbers.")
+
+    fields = list(PRODUCT_FIELDS)
+    if args.get('fields'):
+        requested = {f.strip() for f in args['fields'].split(',') if f.strip()}
+        unknown = requested.difference(PRODUCT_FIELDS)
+        if unknown:
+            raise ListingError(f"Unknown fields: {', '.join(sorted(unknown))}.")
+        fields = [f for f in PRODUCT_FIELDS if f in requested or f == 'product_id']
+    return {"limit": limit, "after_id": after_id, "category_id": category_id, "brand": args.get('brand'),
+            "min_price": min_price, "max_price": max_price, "fields": fields}
+
+
+def list_products_page(limit, after_id, category_id=None, brand=None, min_price=None, max_price=None,
+                       fields=PRODUCT_FIELDS, subtree_category_id: Optional[int] = None):
+    """
+    Returns one page of active products after `after_id`, selecting only `fields`.
+
+    Keyset pagination on the primary key: each page is an index range scan,
+    so its cost does not grow with the page number or the catalog size.
+    `subtree_category_id` restricts the page to a category and all of its
+    descendants through one join on the category closure table.
+
+    Returns:
+        tuple: (encoded JSON array of products, next cursor or None)
+    """
+    query = db.session.query(*[getattr(Product, field) for field in fields]) \
+        .filter(Product.is_active == True, Product.product_id > after_id)
+    if subtree_category_id is not None:
+        query = query.join(CategoryClosure, CategoryClosure.descendant_id == Product.category_id) \
+            .filter(CategoryClosure.ancestor_id == subtree_category_id)
+    if category_id is not None:
+        query = query.filter(Product.category_id == category_id)
+    if brand:
+        query = query.filter(Product.brand == brand)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    # One extra row tells whether another page follows
+    rows = query.order_by(Product.product_id).limit(limit + 1).all()
+
+    page = rows[:limit]
+    next_cursor = page[-1].product_id if len(rows) > limit else None
+    projection = fields if list(fields) != list(PRODUCT_FIELDS) else None
+    return product_fragments.encode_list(page, fields=projection), next_cursor
+
+
+def listing_response(products: bytes, next_cursor):
+    """Builds the conditional JSON response for one listing page."""
+    body = json_object(products=products, next_cursor=next_cursor)
+    return conditional_json_response(body, hashlib.sha1(body).hexdigest()[:20])
+
+
+def conditional_json_response(body: bytes, etag: str, last_modified=None):
+    """
+    Wraps a serialized JSON body in a response that honours If-None-Match / If-Modified-Since.
+    """
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # Clients may keep the body but must revalidate before each use
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -0,0 +1,128 @@
+# In app/services/product_search.py
+import logging
+import re
+from typing import List
+
+from sqlalchemy import func, literal_column, or_, text
+from sqlalchemy.exc import DBAPIError
+
+from app import db
+from app.models.product import Product
+from app.models.product_stats import ProductStats
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration per request language (see the search index migration)
+PG_TS_CONFIGS = {"en": "english", "ar": "arabic"}
+
+# FTS5 column weights: name_en, name_ar, description_en, description_ar
+FTS5_WEIGHTS = "10.0, 10.0, 1.0, 1.0"
+
+# Popularity boost added to the text relevance: weight * orders / (orders + half-saturation).
+# It saturates so that a best-seller cannot outrank a clearly better text match.
+POPULARITY_WEIGHT_PG = 0.2
+POPULARITY_WEIGHT_SQLITE = 2.0
+POPULARITY_HALF_SATURATION = 20.0
+
+_FTS5_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _popularity_boost(order_count, weight: float):
+    orders = func.coalesce(order_count, 0)
+    return weight * orders / (orders + POPULARITY_HALF_SATURATION)
+
+
+def _name_columns(lang: str):
+    if lang == 'ar':
+        return Product.name_ar, Product.description_ar
+    return Product.name_en, Product.description_en
+
+
+def _search_postgresql(query: str, lang: str, limit: int, offset: int) -> List[Product]:
+    name_column, description_column = _name_columns(lang)
+    ts_query = func.websearch_to_tsquery(PG_TS_CONFIGS.get(lang, "english"), query)
+    # Substrings catch partial words ("app" for "Red Apples"), like SQLite's prefix queries;
+    # the trigram indexes on the names and descriptions serve them
+    pattern = f"%{query}%"
+    search_vector = literal_column("products.search_vector")
+    rank = func.ts_rank_cd(search_vector, ts_query) + func.similarity(name_column, query) \
+        + _popularity_boost(ProductStats.order_count, POPULARITY_WEIGHT_PG)
+    return Product.query \
+        .outerjoin(ProductStats, ProductStats.product_id == Product.product_id) \
+        .filter(Product.is_active == True,
+                or_(search_vector.op('@@')(ts_query), name_column.op('%')(query),
+                    name_column.ilike(pattern), description_column.ilike(pattern))) \
+        .order_by(rank.desc(), Product.product_id) \
+        .limit(limit).offset(offset).all()
+
+
+def _search_sqlite(query: str, lang: str, limit: int, offset: int) -> List[Product]:
+    # Quote every token so user input cannot inject FTS5 syntax; '*' allows prefixes
+    tokens = _FTS5_TOKEN.findall(query)
+    if not tokens:
+        return []
+    match = " ".join(f'"{token}"*' for token in tokens)
+    rows = db.session.execute(text(
+        "SELECT p.product_id FROM products_fts "
+        "JOIN products p ON p.product_id = products_fts.rowid "
+        "LEFT JOIN product_stats ps ON ps.product_id = p.product_id "
+        "WHERE products_fts MATCH :match AND p.is_active = 1 "
+        # bm25() is lower-is-better, so the popularity boost is subtracted
+        f"ORDER BY bm25(products_fts, {FTS5_WEIGHTS}) "
+        "- :weight * COALESCE(ps.order_count, 0) / (COALESCE(ps.order_count, 0) + :half), p.product_id "
+        "LIMIT :limit OFFSET :offset"
+    ), {"match": match, "limit": limit, "offset": offset,
+        "weight": POPULARITY_WEIGHT_SQLITE, "half": POPULARITY_HALF_SATURATION}).fetchall()
+    ids = [row.product_id for row in rows]
+    if not ids:
+        return []
+    position = {product_id: index for index, product_id in enumerate(ids)}
+    products = Product.query.filter(Product.product_id.in_(ids)).all()
+    products.sort(key=lambda p: position[p.product_id])
+    return products
+
+
+def _search_ilike(query: str, lang: str, limit: int, offset: int) -> List[Product]:
+    name_column, description_column = _name_columns(lang)
+    return Product.query \
+        .filter(Product.is_active == True,
+                or_(name_column.ilike(f"%{query}%"), description_column.ilike(f"%{query}%"))) \
+        .order_by(Product.product_id) \
+        .limit(limit).offset(offset).all()
+
+
+_SEARCH_BACKENDS = {
+    'postgresql': _search_postgresql,
+    'sqlite': _search_sqlite,
+}
+
+
+def search_products_ranked(query: str, lang: str = 'en', limit: int = 50, offset: int = 0) -> List[Product]:
+    """
+    Searches active products using the database's own search indexes.
+
+    PostgreSQL uses the generated tsvector column plus pg_trgm similarity on
+    the name and substring matches on the name and description; SQLite uses the products_fts FTS5 table. Ranking, limit and
+    offset are applied in SQL, with a saturating boost for products that are
+    ordered often (see the product_stats table). Other dialects, or databases
+    where the search migrations have not been applied, fall back to a
+    limited ilike scan.
+
+    Args:
+        query (str): The search text.
+        lang (str): 'en' or 'ar'; selects the text search configuration.
+        limit (int): Maximum number of products returned.
+        offset (int): Number of ranked results to skip.
+
+    Returns:
+        list: Matching Product objects, best first.
+    """
+    backend = _SEARCH_BACKENDS.get(db.session.bind.dialect.name)
+    if backend is not None:
+        try:
+            return backend(query, lang, limit, offset)
+        except DBAPIError:
+            db.session.rollback()
+            logger.warning("Database search index unavailable; falling back to ilike search. "
+                           "Run 'flask db upgrade' to install it.", exc_info=True)
+    return _search_ilike(query, lang, limit, offset)
@@ -0,0 +1,222 @@
+# In app/services/product_serializer.py
+"""
+The single place products are turned into JSON.
+
+Two shapes exist: 'bilingual' (both names and descriptions, used by the
+product routes) and 'localized' (one language, with English fallback,
+used by Product.to_dict). Each product's encoded fragment is cached per
+shape, language and field projection, so list and search responses are
+assembled by joining cached bytes. Fragments are dropped when the product
+changes (catalog_events), and all of them when the catalog version moves
+on without this worker having seen the change.
+
+Stock moved by cart holds and checkout publishes no catalog event, so
+fragments are cached without their stock_quantity value and the product's
+current value is spliced in each time a response is assembled.
+"""
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from flask import current_app
+
+from app.services import catalog_events
+from app.services.catalog_cache import CatalogVersionTracker, catalog_version
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+BILINGUAL_FIELDS = ('product_id', 'name_en', 'name_ar', 'description_en', 'description_ar', 'price', 'brand',
+                    'stock_quantity', 'unit_type', 'image_url', 'category_id', 'is_active')
+
+# A field name cannot appear unescaped inside a JSON string, so this marks the value's position
+_STOCK_MEMBER = b'"stock_quantity":'
+_NULL = b'null'
+
+
+def _value(product, field):
+    # Products may be ORM objects, query rows or plain dicts (catalog_events snapshots)
+    if isinstance(product, dict):
+        return product.get(field)
+    return getattr(product, field)
+
+
+def product_dict(product, shape: str = 'bilingual', lang: str = 'en', fields: Optional[Sequence[str]] = None) -> Dict:
+    """
+    Builds the JSON-ready dict for a product.
+
+    Args:
+        product: A Product, a query row or a dict with the product's columns.
+        shape (str): 'bilingual' or 'localized'.
+        lang (str): Language of a 'localized' product ('en' or 'ar').
+        fields (sequence, optional): Subset of BILINGUAL_FIELDS for a 'bilingual' product.
+
+    Returns:
+        dict: The serialized product, with the price as a float.
+    """
+    if shape == 'localized':
+        name, description = (('name_ar', 'description_ar') if lang == 'ar' else ('name_en', 'description_en'))
+        # Missing Arabic translations fall back to English
+        result = {
+            "product_id": _value(product, 'product_id'),
+            "name": _value(product, name) or _value(product, 'name_en'),
+            "description": _value(product, description) or _value(product, 'description_en'),
+            "price": _value(product, 'price'),
+            "category_id": _value(product, 'category_id'),
+            "brand": _value(product, 'brand'),
+            "stock_quantity": _value(product, 'stock_quantity'),
+            "unit_type": _value(product, 'unit_type'),
+            "image_url": _value(product, 'image_url'),
+            "is_active": _value(product, 'is_active'),
+        }
+    else:
+        result = {field: _value(product, field) for field in (fields or BILINGUAL_FIELDS)}
+    if result.get('price') is not None:
+        result['price'] = float(result['price'])
+    return result
+
+
+def _encode_stock(stock) -> bytes:
+    return _NULL if stock is None else str(int(stock)).encode()
+
+
+class StockTemplate(namedtuple('StockTemplate', ['product_ids', 'parts'])):
+    """
+    An encoded JSON array of products with their stock_quantity values left open.
+
+    `parts` has one more element than `product_ids`; the stock of the i-th
+    product goes between parts[i] and parts[i + 1].
+    """
+
+    def render(self, stock: Dict[int, int]) -> bytes:
+        """Fills in the stock of each product (0 for products missing from `stock`)."""
+        values = [_encode_stock(stock.get(product_id, 0)) for product_id in self.product_ids]
+        pieces = [self.parts[0]]
+        for value, part in zip(values, self.parts[1:]):
+            pieces.append(value)
+            pieces.append(part)
+        return b"".join(pieces)
+
+
+class ProductFragmentCache:
+    """
+    Bounded LRU of encoded product JSON fragments.
+
+    Each entry is the fragment split around its stock_quantity value, as
+    (head, tail); tail is None when the fragment has no stock_quantity.
+    """
+
+    def __init__(self, version_tracker: CatalogVersionTracker, max_entries: int = 50000):
+        self.version_tracker = version_tracker
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._fragments = OrderedDict()  # (product_id, shape, lang, fields) -> (head, tail)
+        self._keys_by_product: Dict[int, set] = {}
+        self._seen_version = None
+
+    def _check_version(self) -> None:
+        version = self.version_tracker.current_version()
+        if version is not None and version != self._seen_version:
+            self.clear()
+            self._seen_version = version
+
+    def _encode(self, product, shape, lang, fields) -> Tuple[bytes, Optional[bytes]]:
+        data = product_dict(product, shape, lang, fields)
+        if 'stock_quantity' not in data:
+            return current_app.json.dumps_bytes(data), None
+        data['stock_quantity'] = None
+        encoded = current_app.json.dumps_bytes(data)
+        split = encoded.index(_STOCK_MEMBER) + len(_STOCK_MEMBER)
+        return encoded[:split], encoded[split + len(_NULL):]
+
+    def fragment(self, product, shape: str = 'bilingual', lang: str = 'en',
+                 fields: Optional[Sequence[str]] = None) -> bytes:
+        """Returns the product's encoded JSON, from cache when possible."""
+        self._check_version()
+        return self._with_stock(product, self._fragment(product, shape, lang, fields))
+
+    @staticmethod
+    def _with_stock(product, split: Tuple[bytes, Optional[bytes]]) -> bytes:
+        head, tail = split
+        if tail is None:
+            return head
+        return head + _encode_stock(_value(product, 'stock_quantity')) + tail
+
+    def _fragment(self, product, shape, lang, fields) -> Tuple[bytes, Optional[bytes]]:
+        product_id = _value(product, 'product_id')
+        key = (product_id, shape, lang if shape == 'localized' else None, tuple(fields) if fields else None)
+        with self._lock:
+            cached = self._fragments.get(key)
+            if cached is not None:
+                self._fragments.move_to_end(key)
+                return cached
+        encoded = self._encode(product, shape, lang, fields)
+        with self._lock:
+            self._fragments[key] = encoded
+            self._keys_by_product.setdefault(product_id, set()).add(key)
+            while len(self._fragments) > self.max_entries:
+                old_key, _ = self._fragments.popitem(last=False)
+                keys = self._keys_by_product.get(old_key[0])
+                if keys is not None:
+                    keys.discard(old_key)
+                    if not keys:
+                        del self._keys_by_product[old_key[0]]
+        return encoded
+
+    def encode_list(self, products: Iterable, shape: str = 'bilingual', lang: str = 'en',
+                    fields: Optional[Sequence[str]] = None) -> bytes:
+        """Returns a JSON array of the products, joined from their cached fragments."""
+        self._check_version()
+        return b"[" + b",".join(self._with_stock(p, self._fragment(p, shape, lang, fields))
+                                for p in products) + b"]"
+
+    def stock_template(self, products: Iterable, shape: str = 'bilingual', lang: str = 'en',
+                       fields: Optional[Sequence[str]] = None) -> StockTemplate:
+        """
+        Returns the products' JSON array with the stock left open, for callers
+        that keep the array longer than the products' current stock is known.
+        """
+        self._check_version()
+        product_ids, parts, pending = [], [], b"["
+        for product in products:
+            head, tail = self._fragment(product, shape, lang, fields)
+            if tail is None:
+                pending += head + b","
+                continue
+            product_ids.append(_value(product, 'product_id'))
+            parts.append(pending + head)
+            pending = tail + b","
+        parts.append(pending.rstrip(b",") + b"]")
+        return StockTemplate(product_ids, parts)
+
+    def apply_changes(self, changes, version=None) -> None:
+        with self._lock:
+            for _, product_id, _ in changes:
+                for key in self._keys_by_product.pop(product_id, ()):
+                    self._fragments.pop(key, None)
+            if version is not None and self._seen_version is not None and version == self._seen_version + 1:
+                self._seen_version = version
+
+    def clear(self, *args) -> None:
+        with self._lock:
+            self._fragments.clear()
+            self._keys_by_product.clear()
+
+
+def json_object(**members) -> bytes:
+    """
+    Encodes a JSON object whose values may be pre-encoded bytes (e.g. from encode_list).
+
+    Keys are emitted in sorted order, matching the app's JSON provider.
+    """
+    encode = current_app.json.dumps_bytes
+    parts = []
+    for name in sorted(members):
+        value = members[name]
+        parts.append(encode(name) + b":" + (value if isinstance(value, bytes) else encode(value)))
+    return b"{" + b",".join(parts) + b"}"
+
+
+product_fragments = ProductFragmentCache(catalog_version, max_entries=Config.PRODUCT_FRAGMENT_CACHE_SIZE)
+catalog_events.subscribe(product_fragments.apply_changes, product_fragments.clear)
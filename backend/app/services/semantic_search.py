@@ -0,0 +1,299 @@
+# In app/services/semantic_search.py
+"""
+CPU-only semantic product search across English and Arabic.
+
+Products and queries are embedded as hashed, signed feature vectors built
+from word tokens, character n-grams, a transliterated phonetic key (so
+loanwords meet across scripts) and concepts from a small bilingual grocery
+lexicon (so "حليب" finds a product described only as "milk", and
+"breakfast" finds cereal, eggs and bread). Vectors live in one SciPy
+sparse matrix; a query is a product of the matrix columns it touches with
+its weights, plus a partial sort.
+"""
+import logging
+import math
+import threading
+import zlib
+from collections import namedtuple
+from typing import Dict, Iterable, List
+
+import numpy as np
+from scipy import sparse
+
+from app.services import catalog_events
+from app.services.catalog_cache import CatalogVersionTracker, catalog_version
+from app.services.fuzzy_match import phonetic_key
+from app.services.text_normalization import normalize_name, normalize_tokens
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Concept -> words in either language that evoke it. Words are normalized on load.
+GROCERY_LEXICON = {
+    "milk": ["milk", "dairy milk", "حليب", "لبن"],
+    "dairy": ["milk", "cheese", "yogurt", "yoghurt", "laban", "butter", "cream", "labneh",
+              "حليب", "جبن", "جبنة", "زبادي", "لبن", "زبدة", "قشطة", "لبنة", "ألبان"],
+    "lowfat": ["low fat", "skimmed", "skim", "fat free", "light", "بدون دسم", "قليل الدسم", "خالي الدسم", "لايت"],
+    "fullfat": ["full cream", "full fat", "whole", "كامل الدسم"],
+    "breakfast": ["breakfast", "cereal", "oats", "egg", "bread", "milk", "honey", "jam", "labneh", "coffee",
+                  "فطور", "افطار", "حبوب", "شوفان", "بيض", "خبز", "حليب", "عسل", "مربى", "لبنة", "قهوة"],
+    "fruit": ["fruit", "apple", "banana", "orange", "grape", "mango", "dates",
+              "فاكهة", "فواكه", "تفاح", "موز", "برتقال", "عنب", "مانجو", "تمر"],
+    "vegetable": ["vegetable", "carrot", "tomato", "potato", "onion", "cucumber", "lettuce",
+                  "خضار", "خضروات", "جزر", "طماطم", "بطاطس", "بصل", "خيار", "خس"],
+    "apple": ["apple", "تفاح"], "banana": ["banana", "موز"], "orange": ["orange", "برتقال"],
+    "carrot": ["carrot", "جزر"], "tomato": ["tomato", "طماطم", "بندورة"], "potato": ["potato", "بطاطس", "بطاطا"],
+    "onion": ["onion", "بصل"], "bread": ["bread", "loaf", "خبز", "عيش"], "egg": ["egg", "بيض"],
+    "cheese": ["cheese", "جبن", "جبنة"], "yogurt": ["yogurt", "yoghurt", "زبادي"], "rice": ["rice", "أرز", "رز"],
+    "chicken": ["chicken", "poultry", "دجاج", "فراخ"], "meat": ["meat", "beef", "lamb", "لحم", "لحوم"],
+    "fish": ["fish", "seafood", "سمك", "أسماك"], "honey": ["honey", "عسل"], "dates": ["dates", "تمر"],
+    "water": ["water", "ماء", "مياه"], "juice": ["juice", "عصير"], "coffee": ["coffee", "قهوة"], "tea": ["tea", "شاي"],
+    "fresh": ["fresh", "طازج", "طازجة"], "organic": ["organic", "عضوي"], "frozen": ["frozen", "مجمد"],
+    "red": ["red", "أحمر", "حمراء"], "green": ["green", "أخضر", "خضراء"], "sweet": ["sweet", "حلو"],
+}
+
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+# Lexicon concepts carry the cross-lingual signal, so they outweigh surface n-grams
+CONCEPT_WEIGHT = 3.0
+# Results scoring below this fraction of the best one share only incidental features with the query
+RELATIVE_SCORE_CUTOFF = 0.4
+# Changed products are scored one by one until this many (or 5% of the index) trigger a recompile
+PENDING_ROWS_BEFORE_COMPILE = 256
+
+# A row of the index: sorted bucket numbers and their values
+SparseVector = namedtuple('SparseVector', ['indices', 'values'])
+
+
+def _build_lexicon(lexicon: Dict[str, List[str]]) -> Dict[str, set]:
+    concepts_by_phrase: Dict[str, set] = {}
+    for concept, phrases in lexicon.items():
+        for phrase in phrases:
+            key = normalize_name(phrase)
+            if key:
+                concepts_by_phrase.setdefault(key, set()).add(concept)
+    return concepts_by_phrase
+
+
+_CONCEPTS_BY_PHRASE = _build_lexicon(GROCERY_LEXICON)
+
+
+def extract_features(text: str, weight: float = 1.0) -> Dict[str, float]:
+    """
+    Returns weighted sparse features for a piece of text in either language.
+    """
+    features: Dict[str, float] = {}
+    tokens = normalize_tokens(text)
+
+    def add(feature: str, value: float) -> None:
+        features[feature] = features.get(feature, 0.0) + value * weight
+
+    for token in tokens:
+        add(f"w:{token}", 1.0)
+        padded = f"<{token}>"
+        for n in (3, 4):
+            for i in range(len(padded) - n + 1):
+                add(f"c:{padded[i:i + n]}", 0.25)
+        key = phonetic_key(token)
+        if len(key) >= 2:
+            add(f"p:{key}", 0.5)
+    # Lexicon concepts for single words and two-word phrases
+    phrases = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for phrase in phrases:
+        for concept in _CONCEPTS_BY_PHRASE.get(phrase, ()):
+            add(f"x:{concept}", CONCEPT_WEIGHT)
+    return features
+
+
+class SemanticProductIndex:
+    """
+    Hashed feature embeddings of active products with batched cosine top-k.
+
+    Rows are L2-normalized sublinear term frequencies over a hashed space
+    wide enough that unrelated products rarely share a bucket; only their
+    non-zero entries are kept, compiled into a SciPy CSC matrix so a query
+    reads just the columns of its own features. Inverse document
+    frequencies are kept per dimension and applied to the query, so adding
+    or removing a product never requires re-weighting other rows. Products
+    changed since the last compilation are scored from their own rows until
+    enough accumulate to recompile; the index is rebuilt when the shared
+    catalog version shows writes it has not seen.
+    """
+
+    def __init__(self, version_tracker: CatalogVersionTracker, dimensions: int = 1 << 16):
+        self.version_tracker = version_tracker
+        self.dimensions = dimensions
+        self._lock = threading.RLock()
+        self._built = False
+        self._built_version = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._rows: Dict[int, SparseVector] = {}
+        self._compiled = sparse.csc_matrix((0, self.dimensions), dtype=np.float32)
+        self._compiled_products = np.zeros(0, dtype=np.int64)
+        self._compiled_live = np.zeros(0, dtype=bool)
+        self._compiled_position: Dict[int, int] = {}
+        self._pending: set = set()
+        self._document_frequency = np.zeros(self.dimensions, dtype=np.float32)
+
+    # --- Embedding ---
+
+    def _embed(self, features: Dict[str, float]) -> SparseVector:
+        buckets: Dict[int, float] = {}
+        for feature, value in features.items():
+            hashed = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if hashed & 0x80000000 else -1.0
+            bucket = hashed % self.dimensions
+            buckets[bucket] = buckets.get(bucket, 0.0) + \
+                (sign * (1.0 + math.log(value)) if value >= 1.0 else sign * value)
+        indices = sorted(bucket for bucket, value in buckets.items() if value)
+        return SparseVector(np.array(indices, dtype=np.int32),
+                            np.array([buckets[bucket] for bucket in indices], dtype=np.float32))
+
+    def embed_product(self, row: Dict) -> SparseVector:
+        features: Dict[str, float] = {}
+        for field, weight in (("name_en", NAME_WEIGHT), ("name_ar", NAME_WEIGHT),
+                              ("description_en", DESCRIPTION_WEIGHT), ("description_ar", DESCRIPTION_WEIGHT),
+                              ("brand", DESCRIPTION_WEIGHT)):
+            for feature, value in extract_features(row.get(field) or "", weight).items():
+                features[feature] = features.get(feature, 0.0) + value
+        vector = self._embed(features)
+        norm = np.linalg.norm(vector.values)
+        return SparseVector(vector.indices, vector.values / norm) if norm else vector
+
+    # --- Building and maintenance ---
+
+    def _load_rows(self) -> List[Dict]:
+        from app import db
+        from app.models.product import Product
+
+        columns = (Product.product_id, Product.name_en, Product.name_ar,
+                   Product.description_en, Product.description_ar, Product.brand)
+        rows = db.session.query(*columns).filter(Product.is_active == True).yield_per(5000)
+        return [dict(row._mapping) for row in rows]
+
+    def build(self, rows: Iterable[Dict]) -> None:
+        """Replaces the index contents with the given product rows."""
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._upsert(row)
+            self._compile()
+            self._built = True
+        logger.info(f"Semantic product index built with {len(self._rows)} products.")
+
+    def _compile(self) -> None:
+        """Packs every current row into the CSC matrix and clears the pending changes."""
+        products = sorted(self._rows)
+        vectors = [self._rows[product_id] for product_id in products]
+        lengths = np.array([len(vector.indices) for vector in vectors], dtype=np.int64)
+        indptr = np.concatenate(([0], np.cumsum(lengths)))
+        indices = np.concatenate([vector.indices for vector in vectors]) if vectors else np.zeros(0, dtype=np.int32)
+        values = np.concatenate([vector.values for vector in vectors]) if vectors else np.zeros(0, dtype=np.float32)
+        self._compiled = sparse.csr_matrix((values, indices, indptr),
+                                           shape=(len(products), self.dimensions)).tocsc()
+        self._compiled_products = np.array(products, dtype=np.int64)
+        self._compiled_live = np.ones(len(products), dtype=bool)
+        self._compiled_position = {product_id: position for position, product_id in enumerate(products)}
+        self._pending.clear()
+
+    def _is_current(self, version) -> bool:
+        return self._built and (version is None or version == self._built_version)
+
+    def ensure_fresh(self) -> None:
+        version = self.version_tracker.current_version()
+        if self._is_current(version):
+            return
+        with self._lock:
+            if self._is_current(version):
+                return
+            self.build(self._load_rows())
+            self._built_version = version
+
+    def invalidate(self, *args) -> None:
+        with self._lock:
+            self._built = False
+
+    def apply_changes(self, changes, version=None) -> None:
+        """Applies committed product changes (see catalog_events)."""
+        with self._lock:
+            if not self._built:
+                return
+            for kind, product_id, data in changes:
+                if kind == 'upsert' and data.get("is_active", True):
+                    self._upsert(data)
+                else:
+                    self._remove(product_id)
+            if len(self._pending) > max(PENDING_ROWS_BEFORE_COMPILE, len(self._rows) // 20):
+                self._compile()
+            if version is not None and self._built_version is not None and version == self._built_version + 1:
+                self._built_version = version
+
+    def _upsert(self, row: Dict) -> None:
+        self._remove(row["product_id"])
+        vector = self.embed_product(row)
+        self._rows[row["product_id"]] = vector
+        self._document_frequency[vector.indices] += 1
+        self._pending.add(row["product_id"])
+
+    def _remove(self, product_id: int) -> None:
+        vector = self._rows.pop(product_id, None)
+        if vector is None:
+            return
+        self._document_frequency[vector.indices] -= 1
+        self._pending.discard(product_id)
+        position = self._compiled_position.get(product_id)
+        if position is not None:
+            self._compiled_live[position] = False
+
+    # --- Search ---
+
+    def search(self, query: str, k: int = 10, min_score: float = 0.1,
+               min_relative_score: float = RELATIVE_SCORE_CUTOFF) -> List[Dict]:
+        """
+        Returns the `k` active products closest in meaning to the query.
+
+        Args:
+            query (str): Free text in English or Arabic.
+            k (int): Maximum number of results.
+            min_score (float): Cosine similarity below which results are dropped.
+            min_relative_score (float): Fraction of the best result's score below which
+                results are dropped, so weak partial matches do not pad the list.
+
+        Returns:
+            list: Dicts with 'product_id' and 'score', best first.
+        """
+        self.ensure_fresh()
+        query_vector = self._embed(extract_features(query))
+        with self._lock:
+            if not self._rows or not len(query_vector.indices):
+                return []
+            documents = len(self._rows)
+            idf = np.log((1.0 + documents) / (1.0 + self._document_frequency[query_vector.indices])) + 1.0
+            weights = query_vector.values * idf
+            weights /= np.linalg.norm(weights)
+
+            scores = self._compiled[:, query_vector.indices] @ weights
+            scores[~self._compiled_live] = -np.inf
+            products = self._compiled_products
+            if self._pending:
+                dense_query = np.zeros(self.dimensions, dtype=np.float32)
+                dense_query[query_vector.indices] = weights
+                pending = sorted(self._pending)
+                scores = np.concatenate((scores, [float(dense_query[self._rows[product_id].indices]
+                                                        @ self._rows[product_id].values)
+                                                  for product_id in pending]))
+                products = np.concatenate((products, np.array(pending, dtype=np.int64)))
+            if not len(scores):
+                return []
+            top_k = min(k, len(scores))
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+            ranked = sorted(candidates, key=lambda row: (-scores[row], products[row]))
+            cutoff = max(min_score, float(scores[ranked[0]]) * min_relative_score)
+            return [{"product_id": int(products[row]), "score": round(float(scores[row]), 4)}
+                    for row in ranked if scores[row] >= cutoff]
+
+
+semantic_index = SemanticProductIndex(catalog_version, dimensions=Config.SEMANTIC_SEARCH_DIMENSIONS)
+catalog_events.subscribe(semantic_index.apply_changes, semantic_index.invalidate)
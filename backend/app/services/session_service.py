@@ -0,0 +1,131 @@
+# In app/services/session_service.py
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class InMemorySessionBackend:
+    """
+    A bounded, TTL'd key/value store living in the Flask worker's memory.
+
+    Entries are evicted in least-recently-used order once `max_entries` is
+    reached, and lazily expired `ttl_seconds` after their last write.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(value)
+
+    def set(self, key: str, value: Dict) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisSessionBackend:
+    """
+    A shared session backend for multi-worker deployments.
+
+    Values are stored as JSON strings; expiry is delegated to Redis so that
+    every worker sees the same TTL.
+    """
+
+    def __init__(self, url: str, ttl_seconds: int = 600, prefix: str = "vocery:session:"):
+        import redis  # Only required when the shared backend is configured
+
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Dict]:
+        raw = self._client.get(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, value: Dict) -> None:
+        self._client.set(self.prefix + key, json.dumps(value), ex=self.ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self.prefix + key)
+
+
+class DialogueSessionStore:
+    """
+    Per-customer dialogue context used to resolve follow-up voice commands.
+
+    A context holds the last search results, the product IDs resolved in
+    the previous turn and the conversation language, e.g.::
+
+        {
+            "language": "en",
+            "last_search": {"query": "apple", "products": [{"product_id": 1, ...}]},
+            "last_products": [{"product_id": 1, "name_en": "Red Apple", "name_ar": "تفاح أحمر"}]
+        }
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_context(self, customer_id) -> Dict:
+        try:
+            return self.backend.get(str(customer_id)) or {}
+        except Exception as e:
+            # A broken shared backend must never break the voice pipeline.
+            logger.error(f"Failed to read dialogue context for customer {customer_id}: {e}")
+            return {}
+
+    def update_context(self, customer_id, **fields) -> Dict:
+        context = self.get_context(customer_id)
+        context.update(fields)
+        try:
+            self.backend.set(str(customer_id), context)
+        except Exception as e:
+            logger.error(f"Failed to store dialogue context for customer {customer_id}: {e}")
+        return context
+
+    def clear(self, customer_id) -> None:
+        try:
+            self.backend.delete(str(customer_id))
+        except Exception as e:
+            logger.error(f"Failed to clear dialogue context for customer {customer_id}: {e}")
+
+
+def create_session_store(config) -> DialogueSessionStore:
+    """
+    Builds the dialogue session store selected by `SESSION_BACKEND`.
+
+    Args:
+        config: An object exposing the SESSION_* settings (e.g. the Config class).
+
+    Returns:
+        DialogueSessionStore: A store backed by memory ('memory') or Redis ('redis').
+    """
+    ttl_seconds = config.SESSION_TTL_SECONDS
+    if config.SESSION_BACKEND == "redis":
+        logger.info("Using Redis dialogue session backend.")
+        return DialogueSessionStore(RedisSessionBackend(config.SESSION_REDIS_URL, ttl_seconds=ttl_seconds))
+    return DialogueSessionStore(InMemorySessionBackend(max_entries=config.SESSION_MAX_ENTRIES, ttl_seconds=ttl_seconds))
@@ -0,0 +1,91 @@
+# In app/services/single_flight.py
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one in-flight computation.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive with the same key while it is running wait for and share its
+    result or exception. Nothing is cached once the call completes.
+    Callers sharing a mutable result must copy it before mutating.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._executions = 0
+        self._coalesced = 0
+        self._follower_timeouts = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, wait_timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Runs `fn(*args, **kwargs)` once per key among concurrent callers.
+
+        Args:
+            key: Identifies identical calls.
+            fn: The computation to run.
+            wait_timeout (float, optional): How long a follower waits for the
+                leader before giving up with TimeoutError.
+
+        Returns:
+            The leader's result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self._executions += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._coalesced += 1
+                leader = False
+
+        if not leader:
+            if not call.done.wait(wait_timeout):
+                with self._lock:
+                    self._follower_timeouts += 1
+                raise TimeoutError(f"Timed out waiting for in-flight {self.name} call")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logger.info(f"Single-flight '{self.name}' shared one result with {call.waiters} waiting call(s).")
+            call.done.set()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._calls),
+                "follower_timeouts": self._follower_timeouts,
+            }
@@ -0,0 +1,213 @@
+# In app/services/stock_reservations.py
+"""
+Time-limited stock holds for cart lines.
+
+Adding to the cart moves units from `products.stock_quantity` (or the
+stock shards of a flash-sale product, see stock_shards) into a
+`stock_reservations` row for that cart and product, which expires after
+STOCK_RESERVATION_SECONDS. Checkout claims the holds of the lines it
+orders (`claim_holds`), so in the common case it never writes, or waits
+for, the product row; only lines whose hold lapsed or fell short touch
+stock at checkout. A background sweeper gives expired holds back in
+batches, skipping rows other transactions are working on.
+
+Every function runs inside the caller's transaction. Callers must hold
+the cart's row lock (the cart upsert or a SELECT ... FOR UPDATE of the
+shoppingcarts row), so two transactions never re-hold the same cart's
+lines at once. Stock moved by holds is not published as a catalog change:
+cached product JSON shows the stock of the last catalog write, and cart
+operations always check live stock.
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Set
+
+from sqlalchemy import bindparam, text
+
+from app import db
+from app.models.stock_reservation import StockReservation
+from app.services.periodic import start_periodic_task
+from app.services.stock_shards import adjust_sharded_stock
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_CLAIM_HOLDS = text("""
+    DELETE FROM stock_reservations WHERE cart_id = :cart_id AND product_id IN :product_ids
+    RETURNING product_id, quantity
+""").bindparams(bindparam('product_ids', expanding=True))
+
+# Takes `delta` units of each product (gives them back when negative); a
+# positive delta only applies to an active product with enough stock.
+# Sharded products keep their stock elsewhere (see stock_shards).
+_ADJUST_STOCK_POSTGRESQL = text("""
+    UPDATE products p SET stock_quantity = p.stock_quantity - d.delta
+    FROM unnest(CAST(:product_ids AS integer[]), CAST(:deltas AS integer[])) AS d (product_id, delta)
+    WHERE p.product_id = d.product_id AND NOT p.stock_sharded
+      AND (d.delta <= 0 OR (p.is_active AND p.stock_quantity >= d.delta))
+    RETURNING p.product_id
+""")
+_ADJUST_STOCK_SQLITE = text("""
+    UPDATE products SET stock_quantity = stock_quantity - d.delta
+    FROM (SELECT json_extract(value, '$[0]') AS product_id, json_extract(value, '$[1]') AS delta
+          FROM json_each(:deltas)) AS d
+    WHERE products.product_id = d.product_id AND NOT products.stock_sharded
+      AND (d.delta <= 0 OR (products.is_active AND products.stock_quantity >= d.delta))
+    RETURNING products.product_id
+""")
+# Product rows are locked in product_id order first, so concurrent
+# multi-product adjustments cannot deadlock
+_LOCK_PRODUCTS_POSTGRESQL = text("""
+    SELECT product_id FROM products WHERE product_id IN :product_ids AND NOT stock_sharded
+    ORDER BY product_id FOR UPDATE
+""").bindparams(bindparam('product_ids', expanding=True))
+
+_RELEASE_EXPIRED = """
+    DELETE FROM stock_reservations WHERE (cart_id, product_id) IN (
+        SELECT cart_id, product_id FROM stock_reservations WHERE expires_at < :now
+        ORDER BY expires_at LIMIT :batch_size{locking}
+    )
+    RETURNING product_id, quantity
+"""
+# Holds another transaction is converting or re-holding are left to it
+_RELEASE_EXPIRED_POSTGRESQL = text(_RELEASE_EXPIRED.format(locking=" FOR UPDATE SKIP LOCKED"))
+_RELEASE_EXPIRED_SQLITE = text(_RELEASE_EXPIRED.format(locking=""))
+
+
+def claim_holds(session, cart_id: int, product_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Removes the cart's holds on the given products and returns what they held.
+
+    The DELETE is the claim: a hold the sweeper released first is simply
+    not returned, so its units are never counted twice.
+
+    Returns:
+        dict: product_id -> units held, for products that had a hold.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    rows = session.execute(_CLAIM_HOLDS, {"cart_id": cart_id, "product_ids": product_ids}).fetchall()
+    return {row.product_id: row.quantity for row in rows}
+
+
+def adjust_stock(session, deltas: Dict[int, int]) -> Set[int]:
+    """
+    Takes (or, for negative deltas, gives back) units of several products in one statement.
+
+    Deltas of sharded products, which that statement skips, are then
+    applied to their stock shards (see stock_shards).
+
+    Args:
+        deltas (dict): product_id -> units to take from stock.
+
+    Returns:
+        set: The product ids whose delta was applied; the others are missing,
+            inactive or short on stock and were left untouched.
+    """
+    if not deltas:
+        return set()
+    dialect = session.bind.dialect.name
+    product_ids = sorted(deltas)
+    if dialect == 'postgresql':
+        if len(product_ids) > 1:
+            session.execute(_LOCK_PRODUCTS_POSTGRESQL, {"product_ids": product_ids})
+        rows = session.execute(_ADJUST_STOCK_POSTGRESQL, {
+            "product_ids": product_ids, "deltas": [deltas[product_id] for product_id in product_ids]}).fetchall()
+    else:
+        rows = session.execute(_ADJUST_STOCK_SQLITE, {
+            "deltas": json.dumps([[product_id, deltas[product_id]] for product_id in product_ids])}).fetchall()
+    applied = {row.product_id for row in rows}
+    # Left over: sharded, missing, inactive or short; only sharded products have shards to try
+    rest = {product_id: delta for product_id, delta in deltas.items() if product_id not in applied}
+    return applied | adjust_sharded_stock(session, rest) if rest else applied
+
+
+def hold_stock(session, cart_id: int, targets: Dict[int, int], now: datetime = None) -> Set[int]:
+    """
+    Makes the cart hold exactly `targets[product_id]` units of each product.
+
+    Only the difference from the current hold moves stock, and every hold
+    written gets a fresh expiry. A target of 0 releases the hold.
+
+    Args:
+        cart_id (int): The cart whose holds change; its row must be locked.
+        targets (dict): product_id -> units the cart should hold.
+
+    Returns:
+        set: Products now held at their target. The others (missing,
+            inactive or short on stock) keep their previous hold.
+    """
+    if not targets:
+        return set()
+    held = claim_holds(session, cart_id, targets)
+    deltas = {product_id: target - held.get(product_id, 0) for product_id, target in targets.items()}
+    applied = adjust_stock(session, {product_id: delta for product_id, delta in deltas.items() if delta})
+    applied |= {product_id for product_id, delta in deltas.items() if not delta}
+
+    expires_at = (now or datetime.utcnow()) + timedelta(seconds=Config.STOCK_RESERVATION_SECONDS)
+    holds = []
+    for product_id, target in targets.items():
+        quantity = target if product_id in applied else held.get(product_id, 0)
+        if quantity > 0:
+            holds.append({"cart_id": cart_id, "product_id": product_id, "quantity": quantity,
+                          "expires_at": expires_at})
+    if holds:
+        session.execute(StockReservation.__table__.insert(), holds)
+    return applied
+
+
+def release_expired(session, batch_size: int, now: datetime = None) -> int:
+    """
+    Gives back the stock of up to `batch_size` expired holds and commits.
+
+    Returns:
+        int: The number of holds released.
+    """
+    dialect = session.bind.dialect.name
+    statement = _RELEASE_EXPIRED_POSTGRESQL if dialect == 'postgresql' else _RELEASE_EXPIRED_SQLITE
+    try:
+        rows = session.execute(statement, {"now": now or datetime.utcnow(), "batch_size": batch_size}).fetchall()
+        released: Dict[int, int] = {}
+        for row in rows:
+            released[row.product_id] = released.get(row.product_id, 0) - row.quantity
+        adjust_stock(session, released)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return len(rows)
+
+
+def release_all_expired(session, batch_size: int) -> int:
+    """
+    Releases expired holds one batch per transaction until a batch comes back short.
+
+    Several workers may run this at once; SKIP LOCKED on PostgreSQL keeps
+    them (and checkouts claiming a hold) out of each other's way.
+
+    Returns:
+        int: The number of holds released.
+    """
+    total = 0
+    while True:
+        released = release_expired(session, batch_size)
+        total += released
+        if released < batch_size:
+            break
+    if total:
+        logger.info(f"Released {total} expired stock holds.")
+    return total
+
+
+def start_reservation_sweeper(app):
+    """
+    Starts this worker's sweeper of expired holds unless disabled (interval 0) or under test.
+
+    Returns:
+        PeriodicTask or None
+    """
+    batch_size = app.config.get('RESERVATION_SWEEP_BATCH_SIZE', 500)
+    return start_periodic_task(app, "reservation-sweeper", app.config.get('RESERVATION_SWEEP_INTERVAL_SECONDS', 0),
+                               lambda: release_all_expired(db.session, batch_size))
@@ -0,0 +1,259 @@
+# In app/services/stock_shards.py
+"""
+Sharded stock counters for flash-sale products.
+
+A product flagged `stock_sharded` keeps its stock in several
+`product_stock_shards` rows instead of `products.stock_quantity`. Each
+hold takes its units from one shard picked at random among those with
+enough stock, skipping (on PostgreSQL) shards other transactions have
+locked, so concurrent adds of the same hot product rarely wait for each
+other and never lock the product row. Only when no single shard can serve
+a request are all of the product's shards locked, in shard_no order, and
+drained together.
+
+`products.stock_quantity` of a sharded product is a copy refreshed by a
+periodic consolidator, which also rebalances shards that have drifted
+apart. Cart operations read live shard totals (`shard_totals`); catalog
+reads may lag by one consolidation interval. Catalog imports set the
+stock of a sharded product through `set_sharded_stock`, which rewrites
+the shards.
+
+Every function except `consolidate` runs inside the caller's transaction.
+"""
+import logging
+from typing import Dict, Iterable, Set
+
+from sqlalchemy import bindparam, text
+
+from app import db
+from app.models.product import Product
+from app.models.product_stock_shard import ProductStockShard
+from app.services.periodic import start_periodic_task
+
+logger = logging.getLogger(__name__)
+
+# Takes `delta` units (gives them back when negative) from one random shard
+# able to serve them; a positive delta only applies to an active product
+_TAKE_FROM_SHARD = """
+    UPDATE product_stock_shards SET quantity = quantity - :delta
+    WHERE product_id = :product_id AND quantity >= :delta AND shard_no = (
+        SELECT s.shard_no FROM product_stock_shards s JOIN products p ON p.product_id = s.product_id
+        WHERE s.product_id = :product_id AND s.quantity >= :delta AND (:delta <= 0 OR p.is_active)
+        ORDER BY random() LIMIT 1{locking}
+    )
+    RETURNING product_id
+"""
+# Shards being written by other transactions are passed over
+_TAKE_FROM_SHARD_POSTGRESQL = text(_TAKE_FROM_SHARD.format(locking=" FOR UPDATE OF s SKIP LOCKED"))
+_TAKE_FROM_SHARD_SQLITE = text(_TAKE_FROM_SHARD.format(locking=""))
+
+_LOCK_SHARDS = """
+    SELECT s.shard_no, s.quantity, p.is_active
+    FROM product_stock_shards s JOIN products p ON p.product_id = s.product_id
+    WHERE s.product_id = :product_id ORDER BY s.shard_no{locking}
+"""
+_LOCK_SHARDS_POSTGRESQL = text(_LOCK_SHARDS.format(locking=" FOR UPDATE OF s"))
+_LOCK_SHARDS_SQLITE = text(_LOCK_SHARDS.format(locking=""))
+
+_SET_SHARD = text("""
+    UPDATE product_stock_shards SET quantity = :quantity WHERE product_id = :product_id AND shard_no = :shard_no
+""")
+
+_SET_STOCK = text("UPDATE products SET stock_quantity = :quantity WHERE product_id = :product_id")
+
+_HELD_UNITS = text("SELECT COALESCE(SUM(quantity), 0) FROM stock_reservations WHERE product_id = :product_id")
+
+_SHARD_TOTALS = text("""
+    SELECT product_id, SUM(quantity) AS quantity FROM product_stock_shards
+    WHERE product_id IN :product_ids GROUP BY product_id
+""").bindparams(bindparam('product_ids', expanding=True))
+
+_REFRESH_STOCK = text("""
+    UPDATE products SET stock_quantity = (
+        SELECT COALESCE(SUM(s.quantity), 0) FROM product_stock_shards s WHERE s.product_id = products.product_id
+    )
+    WHERE stock_sharded
+""")
+
+# Products whose shards drifted apart: the emptiest shard holds less than
+# half its fair share, so takes start spilling over into spanning locks
+_SKEWED_PRODUCTS = text("""
+    SELECT product_id FROM product_stock_shards GROUP BY product_id
+    HAVING MAX(quantity) - MIN(quantity) > 1 AND MIN(quantity) * COUNT(*) * 2 < SUM(quantity)
+""")
+
+
+def _split(total: int, shard_count: int):
+    """Spreads `total` units over `shard_count` shards as evenly as possible."""
+    share, extra = divmod(total, shard_count)
+    return [share + 1 if shard_no < extra else share for shard_no in range(shard_count)]
+
+
+def _lock_shards(session, product_id: int):
+    """Loads a product's shards with its is_active flag, locking the shards in shard_no order."""
+    statement = _LOCK_SHARDS_POSTGRESQL if session.bind.dialect.name == 'postgresql' else _LOCK_SHARDS_SQLITE
+    return session.execute(statement, {"product_id": product_id}).fetchall()
+
+
+def _adjust_spanning(session, product_id: int, delta: int) -> bool:
+    """Applies a delta no single shard could take, across all of the product's shards."""
+    shards = _lock_shards(session, product_id)
+    if not shards:
+        return False
+    if delta < 0:
+        updates = [{"shard_no": shards[0].shard_no, "quantity": shards[0].quantity - delta}]
+    else:
+        if not shards[0].is_active or sum(shard.quantity for shard in shards) < delta:
+            return False
+        updates, remaining = [], delta
+        for shard in sorted(shards, key=lambda shard: shard.quantity, reverse=True):
+            if not remaining:
+                break
+            taken = min(shard.quantity, remaining)
+            remaining -= taken
+            updates.append({"shard_no": shard.shard_no, "quantity": shard.quantity - taken})
+    session.execute(_SET_SHARD, [dict(update, product_id=product_id) for update in updates])
+    return True
+
+
+def adjust_sharded_stock(session, deltas: Dict[int, int]) -> Set[int]:
+    """
+    Takes (or, for negative deltas, gives back) units of sharded products.
+
+    Products are handled in product_id order, like the product rows in
+    `stock_reservations.adjust_stock`, so concurrent adjustments cannot
+    deadlock.
+
+    Args:
+        deltas (dict): product_id -> units to take from stock.
+
+    Returns:
+        set: The product ids whose delta was applied; the others are not
+            sharded, inactive or short on stock and were left untouched.
+    """
+    statement = _TAKE_FROM_SHARD_POSTGRESQL if session.bind.dialect.name == 'postgresql' else _TAKE_FROM_SHARD_SQLITE
+    applied = set()
+    for product_id in sorted(deltas):
+        delta = deltas[product_id]
+        if session.execute(statement, {"product_id": product_id, "delta": delta}).first() is not None \
+                or _adjust_spanning(session, product_id, delta):
+            applied.add(product_id)
+    return applied
+
+
+def shard_totals(session, product_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Returns the live stock of the sharded products among `product_ids`.
+
+    Returns:
+        dict: product_id -> units over all its shards; products without shards are left out.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    rows = session.execute(_SHARD_TOTALS, {"product_ids": product_ids}).fetchall()
+    return {row.product_id: row.quantity for row in rows}
+
+
+def set_sharded_stock(session, on_hand: Dict[int, int]) -> Set[int]:
+    """
+    Replaces the stock of sharded products with an on-hand count (e.g. from a catalog import).
+
+    Units held by carts are subtracted, as for other products, once the
+    product's shards are locked, so no concurrent take is missed; the rest
+    is spread evenly over the shards and copied to `products.stock_quantity`.
+    Products are handled in product_id order. The caller commits.
+
+    Args:
+        on_hand (dict): product_id -> units on hand.
+
+    Returns:
+        set: The product ids whose shards were rewritten; products without shards are skipped.
+    """
+    updated = set()
+    for product_id in sorted(on_hand):
+        shards = _lock_shards(session, product_id)
+        if not shards:
+            continue
+        available = on_hand[product_id] - session.execute(_HELD_UNITS, {"product_id": product_id}).scalar()
+        session.execute(_SET_SHARD, [{"product_id": product_id, "shard_no": shard.shard_no, "quantity": quantity}
+                                     for shard, quantity in zip(shards, _split(available, len(shards)))])
+        session.execute(_SET_STOCK, {"product_id": product_id, "quantity": available})
+        updated.add(product_id)
+    return updated
+
+
+def enable_sharding(session, product_id: int, shard_count: int) -> bool:
+    """
+    Moves a product's stock into `shard_count` shards. The caller commits.
+
+    Returns:
+        bool: False if the product does not exist or is already sharded.
+    """
+    product = session.query(Product).filter_by(product_id=product_id).with_for_update().first()
+    if product is None or product.stock_sharded:
+        return False
+    session.execute(ProductStockShard.__table__.insert(), [
+        {"product_id": product_id, "shard_no": shard_no, "quantity": quantity}
+        for shard_no, quantity in enumerate(_split(product.stock_quantity, shard_count))])
+    product.stock_sharded = True
+    logger.info(f"Sharded the stock of product {product_id} ({product.stock_quantity} units) over {shard_count} rows.")
+    return True
+
+
+def disable_sharding(session, product_id: int) -> bool:
+    """
+    Folds a product's shards back into `products.stock_quantity`. The caller commits.
+
+    Returns:
+        bool: False if the product does not exist or is not sharded.
+    """
+    product = session.query(Product).filter_by(product_id=product_id).with_for_update().first()
+    if product is None or not product.stock_sharded:
+        return False
+    product.stock_quantity = sum(shard.quantity for shard in _lock_shards(session, product_id))
+    product.stock_sharded = False
+    session.execute(ProductStockShard.__table__.delete().where(ProductStockShard.product_id == product_id))
+    logger.info(f"Folded the stock shards of product {product_id} back into {product.stock_quantity} units.")
+    return True
+
+
+def consolidate(session) -> int:
+    """
+    Refreshes `stock_quantity` of every sharded product and rebalances skewed shards.
+
+    The refresh is one statement; each skewed product is then rebalanced
+    in its own short transaction, so takes of a hot product wait at most
+    for one product's rebalance.
+
+    Returns:
+        int: The number of products rebalanced.
+    """
+    try:
+        session.execute(_REFRESH_STOCK)
+        session.commit()
+        skewed = [row.product_id for row in session.execute(_SKEWED_PRODUCTS).fetchall()]
+        session.commit()
+        for product_id in skewed:
+            shards = _lock_shards(session, product_id)
+            quantities = _split(sum(shard.quantity for shard in shards), len(shards))
+            session.execute(_SET_SHARD, [{"product_id": product_id, "shard_no": shard.shard_no, "quantity": quantity}
+                                         for shard, quantity in zip(shards, quantities)])
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    if skewed:
+        logger.info(f"Rebalanced the stock shards of {len(skewed)} products.")
+    return len(skewed)
+
+
+def start_stock_consolidator(app):
+    """
+    Starts this worker's stock shard consolidator unless disabled (interval 0) or under test.
+
+    Returns:
+        PeriodicTask or None
+    """
+    return start_periodic_task(app, "stock-consolidator", app.config.get('STOCK_SHARD_CONSOLIDATE_SECONDS', 0),
+                               lambda: consolidate(db.session))
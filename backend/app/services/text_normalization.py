@@ -0,0 +1,75 @@
+# In app/services/text_normalization.py
+"""
+Normalization of spoken or typed product names in English and Arabic.
+
+Both the catalog names and the user's words go through the same
+functions, so spelling variants meet on a common form.
+"""
+import re
+from typing import List
+
+# Harakat (fathatan .. sukun), superscript alef and Quranic marks
+_ARABIC_DIACRITICS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]")
+_TATWEEL = "\u0640"
+_ARABIC_CHAR_MAP = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",  # alef/hamza variants
+    "ة": "ه",                                # taa marbuta
+    "ى": "ي",                                # alef maqsura
+    "ؤ": "و", "ئ": "ي",                      # hamza on carriers
+    "٠": "0", "١": "1", "٢": "2", "٣": "3", "٤": "4",
+    "٥": "5", "٦": "6", "٧": "7", "٨": "8", "٩": "9",
+})
+_TOKEN_SPLIT = re.compile(r"[^\w]+", re.UNICODE)
+
+ENGLISH_STOPWORDS = {"a", "an", "the", "some", "of", "please", "any", "my"}
+ARABIC_STOPWORDS = {"من", "في", "بعض", "لو", "سمحت"}
+
+
+def is_arabic(text: str) -> bool:
+    return any('\u0600' <= char <= '\u06FF' for char in text)
+
+
+def normalize_arabic_token(token: str) -> str:
+    token = _ARABIC_DIACRITICS.sub("", token).replace(_TATWEEL, "").translate(_ARABIC_CHAR_MAP)
+    # Drop the definite article so "التفاح" and "تفاح" meet
+    if token.startswith("ال") and len(token) > 3:
+        token = token[2:]
+    return token
+
+
+def normalize_english_token(token: str) -> str:
+    token = token.lower()
+    # Light plural folding: berries -> berry, tomatoes -> tomato, apples -> apple
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("oes", "xes", "ches", "shes", "sses")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """
+    Splits text into normalized tokens, dropping filler words.
+    """
+    # Diacritics are not word characters, so strip them before splitting
+    text = _ARABIC_DIACRITICS.sub("", text or "").replace(_TATWEEL, "")
+    tokens = []
+    for raw in _TOKEN_SPLIT.split(text):
+        if not raw or raw == "_":
+            continue
+        if is_arabic(raw):
+            token = normalize_arabic_token(raw)
+            if token and token not in ARABIC_STOPWORDS:
+                tokens.append(token)
+        else:
+            token = normalize_english_token(raw)
+            if token and token not in ENGLISH_STOPWORDS:
+                tokens.append(token)
+    return tokens
+
+
+def normalize_name(text: str) -> str:
+    """Returns the canonical form of a product name or spoken query."""
+    return " ".join(normalize_tokens(text))
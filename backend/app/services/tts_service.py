@@ -1,15 +1,45 @@
 # In app/services/tts_service.py
 import requests
 import logging
-from typing import Union
+import os
+import uuid
+from typing import Optional, Union
+
+from pydub import AudioSegment
+
+from app.services.single_flight import SingleFlight
 
 # The URL for the Coqui TTS server API endpoint
 COQUI_TTS_URL = "http://localhost:5002/api/tts"
 
+# Upper bound for a synthesis call when the caller gives no tighter deadline
+COQUI_TTS_TIMEOUT_SECONDS = 30.0
+
+# Where synthesized MP3s are written; served by /api/voice/audio/<filename>
+TTS_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'tts_output')
+os.makedirs(TTS_OUTPUT_DIR, exist_ok=True)
+
+# This dictionary maps a language code to the chosen speaker ID.
+# 'Ana Florence' is a high-quality English voice.
+# 'Suad Qasim' is the corresponding high-quality Arabic voice.
+SPEAKER_MAP = {
+    "en": "Ana Florence",
+    "ar": "Suad Qasim"
+}
+
 class CoquiTTSService:
-    """A service to interact with a locally running Coqui TTS server."""
+    """
+    A service to interact with a locally running Coqui TTS server.
+
+    Concurrent requests for the same text, language and speaker share a
+    single in-flight synthesis.
+    """
 
-    def synthesize(self, text: str, language: str = "en", speaker_idx: str = None) -> Union[bytes, None]:
+    def __init__(self):
+        self.single_flight = SingleFlight("tts")
+
+    def synthesize(self, text: str, language: str = "en", speaker_idx: str = None,
+                   timeout: Optional[float] = None) -> Union[bytes, None]:
         """
         Sends text to the Coqui TTS server and returns the synthesized audio.
 
@@ -17,11 +47,26 @@ class CoquiTTSService:
             text (str): The text to synthesize.
             language (str): The language code ('en', 'ar', etc.).
             speaker_idx (str, optional): The speaker ID to use for synthesis. Defaults to None.
+            timeout (float, optional): Seconds to wait for the server. Defaults to COQUI_TTS_TIMEOUT_SECONDS;
+                0 or less (an exhausted budget) skips the call.
 
         Returns:
             bytes: The raw WAV audio data.
             None: If there was an error.
         """
+        if timeout is None:
+            timeout = COQUI_TTS_TIMEOUT_SECONDS
+        elif timeout <= 0:
+            logging.warning("No budget left for a TTS request.")
+            return None
+        try:
+            return self.single_flight.do((text, language, speaker_idx), self._request_synthesis,
+                                         text, language, speaker_idx, timeout, wait_timeout=timeout)
+        except TimeoutError as e:
+            logging.error(f"Gave up waiting for an identical in-flight TTS request: {e}")
+            return None
+
+    def _request_synthesis(self, text: str, language: str, speaker_idx: Optional[str], timeout: float) -> Union[bytes, None]:
         # Base parameters required by the XTTS model
         # Note: Using 'language_id' and 'speaker_id' (not 'language_idx' and 'speaker_idx')
         params = {
@@ -38,7 +83,7 @@ class CoquiTTSService:
 
         try:
             logging.info(f"Sending request to Coqui TTS for language '{language}'")
-            response = requests.get(COQUI_TTS_URL, params=params)
+            response = requests.get(COQUI_TTS_URL, params=params, timeout=timeout)
             response.raise_for_status()
             logging.info("Coqui TTS successfully returned audio data.")
             return response.content
@@ -46,3 +91,34 @@ class CoquiTTSService:
             logging.error(f"Error connecting to Coqui TTS server: {e}")
             logging.error(f"Response Body: {e.response.text if e.response else 'No response'}")
             return None
+
+
+def save_as_mp3(audio_data: bytes, output_dir: str, filename: Optional[str] = None) -> Optional[str]:
+    """
+    Converts synthesized WAV audio to an MP3 file in `output_dir`.
+
+    Args:
+        audio_data (bytes): WAV audio as returned by `CoquiTTSService.synthesize`.
+        output_dir (str): Directory the MP3 is written to.
+        filename (str, optional): The MP3's name; a random one by default.
+
+    Returns:
+        str: The MP3 filename.
+        None: If the conversion failed.
+    """
+    filename = filename or f"{uuid.uuid4()}.mp3"
+    temp_wav_path = os.path.join(output_dir, f"{uuid.uuid4()}.wav")
+    with open(temp_wav_path, 'wb') as f: f.write(audio_data)
+    try:
+        sound = AudioSegment.from_wav(temp_wav_path)
+        # Written under a temporary name first, so the file never appears half-written
+        temp_mp3_path = os.path.join(output_dir, f"{uuid.uuid4()}.mp3.part")
+        sound.export(temp_mp3_path, format="mp3")
+        os.replace(temp_mp3_path, os.path.join(output_dir, filename))
+        logging.info(f"Successfully converted audio to MP3: {filename}")
+        return filename
+    except Exception as e:
+        logging.error(f"Failed to convert WAV to MP3: {e}")
+        return None
+    finally:
+        if os.path.exists(temp_wav_path): os.remove(temp_wav_path)
@@ -0,0 +1,68 @@
+# In app/services/upsert.py
+"""
+Dialect-aware INSERT ... ON CONFLICT DO UPDATE for PostgreSQL and SQLite.
+"""
+from typing import Callable, Dict, Iterable, List, Sequence
+
+from sqlalchemy import and_
+
+
+def _dialect_insert(dialect: str):
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def upsert(session, table, rows: List[Dict], key_columns: Sequence[str],
+           increment_columns: Iterable[str] = (), replace_columns: Iterable[str] = (),
+           replace_expressions: Dict[str, Callable] = None) -> None:
+    """
+    Inserts `rows` into `table`, merging into existing rows on key conflicts.
+
+    On conflict, `increment_columns` are added to the stored values,
+    `replace_columns` overwrite them, and `replace_expressions` overwrite
+    them with an expression built from the incoming value. Runs as a single executemany of
+    INSERT ... ON CONFLICT on PostgreSQL and SQLite, and row by row
+    elsewhere, inside the caller's transaction; nothing is committed.
+
+    Args:
+        session: The SQLAlchemy session to execute on.
+        table: The Table to write to (e.g. `Model.__table__`).
+        rows (list): Dicts of column values, all with the same keys.
+        key_columns (sequence): Columns of the primary key or unique constraint.
+        increment_columns (iterable): Columns summed on conflict.
+        replace_columns (iterable): Columns overwritten on conflict.
+        replace_expressions (dict, optional): Column -> function of the incoming value
+            returning the SQL expression to store on conflict; it may refer to the stored row.
+    """
+    if not rows:
+        return
+    increment_columns, replace_columns = list(increment_columns), list(replace_columns)
+    replace_expressions = replace_expressions or {}
+    insert = _dialect_insert(session.bind.dialect.name)
+    if insert is not None:
+        # One compiled statement run with executemany: the drivers batch the
+        # rows, and the compilation is cached instead of growing with len(rows)
+        statement = insert(table)
+        updates = {column: table.c[column] + statement.excluded[column] for column in increment_columns}
+        updates.update({column: statement.excluded[column] for column in replace_columns})
+        updates.update({column: build(statement.excluded[column]) for column, build in replace_expressions.items()})
+        if updates:
+            statement = statement.on_conflict_do_update(index_elements=list(key_columns), set_=updates)
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=list(key_columns))
+        session.execute(statement, rows)
+        return
+
+    for row in rows:
+        where = and_(*(table.c[column] == row[column] for column in key_columns))
+        updates = {column: table.c[column] + row[column] for column in increment_columns}
+        updates.update({column: row[column] for column in replace_columns})
+        updates.update({column: build(row[column]) for column, build in replace_expressions.items()})
+        updated = session.execute(table.update().where(where).values(updates)).rowcount if updates else 0
+        if not updated and not session.execute(table.select().where(where)).first():
+            session.execute(table.insert().values(row))
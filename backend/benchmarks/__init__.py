@@ -0,0 +1,3 @@
+"""
+Stand-alone performance benchmarks for the backend (run with `python -m benchmarks.<name>`).
+"""
@@ -0,0 +1,133 @@
+"""
+Benchmark: concurrent add-to-cart + checkout of one hot product, with and without sharded stock.
+
+Every thread is a customer buying one unit of the same product at a time
+(add it to the cart, then check out), as in a flash sale. The run is made
+once against a product whose stock is one row and once against a product
+whose stock is sharded (see app/services/stock_shards.py), and reports
+checkouts per second. Afterwards it checks that no unit was lost or
+created: remaining stock plus units ordered must equal the starting stock.
+
+SQLite serializes all writers, so only PostgreSQL shows the effect of
+sharding; on SQLite the benchmark is a correctness check.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_hot_sku_checkout                     # SQLite scratch file
+    python -m benchmarks.bench_hot_sku_checkout --database-url postgresql://user:pw@localhost/vocery_bench
+    python -m benchmarks.bench_hot_sku_checkout --threads 32 --checkouts 200 --shards 16
+
+Never point --database-url at a database holding real data: products,
+customers and orders are inserted into it.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from flask_migrate import upgrade
+from sqlalchemy import func
+
+from app import create_app, db
+from app.models.category import Category
+from app.models.customer import Customer
+from app.models.order_item import OrderItem
+from app.models.product import Product
+from app.services.cart_service import add_item
+from app.services.checkout_service import process_checkout
+from app.services.stock_shards import enable_sharding, shard_totals
+from config import Config
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def _buyer(app, customer_id, product_id, checkouts, start, results):
+    with app.app_context():
+        start.wait()
+        done = failed = 0
+        for _ in range(checkouts):
+            if add_item(customer_id, product_id, 1)["success"] and process_checkout(customer_id)["success"]:
+                done += 1
+            else:
+                failed += 1
+        db.session.remove()
+        results.append((done, failed))
+
+
+def _run(app, customer_ids, product_id, checkouts):
+    """Runs one buyer thread per customer; returns (checkouts, failures, seconds)."""
+    start = threading.Barrier(len(customer_ids) + 1)
+    results = []
+    threads = [threading.Thread(target=_buyer, args=(app, customer_id, product_id, checkouts, start, results))
+               for customer_id in customer_ids]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return sum(done for done, _ in results), sum(failed for _, failed in results), elapsed
+
+
+def _stock_is_conserved(product, initial_stock):
+    units_ordered = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0)) \
+        .filter(OrderItem.product_id == product.product_id).scalar()
+    db.session.refresh(product)
+    remaining = shard_totals(db.session, [product.product_id]).get(product.product_id, 0) \
+        if product.stock_sharded else product.stock_quantity
+    return remaining + units_ordered == initial_stock, remaining, units_ordered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help="Scratch database URL (defaults to a temporary SQLite file)")
+    parser.add_argument('--threads', type=int, default=16, help="Concurrent buyers.")
+    parser.add_argument('--checkouts', type=int, default=100, help="Checkouts per buyer.")
+    parser.add_argument('--shards', type=int, default=16, help="Stock rows of the sharded product.")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench_hot_sku.db"
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        # One connection per buyer; SQLite writers wait for each other instead of failing
+        SQLALCHEMY_ENGINE_OPTIONS = ({"connect_args": {"timeout": 60}} if database_url.startswith('sqlite')
+                                     else {"pool_size": args.threads + 2, "max_overflow": 0})
+        RESERVATION_SWEEP_INTERVAL_SECONDS = 0
+        STOCK_SHARD_CONSOLIDATE_SECONDS = 0
+
+    app = create_app(BenchConfig)
+    # Enough stock that no checkout fails for lack of it
+    initial_stock = args.threads * args.checkouts + 1000
+    with app.app_context():
+        upgrade(directory=MIGRATIONS_DIR)
+        category = Category(name_en="Benchmark", name_ar="اختبار")
+        db.session.add(category)
+        db.session.flush()
+        products = {}
+        for mode in ("single row", "sharded"):
+            products[mode] = Product(name_en=f"Flash Sale Item ({mode})", name_ar="منتج العرض", price=9.99,
+                                     stock_quantity=initial_stock, category_id=category.category_id, is_active=True)
+            db.session.add(products[mode])
+        customers = [Customer(name=f"Buyer {n}", email=f"buyer{n}@bench.invalid", password_hash="-")
+                     for n in range(args.threads)]
+        db.session.add_all(customers)
+        db.session.commit()
+        enable_sharding(db.session, products["sharded"].product_id, args.shards)
+        db.session.commit()
+        customer_ids = [customer.customer_id for customer in customers]
+        product_ids = {mode: product.product_id for mode, product in products.items()}
+
+    print(f"{args.threads} buyers x {args.checkouts} checkouts of one product ({database_url.split(':')[0]})")
+    print(f"{'stock':>12} {'checkouts':>10} {'failed':>8} {'seconds':>9} {'checkouts/s':>12} {'conserved':>10}")
+    for mode, product_id in product_ids.items():
+        done, failed, elapsed = _run(app, customer_ids, product_id, args.checkouts)
+        with app.app_context():
+            conserved, remaining, ordered = _stock_is_conserved(db.session.get(Product, product_id), initial_stock)
+        print(f"{mode:>12} {done:>10} {failed:>8} {elapsed:>9.2f} {done / elapsed:>12.1f} "
+              f"{'yes' if conserved else f'NO ({remaining} left + {ordered} ordered)':>10}")
+
+
+if __name__ == '__main__':
+    main()
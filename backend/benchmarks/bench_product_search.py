@@ -0,0 +1,121 @@
+"""
+Benchmark: legacy ilike product search vs. the indexed search path.
+
+Builds a synthetic bilingual catalog in a scratch database, applies the
+real migrations, and times both query paths at growing catalog sizes.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_product_search                       # SQLite scratch file
+    python -m benchmarks.bench_product_search --database-url postgresql://user:pw@localhost/vocery_bench
+    python -m benchmarks.bench_product_search --sizes 10000 100000 1000000
+
+Never point --database-url at a database holding real data: products are
+bulk-inserted into it.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from flask_migrate import upgrade
+from sqlalchemy import or_
+
+from app import create_app, db
+from app.models.category import Category
+from app.models.product import Product
+from app.services.product_search import search_products_ranked
+from config import Config
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+ADJECTIVES = [("Fresh", "طازج"), ("Organic", "عضوي"), ("Red", "أحمر"), ("Green", "أخضر"), ("Low Fat", "قليل الدسم"),
+              ("Sweet", "حلو"), ("Frozen", "مجمد"), ("Whole", "كامل"), ("Spicy", "حار"), ("Local", "محلي")]
+NOUNS = [("Apple", "تفاح"), ("Banana", "موز"), ("Milk", "حليب"), ("Bread", "خبز"), ("Cheese", "جبن"),
+         ("Chicken", "دجاج"), ("Rice", "أرز"), ("Tomato", "طماطم"), ("Yogurt", "زبادي"), ("Honey", "عسل"),
+         ("Dates", "تمر"), ("Carrot", "جزر"), ("Onion", "بصل"), ("Orange", "برتقال"), ("Coffee", "قهوة")]
+QUERIES = [("apple", "en"), ("organic milk", "en"), ("chicken", "en"), ("تفاح", "ar"), ("حليب", "ar"), ("zzz", "en")]
+
+
+def _legacy_search(query, lang):
+    """The unindexed query /api/products/search used before the search indexes."""
+    if lang == 'ar':
+        search_filter = or_(Product.name_ar.ilike(f"%{query}%"), Product.description_ar.ilike(f"%{query}%"))
+    else:
+        search_filter = or_(Product.name_en.ilike(f"%{query}%"), Product.description_en.ilike(f"%{query}%"))
+    return Product.query.filter(Product.is_active == True, search_filter).all()
+
+
+def _product_rows(start, count, category_id, rng):
+    for product_id in range(start, start + count):
+        adjective_en, adjective_ar = rng.choice(ADJECTIVES)
+        noun_en, noun_ar = rng.choice(NOUNS)
+        yield {
+            "product_id": product_id,
+            "name_en": f"{adjective_en} {noun_en} {product_id}",
+            "name_ar": f"{noun_ar} {adjective_ar} {product_id}",
+            "description_en": f"{adjective_en} {noun_en.lower()} from our partner farms.",
+            "description_ar": f"{noun_ar} {adjective_ar} من مزارعنا.",
+            "price": round(rng.uniform(1, 100), 2),
+            "category_id": category_id,
+            "stock_quantity": rng.randint(0, 500),
+            "is_active": True,
+        }
+
+
+def _insert_products(start, count, category_id, rng, batch_size=5000):
+    batch = []
+    for row in _product_rows(start, count, category_id, rng):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(Product.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Product.__table__.insert(), batch)
+    db.session.commit()
+
+
+def _time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[max(0, int(len(samples) * 0.95) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help="Scratch database URL (defaults to a temporary SQLite file)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench_search.db"
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+
+    app = create_app(BenchConfig)
+    rng = random.Random(42)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS_DIR)
+        category = Category(name_en="Benchmark", name_ar="اختبار")
+        db.session.add(category)
+        db.session.commit()
+
+        inserted = 0
+        print(f"{'products':>10} {'query':>14} {'legacy p50/p95 ms':>20} {'indexed p50/p95 ms':>20}")
+        for size in sorted(args.sizes):
+            _insert_products(inserted + 1, size - inserted, category.category_id, rng)
+            inserted = size
+            for query, lang in QUERIES:
+                legacy = _time_ms(lambda: _legacy_search(query, lang), args.repeat)
+                indexed = _time_ms(lambda: search_products_ranked(query, lang=lang, limit=50), args.repeat)
+                print(f"{size:>10} {query:>14} {legacy[0]:>9.1f}/{legacy[1]:<10.1f} {indexed[0]:>9.1f}/{indexed[1]:<10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""
+Check: no hot query falls back to a full scan of a large table.
+
+Seeds a scratch database with a large synthetic catalog, customer base and
+order history, applies the real migrations, then drives the cart, order,
+product and voice routes (and the background workers) through the test
+client. Every statement they issue is captured, run through EXPLAIN, and
+reported if its plan reads all of a large table (a `Seq Scan` on
+PostgreSQL, a `SCAN` on SQLite). Exits with status 1 if any does, so it
+can gate migrations and query changes in CI.
+
+Each route is exercised twice and only the second pass is checked: the
+first warms the in-memory caches (product index, category tree, popularity
+scores), whose one-off builds read whole tables by design. The unpaged
+catalog (GET /api/products without parameters) returns every product and
+is not checked.
+
+Usage (from the backend directory):
+    python -m benchmarks.check_query_plans                          # SQLite scratch file
+    python -m benchmarks.check_query_plans --database-url postgresql://user:pw@localhost/vocery_bench
+    python -m benchmarks.check_query_plans --products 500000 --customers 50000 -v
+
+Never point --database-url at a database holding real data: products,
+customers and orders are inserted into it. Plans depend on table sizes,
+so check with at least the default volumes; on small tables a full scan
+is often the planner's correct choice.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from flask_migrate import upgrade
+from sqlalchemy import event, text
+
+from app import create_app, db
+from app.models.category import Category
+from app.models.customer import Customer
+from app.models.cart_item import CartItem
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.outbox_event import OutboxEvent
+from app.models.product import Product
+from app.models.shopping_cart import ShoppingCart
+from app.models.stock_reservation import StockReservation
+from app.services.outbox import drain
+from app.services.stock_reservations import release_all_expired
+from app.services.stock_shards import consolidate, enable_sharding
+from config import Config
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# Tables that grow with the catalog, the customers or the orders. Small
+# tables may be scanned: categories, category_closure, catalog_version and
+# product_stock_shards, which holds only the few flash-sale products
+LARGE_TABLES = {'products', 'customers', 'shoppingcarts', 'cartitems', 'orders', 'orderitems',
+                'stock_reservations', 'product_stats', 'customer_product_stats', 'customer_order_stats',
+                'outbox_events'}
+
+NOUNS = [("Milk", "حليب"), ("Bread", "خبز"), ("Apple", "تفاح"), ("Cheese", "جبن"), ("Rice", "أرز"),
+         ("Chicken", "دجاج"), ("Yogurt", "زبادي"), ("Dates", "تمر"), ("Coffee", "قهوة"), ("Tomato", "طماطم")]
+BRANDS = ["Almarai", "Al Rawabi", "Nadec", "Lacnor", "Baladna", None]
+
+_EXPLAINED_STATEMENT = re.compile(r"^\s*(SELECT|WITH|UPDATE|DELETE|INSERT)\b", re.IGNORECASE)
+# FROM/JOIN/UPDATE/INTO <table> [AS] <alias>: SQLite plans name tables by alias
+_TABLE_REFERENCE = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(?!(?:ON|WHERE|SET|JOIN|LEFT|INNER|OUTER|CROSS|ORDER|GROUP|"
+    r"LIMIT|USING|VALUES|SELECT|DEFAULT|RETURNING)\b)(\w+))?", re.IGNORECASE)
+_SQLITE_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: USING (?:COVERING )?INDEX (\w+))?")
+
+
+def _insert(table, rows, batch_size=5000):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+    db.session.commit()
+
+
+def _seed(args, rng):
+    """Fills the scratch database; returns the customer whose requests are checked and a product."""
+    categories = []
+    for n in range(20):
+        parent = Category(name_en=f"Aisle {n}", name_ar=f"ممر {n}")
+        db.session.add(parent)
+        db.session.flush()
+        categories.append(parent.category_id)
+        for m in range(10):
+            child = Category(name_en=f"Shelf {n}.{m}", name_ar=f"رف {n}.{m}", parent_category_id=parent.category_id)
+            db.session.add(child)
+            db.session.flush()
+            categories.append(child.category_id)
+    db.session.commit()
+
+    def products():
+        for product_id in range(1, args.products + 1):
+            noun_en, noun_ar = NOUNS[product_id % len(NOUNS)]
+            yield {"product_id": product_id, "name_en": f"{noun_en} {product_id}", "name_ar": f"{noun_ar} {product_id}",
+                   "price": round(rng.uniform(1, 100), 2), "category_id": rng.choice(categories),
+                   "brand": rng.choice(BRANDS), "stock_quantity": 10 ** 6, "is_active": product_id % 10 != 0,
+                   "stock_sharded": False}
+    _insert(Product.__table__, products())
+
+    _insert(Customer.__table__, ({"customer_id": customer_id, "name": f"Customer {customer_id}",
+                                  "email": f"customer{customer_id}@bench.invalid", "password_hash": "-"}
+                                 for customer_id in range(1, args.customers + 1)))
+    _insert(ShoppingCart.__table__, ({"cart_id": customer_id, "customer_id": customer_id}
+                                     for customer_id in range(1, args.customers + 1)))
+
+    # Every fifth customer has three products in the cart, held until tomorrow
+    tomorrow = datetime.utcnow() + timedelta(days=1)
+    lines = [{"cart_id": customer_id, "product_id": product_id, "quantity": 1}
+             for customer_id in range(1, args.customers + 1, 5)
+             for product_id in rng.sample(range(1, args.products + 1), 3)]
+    _insert(CartItem.__table__, lines)
+    _insert(StockReservation.__table__, (dict(line, expires_at=tomorrow) for line in lines))
+
+    # Each customer keeps reordering a small basket of their own, over the past year
+    now = datetime.utcnow()
+    orders, order_lines, events = [], [], []
+    order_id = 0
+    for customer_id in range(1, args.customers + 1):
+        basket = rng.sample(range(1, args.products + 1), 6)
+        for _ in range(args.orders_per_customer):
+            order_id += 1
+            ordered_at = now - timedelta(days=rng.uniform(0, 365))
+            items = rng.sample(basket, 3)
+            orders.append({"order_id": order_id, "customer_id": customer_id, "order_date": ordered_at,
+                           "total_amount": 30, "status": "pending"})
+            order_lines.extend({"order_id": order_id, "product_id": product_id, "quantity": rng.randint(1, 3),
+                                "price_at_purchase": 10} for product_id in items)
+            events.append({"event_type": "order_placed", "handler": "popularity_stats",
+                           "payload": json.dumps({"order_id": order_id}), "created_at": ordered_at,
+                           "available_at": ordered_at, "attempts": 1, "processed_at": ordered_at})
+    _insert(Order.__table__, orders)
+    _insert(OrderItem.__table__, order_lines)
+    _insert(OutboxEvent.__table__, events)
+
+    # The statistics the outbox worker would have accumulated, as the migrations backfill them
+    db.session.execute(text("""
+        INSERT INTO product_stats (product_id, order_count, units_sold, last_ordered_at)
+        SELECT oi.product_id, COUNT(DISTINCT oi.order_id), SUM(oi.quantity), MAX(o.order_date)
+        FROM orderitems oi JOIN orders o ON o.order_id = oi.order_id
+        GROUP BY oi.product_id
+    """))
+    db.session.execute(text("""
+        INSERT INTO customer_product_stats (customer_id, product_id, order_count, units, last_ordered_at)
+        SELECT o.customer_id, oi.product_id, COUNT(DISTINCT oi.order_id), SUM(oi.quantity), MAX(o.order_date)
+        FROM orderitems oi JOIN orders o ON o.order_id = oi.order_id
+        GROUP BY o.customer_id, oi.product_id
+    """))
+    db.session.execute(text("""
+        INSERT INTO customer_order_stats (customer_id, order_count, last_ordered_at)
+        SELECT customer_id, COUNT(*), MAX(order_date) FROM orders GROUP BY customer_id
+    """))
+    db.session.commit()
+
+    # A few flash-sale products keep their stock in shards
+    for product_id in range(1, args.products + 1, max(1, args.products // 20)):
+        enable_sharding(db.session, product_id, Config.STOCK_SHARD_COUNT)
+    db.session.commit()
+
+    # Planner statistics, as autovacuum would have gathered them on a live database
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+    # The checked customer has an order history and an empty cart
+    return args.customers - 1, 2
+
+
+def _exercise(client, headers, product_id):
+    """
+    The checked routes and workers, as (name, callable) pairs, in an order
+    that leaves the cart non-empty for each checkout.
+    """
+    def json_of(response):
+        return response.get_json(silent=True) or {}
+
+    def cart_item_id():
+        items = json_of(client.get('/api/cart', headers=headers)).get('items') or [{}]
+        return items[0].get('cart_item_id', 0)
+
+    def order_history():
+        first = json_of(client.get('/api/orders/?limit=5', headers=headers))
+        if first.get('next_cursor'):
+            client.get(f"/api/orders/?limit=5&cursor={first['next_cursor']}", headers=headers)
+
+    def order_details():
+        orders = json_of(client.get('/api/orders/?limit=1', headers=headers)).get('orders') or [{}]
+        client.get(f"/api/orders/{orders[0].get('order_id', 0)}", headers=headers)
+
+    def say(transcript):
+        return lambda: client.post('/api/voice/process-text', json={'transcript': transcript}, headers=headers)
+
+    return [
+        ("cart: add item", lambda: client.post('/api/cart/add', json={'product_id': product_id, 'quantity': 2},
+                                               headers=headers)),
+        ("cart: add several items", lambda: client.post(
+            '/api/cart/items:batch', json={'items': [{'product_id': product_id + 1}, {'product_id': product_id + 2}]},
+            headers=headers)),
+        ("cart: view", lambda: client.get('/api/cart', headers=headers)),
+        ("cart: update quantity", lambda: client.put(f'/api/cart/items/{cart_item_id()}', json={'quantity': 3},
+                                                     headers=headers)),
+        ("cart: remove item", lambda: client.delete(f'/api/cart/items/{cart_item_id()}', headers=headers)),
+        ("cart: checkout", lambda: client.post('/api/cart/checkout', headers=headers)),
+        ("orders: history pages", order_history),
+        ("orders: details", order_details),
+        ("products: page", lambda: client.get('/api/products?limit=50&after_id=1000')),
+        ("products: page by category", lambda: client.get('/api/products?limit=50&category_id=5')),
+        ("products: page by brand", lambda: client.get('/api/products?limit=50&brand=Almarai')),
+        ("products: page by price", lambda: client.get('/api/products?limit=50&min_price=10&max_price=20')),
+        ("products: category subtree", lambda: client.get('/api/categories/1/products?limit=50')),
+        ("products: search", lambda: client.get('/api/products/search?q=milk')),
+        ("products: search (ar)", lambda: client.get('/api/products/search?q=حليب&lang=ar')),
+        ("products: details", lambda: client.get(f'/api/products/{product_id}')),
+        ("voice: search", say("search for milk")),
+        ("voice: add to cart", say("add two milk 12 and bread 21 to my cart")),
+        ("voice: view cart", say("what's in my cart")),
+        ("voice: reorder usual", say("reorder my usual")),
+        ("voice: checkout", say("checkout")),
+        ("workers: outbox", lambda: drain(db.session, Config.OUTBOX_BATCH_SIZE)),
+        ("workers: reservation sweep", lambda: release_all_expired(db.session, Config.RESERVATION_SWEEP_BATCH_SIZE)),
+        ("workers: stock consolidation", lambda: consolidate(db.session)),
+    ]
+
+
+def _tables_by_alias(statement):
+    aliases = {}
+    for table, alias in _TABLE_REFERENCE.findall(statement):
+        aliases[table.lower()] = table.lower()
+        if alias:
+            aliases[alias.lower()] = table.lower()
+    return aliases
+
+
+def _full_scans(connection, statement, parameters):
+    """
+    EXPLAINs one captured statement.
+
+    Returns:
+        tuple: (large tables the plan reads in full, plan as text)
+    """
+    if connection.dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        scanned, nodes = set(), [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in LARGE_TABLES:
+                scanned.add(node["Relation Name"])
+            nodes.extend(node.get("Plans", []))
+        return scanned, json.dumps(plan[0]["Plan"], indent=1)
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    aliases = _tables_by_alias(statement)
+    # Scanning a partial index reads only the rows it holds
+    partial_indexes = {row[0] for row in connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'")}
+    scanned = set()
+    for row in rows:
+        match = _SQLITE_FULL_SCAN.match(row[3])
+        if not match or match.group(2) in partial_indexes:
+            continue
+        table = aliases.get(match.group(1).lower())
+        if table in LARGE_TABLES:
+            scanned.add(table)
+    return scanned, "\n".join(row[3] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help="Scratch database URL (defaults to a temporary SQLite file)")
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--customers', type=int, default=20000)
+    parser.add_argument('--orders-per-customer', type=int, default=10)
+    parser.add_argument('-v', '--verbose', action='store_true', help="Print the plan of every checked statement.")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/check_query_plans.db"
+
+    class CheckConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        # The workers are driven explicitly, so their statements are captured once
+        RESERVATION_SWEEP_INTERVAL_SECONDS = 0
+        STOCK_SHARD_CONSOLIDATE_SECONDS = 0
+
+    app = create_app(CheckConfig)
+    rng = random.Random(42)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS_DIR)
+        print(f"Seeding {args.products} products, {args.customers} customers and "
+              f"{args.customers * args.orders_per_customer} orders ({database_url.split(':')[0]})...")
+        customer_id, product_id = _seed(args, rng)
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(customer_id))}'}
+        client = app.test_client()
+        checks = _exercise(client, headers, product_id)
+
+        for _, run in checks:
+            run()
+        captured = {}
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if _EXPLAINED_STATEMENT.match(statement):
+                captured.setdefault(statement, parameters[0] if executemany else parameters)
+
+        regressions = 0
+        for name, run in checks:
+            captured.clear()
+            event.listen(db.engine, 'before_cursor_execute', capture)
+            try:
+                run()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', capture)
+            with db.engine.connect() as connection:
+                results = [(statement, *_full_scans(connection, statement, parameters))
+                           for statement, parameters in captured.items()]
+            failed = [result for result in results if result[1]]
+            regressions += len(failed)
+            print(f"{'FAIL' if failed else 'ok':>4}  {name} ({len(results)} statements)")
+            for statement, scanned, plan in results:
+                if scanned or args.verbose:
+                    print(f"      {'full scan of ' + ', '.join(sorted(scanned)) if scanned else 'plan'}:")
+                    print("        " + " ".join(statement.split())[:300])
+                    print("        " + plan.replace("\n", "\n        "))
+
+    if regressions:
+        print(f"{regressions} statements read a large table in full.")
+        return 1
+    print("No hot statement reads a large table in full.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,4 +19,77 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
\ No newline at end of file
+    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
+
+    # Dialogue session context used to resolve voice follow-ups ("add it to my cart").
+    # 'memory' keeps it per worker; 'redis' shares it across workers.
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+    SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+    SESSION_TTL_SECONDS = int(os.environ.get('SESSION_TTL_SECONDS', 600))
+    SESSION_MAX_ENTRIES = int(os.environ.get('SESSION_MAX_ENTRIES', 10000))
+
+    # End-to-end latency budget (seconds) per endpoint. Stages of the voice
+    # pipeline degrade to cheaper alternatives as the budget runs out.
+    REQUEST_DEADLINES = {
+        'voice.process_voice': float(os.environ.get('VOICE_PROCESS_DEADLINE_SECONDS', 15)),
+        'voice.process_text_for_testing': float(os.environ.get('VOICE_TEXT_DEADLINE_SECONDS', 8)),
+    }
+
+    # Admission control for the voice endpoints: bounded concurrency and
+    # queueing in front of Whisper (ASR) and XTTS (TTS) work.
+    ASR_MAX_CONCURRENCY = int(os.environ.get('ASR_MAX_CONCURRENCY', 2))
+    ASR_MAX_QUEUE = int(os.environ.get('ASR_MAX_QUEUE', 8))
+    ASR_MAX_WAIT_SECONDS = float(os.environ.get('ASR_MAX_WAIT_SECONDS', 4))
+    TTS_MAX_CONCURRENCY = int(os.environ.get('TTS_MAX_CONCURRENCY', 4))
+    TTS_MAX_QUEUE = int(os.environ.get('TTS_MAX_QUEUE', 16))
+    TTS_MAX_WAIT_SECONDS = float(os.environ.get('TTS_MAX_WAIT_SECONDS', 3))
+
+    # In-memory catalog caches (product list, name index, semantic index) check the
+    # shared catalog version at most this often to pick up writes from other workers.
+    CATALOG_VERSION_CHECK_SECONDS = float(os.environ.get('CATALOG_VERSION_CHECK_SECONDS', 2))
+
+    # Checkout locks its products' rows until commit. On PostgreSQL, waiting longer than
+    # this for a lock fails the checkout with a retryable 503 instead of queueing behind it;
+    # holds longer than the warning threshold are logged.
+    CHECKOUT_LOCK_TIMEOUT_SECONDS = float(os.environ.get('CHECKOUT_LOCK_TIMEOUT_SECONDS', 2))
+    CHECKOUT_LOCK_HOLD_WARNING_SECONDS = float(os.environ.get('CHECKOUT_LOCK_HOLD_WARNING_SECONDS', 0.5))
+
+    # Adding to the cart holds the units for this long; checkout converts the hold into
+    # the order without locking the product row. A background sweeper in each worker
+    # gives expired holds back every RESERVATION_SWEEP_INTERVAL_SECONDS (0 disables it),
+    # at most RESERVATION_SWEEP_BATCH_SIZE holds per transaction.
+    STOCK_RESERVATION_SECONDS = int(os.environ.get('STOCK_RESERVATION_SECONDS', 900))
+    RESERVATION_SWEEP_INTERVAL_SECONDS = float(os.environ.get('RESERVATION_SWEEP_INTERVAL_SECONDS', 30))
+    RESERVATION_SWEEP_BATCH_SIZE = int(os.environ.get('RESERVATION_SWEEP_BATCH_SIZE', 500))
+
+    # Flash-sale products flagged stock_sharded spread their stock over this many
+    # counter rows (see manage_stock_shards.py). A consolidator in each worker refreshes
+    # their products.stock_quantity and rebalances the shards every
+    # STOCK_SHARD_CONSOLIDATE_SECONDS (0 disables it).
+    STOCK_SHARD_COUNT = int(os.environ.get('STOCK_SHARD_COUNT', 8))
+    STOCK_SHARD_CONSOLIDATE_SECONDS = float(os.environ.get('STOCK_SHARD_CONSOLIDATE_SECONDS', 10))
+
+    # Side effects of checkout (popularity stats, the spoken order confirmation) are queued
+    # in outbox_events and delivered by outbox_worker.py: up to OUTBOX_BATCH_SIZE rows per
+    # claim, polling every OUTBOX_POLL_SECONDS when idle. A claimed row is leased for
+    # OUTBOX_LEASE_SECONDS; failures are retried with exponential backoff from
+    # OUTBOX_RETRY_BASE_SECONDS, up to OUTBOX_MAX_ATTEMPTS deliveries.
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 100))
+    OUTBOX_POLL_SECONDS = float(os.environ.get('OUTBOX_POLL_SECONDS', 1))
+    OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', 120))
+    OUTBOX_RETRY_BASE_SECONDS = float(os.environ.get('OUTBOX_RETRY_BASE_SECONDS', 5))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+
+    # Rows per upsert statement (and per transaction) in catalog imports.
+    CATALOG_IMPORT_BATCH_SIZE = int(os.environ.get('CATALOG_IMPORT_BATCH_SIZE', 1000))
+
+    # Width of the hashed feature vectors used by semantic product search. Vectors are
+    # stored sparsely, so a wider space costs little memory and keeps unrelated
+    # products from colliding in the same buckets.
+    SEMANTIC_SEARCH_DIMENSIONS = int(os.environ.get('SEMANTIC_SEARCH_DIMENSIONS', 1 << 16))
+
+    # Popularity/affinity scores are reloaded from the order statistics tables after this many seconds.
+    POPULARITY_MAX_AGE_SECONDS = float(os.environ.get('POPULARITY_MAX_AGE_SECONDS', 300))
+
+    # Encoded product JSON fragments kept per worker (one per product, shape and language).
+    PRODUCT_FRAGMENT_CACHE_SIZE = int(os.environ.get('PRODUCT_FRAGMENT_CACHE_SIZE', 50000))
@@ -0,0 +1,58 @@
+"""
+Script to import a supplier catalog (CSV or JSON Lines) into the database.
+
+Products are matched on `supplier_sku`: new SKUs are inserted and known
+ones updated, in batches, so files of any size run in bounded memory.
+Columns: supplier_sku (or sku), name_en, name_ar, description_en,
+description_ar, price, brand, stock_quantity, unit_type, image_url,
+is_active, and category_id or category_en/category_ar (missing categories
+are created). Columns absent from the file are left untouched.
+
+Usage (from the backend directory):
+    python import_catalog.py catalog.csv
+    python import_catalog.py catalog.jsonl --batch-size 5000
+    python import_catalog.py prices.csv --update-only       # nightly price/stock feeds
+    cat feed.jsonl | python import_catalog.py - --format jsonl
+"""
+import argparse
+import sys
+
+from app import create_app, db
+from app.services.catalog_import import IMPORT_FORMATS, detect_format, import_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help="Input file, or '-' for standard input.")
+    parser.add_argument('--format', choices=IMPORT_FORMATS, help="Defaults to the file extension.")
+    parser.add_argument('--batch-size', type=int, help="Rows per batch (default: CATALOG_IMPORT_BATCH_SIZE).")
+    parser.add_argument('--update-only', action='store_true', help="Only update products whose SKU already exists.")
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        parser.error("Cannot tell the input format from the file name; pass --format.")
+    if args.batch_size is not None and args.batch_size <= 0:
+        parser.error("--batch-size must be positive.")
+
+    app = create_app()
+    with app.app_context():
+        # utf-8-sig drops the byte-order mark spreadsheet exports often start with
+        stream = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8-sig', newline='')
+        try:
+            report = import_catalog(db.session, stream, fmt, batch_size=args.batch_size, update_only=args.update_only)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    for line_number, message in report.errors:
+        print(f"Line {line_number}: {message}")
+    if report.invalid > len(report.errors):
+        print(f"... and {report.invalid - len(report.errors)} more invalid rows.")
+    print(f"Catalog import completed: {report.summary()}.")
+    return 1 if report.invalid else 0
+
+
+if __name__ == '__main__':
+    # This allows you to run the script directly using "python import_catalog.py"
+    sys.exit(main())
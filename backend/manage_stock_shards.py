@@ -0,0 +1,58 @@
+"""
+Script to turn sharded stock on or off for flash-sale products.
+
+A sharded product keeps its stock in several counter rows, so concurrent
+adds and checkouts of it do not queue on one row (see
+app/services/stock_shards.py). Turn it on before a flash sale and off
+afterwards; set the stock of a sharded product (e.g. by a catalog import)
+only after turning it off.
+
+Usage (from the backend directory):
+    python manage_stock_shards.py enable 42 57 --shards 16
+    python manage_stock_shards.py disable 42 57
+    python manage_stock_shards.py consolidate      # refresh stock_quantity and rebalance now
+"""
+import argparse
+import sys
+
+from app import create_app, db
+from app.services.stock_shards import consolidate, disable_sharding, enable_sharding
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('action', choices=('enable', 'disable', 'consolidate'))
+    parser.add_argument('product_ids', nargs='*', type=int, help="Products to enable or disable.")
+    parser.add_argument('--shards', type=int, help="Counter rows per product (default: STOCK_SHARD_COUNT).")
+    args = parser.parse_args()
+
+    if args.action != 'consolidate' and not args.product_ids:
+        parser.error(f"{args.action} needs at least one product id.")
+    if args.shards is not None and args.shards <= 0:
+        parser.error("--shards must be positive.")
+
+    app = create_app()
+    with app.app_context():
+        if args.action == 'consolidate':
+            rebalanced = consolidate(db.session)
+            print(f"Stock of sharded products refreshed; {rebalanced} products rebalanced.")
+            return 0
+
+        shard_count = args.shards or app.config['STOCK_SHARD_COUNT']
+        skipped = 0
+        for product_id in args.product_ids:
+            if args.action == 'enable':
+                changed = enable_sharding(db.session, product_id, shard_count)
+            else:
+                changed = disable_sharding(db.session, product_id)
+            # One product per transaction keeps each product row locked only briefly
+            db.session.commit()
+            if not changed:
+                skipped += 1
+                print(f"Product {product_id}: not found or already {args.action}d.")
+        print(f"Sharding {args.action}d for {len(args.product_ids) - skipped} products.")
+    return 1 if skipped else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import logging
+import re
 from logging.config import fileConfig
 
 from flask import current_app
@@ -51,6 +52,20 @@ def get_metadata():
     return target_db.metadata
 
 
+# Search objects created by hand in 43a0235af316, with no model counterpart:
+# the SQLite FTS5 table (and its shadow tables), the PostgreSQL tsvector
+# column and the GIN indexes
+_UNMODELED_SEARCH_OBJECTS = re.compile(
+    r'^(products_fts(_\w+)?|search_vector|ix_products_search_vector|ix_products_\w+_trgm)$')
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keeps autogenerate from dropping the search objects the models don't declare."""
+    if reflected and compare_to is None and name and _UNMODELED_SEARCH_OBJECTS.match(name):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +80,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +109,8 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
@@ -0,0 +1,44 @@
+"""Merge duplicate cart lines and make (cart_id, product_id) unique
+
+Revision ID: 0b7e5d2c9a41
+Revises: f1a6d3c8b527
+Create Date: 2026-10-19 18:10:47.602315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7e5d2c9a41'
+down_revision = 'f1a6d3c8b527'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Concurrent adds could create several lines for one product; fold them
+    # into the oldest line before the constraint can be created
+    op.execute("""
+        UPDATE cartitems SET quantity = (
+            SELECT SUM(d.quantity) FROM cartitems d
+            WHERE d.cart_id = cartitems.cart_id AND d.product_id = cartitems.product_id
+        )
+        WHERE cart_item_id IN (
+            SELECT MIN(cart_item_id) FROM cartitems GROUP BY cart_id, product_id HAVING COUNT(*) > 1
+        )
+    """)
+    op.execute("""
+        DELETE FROM cartitems WHERE cart_item_id NOT IN (
+            SELECT keep.cart_item_id FROM (
+                SELECT MIN(cart_item_id) AS cart_item_id FROM cartitems GROUP BY cart_id, product_id
+            ) keep
+        )
+    """)
+    with op.batch_alter_table('cartitems') as batch_op:
+        batch_op.create_unique_constraint('uq_cartitems_cart_id_product_id', ['cart_id', 'product_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('cartitems') as batch_op:
+        batch_op.drop_constraint('uq_cartitems_cart_id_product_id', type_='unique')
@@ -0,0 +1,42 @@
+"""Add sharded stock counters for flash-sale products
+
+Revision ID: 3e8a1f6b0c57
+Revises: 7c2e9f4a1d36
+Create Date: 2026-10-19 20:11:42.093615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e8a1f6b0c57'
+down_revision = '7c2e9f4a1d36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A plain ALTER TABLE: batch mode would recreate products on SQLite and lose its FTS triggers
+    op.add_column('products', sa.Column('stock_sharded', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    op.create_table(
+        'product_stock_shards',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('shard_no', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.product_id'], ),
+        sa.PrimaryKeyConstraint('product_id', 'shard_no')
+    )
+
+
+def downgrade():
+    # Fold sharded stock back into the products before the shards are dropped
+    op.execute("""
+        UPDATE products SET stock_quantity = (
+            SELECT SUM(s.quantity) FROM product_stock_shards s WHERE s.product_id = products.product_id
+        )
+        WHERE product_id IN (SELECT product_id FROM product_stock_shards)
+    """)
+    op.drop_table('product_stock_shards')
+    op.drop_column('products', 'stock_sharded')
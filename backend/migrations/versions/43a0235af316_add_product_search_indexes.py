@@ -0,0 +1,83 @@
+"""Add full-text and trigram search indexes for products
+
+Revision ID: 43a0235af316
+Revises: 8588bf475203
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '43a0235af316'
+down_revision = '8588bf475203'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        # Names weigh more than descriptions; Arabic text uses the Arabic snowball configuration
+        op.execute("""
+            ALTER TABLE products ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(name_en, '')), 'A') ||
+                setweight(to_tsvector('arabic', coalesce(name_ar, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(description_en, '')), 'C') ||
+                setweight(to_tsvector('arabic', coalesce(description_ar, '')), 'C')
+            ) STORED
+        """)
+        op.create_index('ix_products_search_vector', 'products', ['search_vector'], postgresql_using='gin')
+        for column in ('name_en', 'name_ar', 'description_en', 'description_ar'):
+            op.create_index(f'ix_products_{column}_trgm', 'products', [column], postgresql_using='gin',
+                            postgresql_ops={column: 'gin_trgm_ops'})
+
+    elif dialect == 'sqlite':
+        # External-content FTS5 table kept in sync with products by triggers
+        op.execute("""
+            CREATE VIRTUAL TABLE products_fts USING fts5(
+                name_en, name_ar, description_en, description_ar,
+                content='products', content_rowid='product_id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+        op.execute("""
+            CREATE TRIGGER products_fts_ai AFTER INSERT ON products BEGIN
+                INSERT INTO products_fts(rowid, name_en, name_ar, description_en, description_ar)
+                VALUES (new.product_id, new.name_en, new.name_ar, new.description_en, new.description_ar);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER products_fts_ad AFTER DELETE ON products BEGIN
+                INSERT INTO products_fts(products_fts, rowid, name_en, name_ar, description_en, description_ar)
+                VALUES ('delete', old.product_id, old.name_en, old.name_ar, old.description_en, old.description_ar);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER products_fts_au AFTER UPDATE OF name_en, name_ar, description_en, description_ar ON products BEGIN
+                INSERT INTO products_fts(products_fts, rowid, name_en, name_ar, description_en, description_ar)
+                VALUES ('delete', old.product_id, old.name_en, old.name_ar, old.description_en, old.description_ar);
+                INSERT INTO products_fts(rowid, name_en, name_ar, description_en, description_ar)
+                VALUES (new.product_id, new.name_en, new.name_ar, new.description_en, new.description_ar);
+            END
+        """)
+        op.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        for column in ('name_en', 'name_ar', 'description_en', 'description_ar'):
+            op.drop_index(f'ix_products_{column}_trgm', table_name='products')
+        op.drop_index('ix_products_search_vector', table_name='products')
+        op.drop_column('products', 'search_vector')
+
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS products_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS products_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS products_fts_ai")
+        op.execute("DROP TABLE IF EXISTS products_fts")
@@ -0,0 +1,56 @@
+"""Add product and customer-product order statistics
+
+Revision ID: 5c1e7d9a2b64
+Revises: 43a0235af316
+Create Date: 2026-10-19 11:03:27.540913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e7d9a2b64'
+down_revision = '43a0235af316'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_stats',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('units_sold', sa.Integer(), nullable=False),
+    sa.Column('last_ordered_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.product_id'], ),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_table('customer_product_stats',
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('last_ordered_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.customer_id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.product_id'], ),
+    sa.PrimaryKeyConstraint('customer_id', 'product_id')
+    )
+
+    # Backfill from existing orders once; checkout maintains the tables from here on
+    op.execute("""
+        INSERT INTO product_stats (product_id, order_count, units_sold, last_ordered_at)
+        SELECT oi.product_id, COUNT(DISTINCT oi.order_id), SUM(oi.quantity), MAX(o.order_date)
+        FROM orderitems oi JOIN orders o ON o.order_id = oi.order_id
+        GROUP BY oi.product_id
+    """)
+    op.execute("""
+        INSERT INTO customer_product_stats (customer_id, product_id, order_count, units, last_ordered_at)
+        SELECT o.customer_id, oi.product_id, COUNT(DISTINCT oi.order_id), SUM(oi.quantity), MAX(o.order_date)
+        FROM orderitems oi JOIN orders o ON o.order_id = oi.order_id
+        GROUP BY o.customer_id, oi.product_id
+    """)
+
+
+def downgrade():
+    op.drop_table('customer_product_stats')
+    op.drop_table('product_stats')
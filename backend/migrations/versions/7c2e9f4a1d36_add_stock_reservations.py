@@ -0,0 +1,43 @@
+"""Add stock_reservations for time-limited cart holds
+
+Revision ID: 7c2e9f4a1d36
+Revises: 0b7e5d2c9a41
+Create Date: 2026-10-19 19:02:13.418830
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e9f4a1d36'
+down_revision = '0b7e5d2c9a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Lines already in carts hold nothing; checkout reserves their stock when it runs
+    op.create_table(
+        'stock_reservations',
+        sa.Column('cart_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['cart_id'], ['shoppingcarts.cart_id'], ),
+        sa.ForeignKeyConstraint(['product_id'], ['products.product_id'], ),
+        sa.PrimaryKeyConstraint('cart_id', 'product_id')
+    )
+    op.create_index('ix_stock_reservations_expires_at', 'stock_reservations', ['expires_at'], unique=False)
+
+
+def downgrade():
+    # Give held units back before the holds are forgotten
+    op.execute("""
+        UPDATE products SET stock_quantity = stock_quantity + (
+            SELECT SUM(r.quantity) FROM stock_reservations r WHERE r.product_id = products.product_id
+        )
+        WHERE product_id IN (SELECT product_id FROM stock_reservations)
+    """)
+    op.drop_index('ix_stock_reservations_expires_at', table_name='stock_reservations')
+    op.drop_table('stock_reservations')
@@ -0,0 +1,26 @@
+"""Add indexes for keyset pagination of filtered product listings
+
+Revision ID: a7b3c9e15f02
+Revises: d2f8a41c7e90
+Create Date: 2026-10-19 15:20:44.913057
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7b3c9e15f02'
+down_revision = 'd2f8a41c7e90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_products_category_id_product_id', 'products', ['category_id', 'product_id'], unique=False)
+    op.create_index('ix_products_brand_product_id', 'products', ['brand', 'product_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_products_brand_product_id', table_name='products')
+    op.drop_index('ix_products_category_id_product_id', table_name='products')
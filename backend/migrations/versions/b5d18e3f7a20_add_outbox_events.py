@@ -0,0 +1,39 @@
+"""Add outbox_events for side effects delivered after commit
+
+Revision ID: b5d18e3f7a20
+Revises: 3e8a1f6b0c57
+Create Date: 2026-10-19 21:26:05.517342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d18e3f7a20'
+down_revision = '3e8a1f6b0c57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'outbox_events',
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('event_type', sa.String(length=64), nullable=False),
+        sa.Column('handler', sa.String(length=64), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('event_id')
+    )
+    op.create_index('ix_outbox_events_pending', 'outbox_events', ['available_at', 'event_id'], unique=False,
+                    postgresql_where=sa.text('processed_at IS NULL'), sqlite_where=sa.text('processed_at IS NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_outbox_events_pending', table_name='outbox_events')
+    op.drop_table('outbox_events')
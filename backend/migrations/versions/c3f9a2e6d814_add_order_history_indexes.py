@@ -0,0 +1,27 @@
+"""Add indexes for keyset pagination of order history
+
+Revision ID: c3f9a2e6d814
+Revises: b5d18e3f7a20
+Create Date: 2026-10-19 22:08:37.640219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f9a2e6d814'
+down_revision = 'b5d18e3f7a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_orders_customer_id_order_date', 'orders', ['customer_id', 'order_date', 'order_id'],
+                    unique=False)
+    op.create_index('ix_orderitems_order_id', 'orderitems', ['order_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_orderitems_order_id', table_name='orderitems')
+    op.drop_index('ix_orders_customer_id_order_date', table_name='orders')
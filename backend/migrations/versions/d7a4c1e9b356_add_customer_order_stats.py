@@ -0,0 +1,49 @@
+"""Add per-customer order counts for repeat-purchase shares
+
+Revision ID: d7a4c1e9b356
+Revises: c3f9a2e6d814
+Create Date: 2026-10-19 22:47:51.208364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a4c1e9b356'
+down_revision = 'c3f9a2e6d814'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('customer_order_stats',
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('last_ordered_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.customer_id'], ),
+    sa.PrimaryKeyConstraint('customer_id')
+    )
+
+    # Backfill from existing orders once; the outbox worker maintains the table from here on,
+    # including for the orders whose popularity_stats delivery is still pending. NOT EXISTS
+    # rather than NOT IN: a payload without an order_id would make NOT IN exclude every order
+    if op.get_bind().dialect.name == 'postgresql':
+        pending_order_id = "CAST(CAST(payload AS json) ->> 'order_id' AS integer)"
+    else:
+        pending_order_id = "CAST(json_extract(payload, '$.order_id') AS integer)"
+    op.execute(f"""
+        INSERT INTO customer_order_stats (customer_id, order_count, last_ordered_at)
+        SELECT o.customer_id, COUNT(*), MAX(o.order_date)
+        FROM orders o
+        WHERE NOT EXISTS (
+            SELECT 1 FROM outbox_events
+            WHERE event_type = 'order_placed' AND handler = 'popularity_stats' AND processed_at IS NULL
+              AND {pending_order_id} = o.order_id
+        )
+        GROUP BY o.customer_id
+    """)
+
+
+def downgrade():
+    op.drop_table('customer_order_stats')
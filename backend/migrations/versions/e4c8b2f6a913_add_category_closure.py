@@ -0,0 +1,45 @@
+"""Add the category closure table for subtree queries
+
+Revision ID: e4c8b2f6a913
+Revises: a7b3c9e15f02
+Create Date: 2026-10-19 16:05:12.384120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4c8b2f6a913'
+down_revision = 'a7b3c9e15f02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('category_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['categories.category_id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['categories.category_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_category_closure_descendant_id', 'category_closure', ['descendant_id', 'ancestor_id'], unique=False)
+
+    # Backfill every (ancestor, descendant) pair of the existing tree
+    op.execute("""
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT category_id, category_id, 0 FROM categories
+            UNION ALL
+            SELECT tree.ancestor_id, c.category_id, tree.depth + 1
+            FROM tree JOIN categories c ON c.parent_category_id = tree.descendant_id
+        )
+        INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, depth FROM tree
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_category_closure_descendant_id', table_name='category_closure')
+    op.drop_table('category_closure')
@@ -0,0 +1,27 @@
+"""Add a partial index on the sharded products
+
+Revision ID: e9b2d5f8a140
+Revises: d7a4c1e9b356
+Create Date: 2026-10-19 23:31:05.472819
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b2d5f8a140'
+down_revision = 'd7a4c1e9b356'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The stock consolidator refreshes the sharded products every few seconds;
+    # the index holds only those, so the refresh no longer scans the catalog
+    op.create_index('ix_products_stock_sharded', 'products', ['product_id'], unique=False,
+                    postgresql_where=sa.text('stock_sharded'), sqlite_where=sa.text('stock_sharded'))
+
+
+def downgrade():
+    op.drop_index('ix_products_stock_sharded', table_name='products')
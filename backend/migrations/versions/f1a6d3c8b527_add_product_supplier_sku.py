@@ -0,0 +1,27 @@
+"""Add products.supplier_sku as the key of catalog imports
+
+Revision ID: f1a6d3c8b527
+Revises: e4c8b2f6a913
+Create Date: 2026-10-19 17:02:31.550918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a6d3c8b527'
+down_revision = 'e4c8b2f6a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('supplier_sku', sa.String(length=64), nullable=True))
+    # Products added by hand keep a NULL SKU; NULLs never conflict
+    op.create_index('ix_products_supplier_sku', 'products', ['supplier_sku'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_products_supplier_sku', table_name='products')
+    op.drop_column('products', 'supplier_sku')
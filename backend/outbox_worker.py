@@ -0,0 +1,61 @@
+"""
+Worker that delivers the outbox: side effects queued by committed writes.
+
+Claims due `outbox_events` rows in batches and runs their handlers (see
+app/services/outbox.py), retrying failures with exponential backoff.
+Run one or more next to the API; concurrent workers share the work.
+
+Usage (from the backend directory):
+    python outbox_worker.py                     # run until interrupted
+    python outbox_worker.py --once              # deliver what is due now, then exit
+    python outbox_worker.py --batch-size 500 --poll-seconds 0.5
+"""
+import argparse
+import logging
+import sys
+import time
+
+from app import create_app, db
+from app.services.outbox import drain
+
+logger = logging.getLogger("outbox_worker")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, help="Rows per claim (default: OUTBOX_BATCH_SIZE).")
+    parser.add_argument('--poll-seconds', type=float, help="Sleep when idle (default: OUTBOX_POLL_SECONDS).")
+    parser.add_argument('--once', action='store_true', help="Exit once nothing is due.")
+    args = parser.parse_args()
+
+    if args.batch_size is not None and args.batch_size <= 0:
+        parser.error("--batch-size must be positive.")
+
+    app = create_app()
+    batch_size = args.batch_size or app.config['OUTBOX_BATCH_SIZE']
+    poll_seconds = args.poll_seconds if args.poll_seconds is not None else app.config['OUTBOX_POLL_SECONDS']
+    with app.app_context():
+        logger.info(f"Outbox worker started (batch size {batch_size}).")
+        while True:
+            try:
+                counts = drain(db.session, batch_size)
+            except KeyboardInterrupt:
+                break
+            except Exception:
+                # The database went away or similar; keep the worker alive and try again
+                logger.error("Outbox worker failed to claim events.", exc_info=True)
+                db.session.rollback()
+                counts = None
+            if counts and (counts["delivered"] or counts["failed"]):
+                logger.info(f"Delivered {counts['delivered']} outbox events, {counts['failed']} failed.")
+            if args.once and counts is not None:
+                break
+            try:
+                time.sleep(poll_seconds)
+            except KeyboardInterrupt:
+                break
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
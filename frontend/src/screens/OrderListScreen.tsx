@@ -14,6 +14,8 @@ type OrderSummary = {
     order_date: string;
     total_amount: number;
     status: string;
+    item_count: number;
+    product_names: string[];
 };
 
 // Define the props type for this screen using StackScreenProps
@@ -23,35 +25,52 @@ const OrderListScreen = ({ navigation }: OrderListScreenProps) => {
     // Tell TypeScript that the state will hold an array of OrderSummary objects
     const [orders, setOrders] = useState<OrderSummary[]>([]);
     const [loading, setLoading] = useState(true);
+    // The history is paged; null once the last page has been loaded
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
 
-    useEffect(() => {
-        const fetchOrders = async () => {
-            try {
-                const token = await AsyncStorage.getItem('userToken');
-                if (!token) {
-                    navigation.replace('Login');
-                    return;
-                }
-                const response = await axios.get('http://10.0.2.2:5000/api/orders/', {
-                    headers: { Authorization: `Bearer ${token}` }
-                });
-                setOrders(response.data);
-            } catch (error) {
-                console.error("Failed to fetch orders:", error);
-                Alert.alert("Error", "Could not load your orders.");
-            } finally {
-                setLoading(false);
+    const fetchOrders = async (cursor: string | null) => {
+        try {
+            const token = await AsyncStorage.getItem('userToken');
+            if (!token) {
+                navigation.replace('Login');
+                return;
             }
-        };
-        fetchOrders();
+            const response = await axios.get('http://10.0.2.2:5000/api/orders/', {
+                headers: { Authorization: `Bearer ${token}` },
+                params: cursor ? { cursor } : {}
+            });
+            setOrders(previous => cursor ? [...previous, ...response.data.orders] : response.data.orders);
+            setNextCursor(response.data.next_cursor);
+        } catch (error) {
+            console.error("Failed to fetch orders:", error);
+            Alert.alert("Error", "Could not load your orders.");
+        } finally {
+            setLoading(false);
+            setLoadingMore(false);
+        }
+    };
+
+    useEffect(() => {
+        fetchOrders(null);
     }, [navigation]);
 
+    const loadMore = () => {
+        if (nextCursor && !loadingMore) {
+            setLoadingMore(true);
+            fetchOrders(nextCursor);
+        }
+    };
+
     // --- FIX IS HERE: Step 2 ---
     // Explicitly type the 'item' in the renderItem function
     const renderItem = ({ item }: { item: OrderSummary }) => (
         <TouchableOpacity style={styles.itemContainer} onPress={() => navigation.navigate('OrderDetail', { orderId: item.order_id })}>
             <Text style={styles.orderId}>Order #{item.order_id}</Text>
             <Text style={styles.orderDate}>Placed on: {new Date(item.order_date).toLocaleDateString()}</Text>
+            <Text style={styles.orderDate} numberOfLines={1}>
+                {item.item_count} item{item.item_count === 1 ? '' : 's'}: {item.product_names.join(', ')}{item.item_count > item.product_names.length ? ', …' : ''}
+            </Text>
             <View style={styles.orderInfoRow}>
                 <Text style={styles.orderStatus}>Status: {item.status}</Text>
                 <Text style={styles.orderTotal}>AED {item.total_amount.toFixed(2)}</Text>
@@ -67,6 +86,9 @@ const OrderListScreen = ({ navigation }: OrderListScreenProps) => {
             data={orders}
             renderItem={renderItem}
             keyExtractor={(item) => item.order_id.toString()}
+            onEndReached={loadMore}
+            onEndReachedThreshold={0.5}
+            ListFooterComponent={loadingMore ? <ActivityIndicator color="#007AFF" /> : null}
             ListEmptyComponent={<View style={styles.emptyContainer}><Text style={styles.emptyText}>You have no past orders.</Text></View>}
         />
     );
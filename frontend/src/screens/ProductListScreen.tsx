@@ -19,6 +19,26 @@ import type { RootStackParamList } from '../../App';
 
 const audioRecorderPlayer = new AudioRecorderPlayer();
 
+// A checkout's spoken confirmation is synthesized by a background worker after the reply
+const PENDING_AUDIO_ATTEMPTS = 10;
+const PENDING_AUDIO_INTERVAL_MS = 500;
+
+// Polls until the audio file exists; false if it never appears (404) or the server errors
+const waitForAudio = async (url: string): Promise<boolean> => {
+    for (let attempt = 0; attempt < PENDING_AUDIO_ATTEMPTS; attempt++) {
+        try {
+            await axios.head(url, { timeout: 5000 });
+            return true;
+        } catch (error) {
+            if (!(axios.isAxiosError(error) && error.response?.status === 404)) {
+                return false;
+            }
+        }
+        await new Promise(resolve => setTimeout(resolve, PENDING_AUDIO_INTERVAL_MS));
+    }
+    return false;
+};
+
 type Product = {
     product_id: number;
     name_en: string;
@@ -42,6 +62,7 @@ type VoiceResponsePayload = {
   };
   response_text: string;
   audio_filename: string | null;
+  audio_pending: boolean;
   order_id: number | null;
 };
 
@@ -135,7 +156,7 @@ const ProductListScreen = ({ navigation }: ProductListScreenProps) => {
             timeout: 90000,
         });
         
-        const { nlu_result, audio_filename, order_id } = response.data;
+        const { nlu_result, response_text, audio_filename, audio_pending, order_id } = response.data;
         
         // Set the persistent transcript message
         if (nlu_result && nlu_result.transcript) {
@@ -157,11 +178,18 @@ const ProductListScreen = ({ navigation }: ProductListScreenProps) => {
             navigation.navigate('OrderDetail', {orderId: order_id});
         }
 
-        if (audio_filename) {
-            const audioUrl = `${API_BASE_URL}/audio/${audio_filename}`;
+        const audioUrl = audio_filename ? `${API_BASE_URL}/audio/${audio_filename}` : null;
+        if (audioUrl && audio_pending) {
+            setStatusMessage('Preparing response...');
+        }
+        if (audioUrl && (!audio_pending || await waitForAudio(audioUrl))) {
             // Use a timeout to prevent re-renders from interrupting the player
             setTimeout(() => playAudioFromUrl(audioUrl), 100);
         } else {
+            if (audioUrl) {
+                // The pending audio never arrived; show the reply as text instead
+                setStatusMessage(response_text);
+            }
             setTimeout(() => setStatusMessage('Tap microphone to speak'), 4000);
         }
 